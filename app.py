@@ -1,32 +1,111 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
+from eventlet import tpool
 import cv2
 import numpy as np
 import base64
+import os
 import time
 import logging
 
-from utils.pose_tracker import PoseTracker
-from utils.smplx_renderer import SMPLXRenderer
-from utils.calibration import CalibrationGuide
+from utils.session import ClientSession
+from utils.pose_tracker import parse_client_landmarks
+from utils.gesture_batch import BatchGestureEvaluator
+from utils.gesture_classifier import load_classifier
+from utils.profile_store import ProfileStore, valid_profile_id
+from utils.shape_fitter import ShapeFitter
+from utils.render_clock import RenderClock
+from utils.pose_stream import skinned_model_asset
+from utils.body_model import load_body_model
+from utils.ik_solver import BatchPoseSolver
+from utils.voice_service import SAMPLE_RATE_RANGE, get_voice_service
+from utils.tts_cache import TtsCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+GESTURE_TICK_INTERVAL = 1 / 30  # Seconds between batched gesture evaluations
+POSE_SOLVE_INTERVAL = 1 / 60  # Seconds between batched landmark-to-SMPL-X pose solves
+AVATAR_FPS = 30  # Avatar frames pushed per second, independent of the tracking rate
+VOICE_EVENT_INTERVAL = 0.02  # Seconds between deliveries of streamed speech results
+FRAME_CREDIT_WINDOW = 2  # Most video frames a client may have in flight before an ack
+
 def configure_routes(app, socketio):
-    pose_tracker = PoseTracker()
-    avatar_renderer = SMPLXRenderer()
-    calibration_guide = CalibrationGuide()
-
-    # Track processing times for progress indicators
-    processing_stats = {
-        'pose_detection': {'start': 0, 'duration': 0},
-        'avatar_rendering': {'start': 0, 'duration': 0}
-    }
-
-    def resize_frame_for_mobile(frame, max_dimension=640):
-        """Resize frame while maintaining aspect ratio and quality"""
+    tracking_tier = os.getenv('TRACKING_TIER')
+    sessions = {}
+    gesture_evaluator = BatchGestureEvaluator(classifier=load_classifier())
+    pose_solver = BatchPoseSolver()
+    profile_store = ProfileStore(app)
+    shape_fitter = ShapeFitter()
+    voice_service = get_voice_service()
+    voice_service.tts = TtsCache()
+    voice_service.tts.prewarm()
+
+    def get_session():
+        """Return the state for the current client, creating it on first use"""
+        session = sessions.get(request.sid)
+        if session is None:
+            session = ClientSession(request.sid, tracking_tier=tracking_tier,
+                                    gesture_evaluator=gesture_evaluator, pose_solver=pose_solver)
+            sessions[request.sid] = session
+        return session
+
+    def gesture_tick_loop():
+        """Evaluate gestures for all sessions in one batch per tick"""
+        while True:
+            try:
+                gesture_evaluator.evaluate()
+            except Exception as e:
+                logger.error(f"Error evaluating gestures: {str(e)}")
+            socketio.sleep(GESTURE_TICK_INTERVAL)
+
+    socketio.start_background_task(gesture_tick_loop)
+
+    def pose_solve_loop():
+        """Solve SMPL-X poses for all sessions with new landmarks in one batch per tick"""
+        while True:
+            try:
+                for sid, (landmarks, pose, timestamp) in pose_solver.solve().items():
+                    session = sessions.get(sid)
+                    if session is not None:
+                        session.push_pose(landmarks, session.expression, pose=pose, timestamp=timestamp)
+            except Exception as e:
+                logger.error(f"Error solving avatar poses: {str(e)}")
+            socketio.sleep(POSE_SOLVE_INTERVAL)
+
+    socketio.start_background_task(pose_solve_loop)
+
+    def apply_voice_action(session, action):
+        """Run the socket event a locally matched voice command stands for"""
+        if action['event'] == 'start_calibration':
+            socketio.emit('calibration_instruction', start_session_calibration(session), to=session.sid)
+        elif action['event'] == 'update_avatar':
+            error = apply_avatar_update(session, action['data'])
+            if error is None:
+                socketio.emit('customization_updated', {'status': 'success'}, to=session.sid)
+            else:
+                socketio.emit('error', {'message': error}, to=session.sid)
+
+    def voice_event_loop():
+        """Deliver partial transcripts and replies produced by the speech stream workers"""
+        while True:
+            for sid, event, payload in voice_service.drain_events():
+                session = sessions.get(sid)
+                if session is None:
+                    continue
+                try:
+                    if payload.get('action'):
+                        apply_voice_action(session, payload['action'])
+                except Exception as e:
+                    logger.error(f"Error applying voice command: {str(e)}")
+                socketio.emit(event, payload, to=sid)
+            socketio.sleep(VOICE_EVENT_INTERVAL)
+
+    socketio.start_background_task(voice_event_loop)
+
+    def resize_frame_for_mobile(frame, max_dimension=640, frame_pool=None):
+        """Resize frame while maintaining aspect ratio and quality (into a pooled buffer if given)"""
         if frame is None:
             return None
             
@@ -48,7 +127,10 @@ def configure_routes(app, socketio):
             
             # Only resize if necessary
             if height > max_dimension or width > max_dimension:
-                frame = cv2.resize(frame, (new_width, new_height), 
+                dst = None
+                if frame_pool is not None:
+                    dst = frame_pool.acquire('resized', (new_height, new_width) + frame.shape[2:])
+                frame = cv2.resize(frame, (new_width, new_height), dst=dst,
                                 interpolation=cv2.INTER_AREA)
             
             # Ensure proper color space and orientation
@@ -90,63 +172,265 @@ def configure_routes(app, socketio):
             logger.error(f"Error optimizing frame: {str(e)}")
             return None
 
+    def avatar_render_loop(session):
+        """Push avatar frames at display rate, interpolating between solved poses"""
+        clock = RenderClock(AVATAR_FPS)
+        while session.active:
+            tick = clock.wait(socketio.sleep)
+            try:
+                pose_stream = session.pose_stream
+                if pose_stream is not None:
+                    # The browser renders the avatar; send its shape once and a pose per tick
+                    shape = pose_stream.pending_shape()
+                    if shape is not None:
+                        socketio.emit('avatar_shape', shape, to=session.sid)
+                    pose_frame = session.stream_avatar_pose(tick)
+                    if pose_frame is not None:
+                        socketio.emit('avatar_pose', pose_frame, to=session.sid)
+                    continue
+
+                avatar_frame = session.render_avatar_frame(tick)
+                if avatar_frame is None:
+                    continue
+                avatar_data = optimize_frame_for_mobile(avatar_frame)
+                if avatar_data:
+                    duration = session.processing_stats['avatar_rendering']['duration']
+                    socketio.emit('avatar_frame', {
+                        'avatar_frame': f'data:image/jpeg;base64,{avatar_data}',
+                        'processing_progress': {
+                            'avatar_rendering': min(100, (duration / clock.interval) * 100)
+                        }
+                    }, to=session.sid)
+            except Exception as e:
+                logger.error(f"Error rendering avatar frame: {str(e)}")
+
     @app.route('/')
     def index():
         user_agent = request.headers.get('User-Agent', '').lower()
         is_mobile = any(device in user_agent for device in ['mobile', 'android', 'iphone', 'ipad', 'ipod'])
         return render_template('index.html', is_mobile=is_mobile)
 
+    model_assets = {}
+
+    @app.route('/avatar/model')
+    def avatar_model():
+        """Mesh, skinning and shape data for the browser's skinned SMPL-X viewer"""
+        if 'smplx' not in model_assets:
+            body_model = load_body_model()
+            if body_model is None:
+                return jsonify({'error': 'SMPL-X model unavailable'}), 503
+            model_assets['smplx'] = skinned_model_asset(body_model)
+        response = jsonify(model_assets['smplx'])
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+    @app.route('/tts/metrics')
+    def tts_metrics():
+        """Hit rate and size of the synthesized speech cache"""
+        return jsonify(voice_service.tts.metrics())
+
+    @app.route('/voice/metrics')
+    def voice_metrics():
+        """Local intent hit rate and how much received audio was forwarded as speech"""
+        return jsonify(voice_service.metrics())
+
+    def save_completed_profile(session):
+        """Persist calibration results once the session finishes calibrating"""
+        profile = session.calibration_guide.consume_completed_profile()
+        if profile is None:
+            return
+        if session.profile_id:
+            # The database driver blocks; run it on a native thread, not the event loop
+            tpool.execute(profile_store.save, session.profile_id, profile)
+
+        # Fit the body shape off the request path; later frames reuse it
+        def on_shape_fitted(_, betas):
+            session.set_body_shape(betas)
+            if session.profile_id:
+                profile_store.save_betas(session.profile_id, betas)
+
+        frames = session.calibration_capture.snapshot()
+        session.calibration_capture.clear()
+        shape_fitter.submit(session.profile_id or session.sid, frames, on_shape_fitted)
+
     @socketio.on('connect')
-    def handle_connect():
+    def handle_connect(auth=None):
         logger.info(f"Client connected: {request.sid}")
-        emit('calibration_instruction', calibration_guide.get_current_instruction())
+        session = get_session()
+        socketio.start_background_task(avatar_render_loop, session)
+        
+        # Returning clients skip calibration by loading their stored profile
+        profile_id = (auth.get('profile_id') if isinstance(auth, dict) else None) or \
+            request.args.get('profile_id')
+        session.profile_id = profile_id if valid_profile_id(profile_id) else None
+        if session.profile_id and session.load_profile(tpool.execute(profile_store.load, session.profile_id)):
+            logger.info(f"Loaded calibration profile {session.profile_id}")
+        emit('calibration_instruction', session.calibration_guide.get_current_instruction())
 
     @socketio.on('disconnect')
     def handle_disconnect():
         logger.info(f"Client disconnected: {request.sid}")
+        session = sessions.pop(request.sid, None)
+        if session is not None:
+            session.close()
+
+    def start_session_calibration(session):
+        session.calibration_capture.clear()
+        return session.calibration_guide.start_calibration()
 
     @socketio.on('start_calibration')
     def handle_start_calibration():
-        instruction = calibration_guide.start_calibration()
-        emit('calibration_instruction', instruction)
+        emit('calibration_instruction', start_session_calibration(get_session()))
+
+    @socketio.on('voice_stream_start')
+    def handle_voice_stream_start(data=None):
+        """Open a streaming recognition for the utterance the client starts speaking"""
+        session = get_session()
+        if session.voice_stream is not None:
+            session.voice_stream.cancel()
+            session.voice_stream = None
+        try:
+            sample_rate = int((data if isinstance(data, dict) else {}).get('sampleRate', 16000))
+        except (ValueError, TypeError, OverflowError):
+            sample_rate = None
+        if sample_rate is None or not SAMPLE_RATE_RANGE[0] <= sample_rate <= SAMPLE_RATE_RANGE[1]:
+            emit('error', {'message': 'Invalid sample rate'})
+            return
+        session.voice_stream = voice_service.start_stream(
+            request.sid, sample_rate, vad=session.voice_activity_detector(sample_rate))
+
+    @socketio.on('voice_chunk')
+    def handle_voice_chunk(chunk):
+        """Forward one chunk of 16-bit PCM audio to the open recognition stream"""
+        session = get_session()
+        if session.voice_stream is not None and isinstance(chunk, (bytes, bytearray)):
+            session.voice_stream.write(chunk)
+
+    @socketio.on('voice_stream_end')
+    def handle_voice_stream_end():
+        session = get_session()
+        if session.voice_stream is not None:
+            session.voice_stream.end()
+            session.voice_stream = None
+
+    def apply_avatar_update(session, data):
+        """Apply customization fields to the session's renderer; returns an error message or None"""
+        avatar_renderer = session.avatar_renderer
+        if 'color' in data:
+            hex_color = data['color'].lstrip('#')
+            rgb_color = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+            avatar_renderer.set_customization(color=rgb_color)
+            
+        for key, (param, attr) in {
+            'size': ('size', float),
+            'style': ('style', str),
+            'mode': ('mode', str),
+            'lineThickness': ('line_thickness', int),
+            'jointSize': ('joint_size', float)
+        }.items():
+            if key in data:
+                try:
+                    value = attr(data[key])
+                    avatar_renderer.set_customization(**{param: value})
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Invalid value for {key}: {str(e)}")
+                    return f'Invalid value for {key}'
+        return None
+
+    @socketio.on('avatar_stream')
+    def handle_avatar_stream(data=None):
+        """Let the client render the avatar itself from a compact pose stream"""
+        get_session().set_pose_streaming(bool((data or {}).get('enabled', True)))
 
     @socketio.on('update_avatar')
     def handle_avatar_update(data):
         try:
-            if 'color' in data:
-                hex_color = data['color'].lstrip('#')
-                rgb_color = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-                avatar_renderer.set_customization(color=rgb_color)
-                
-            for key, attr in {
-                'size': float, 
-                'style': str,
-                'lineThickness': int,
-                'jointSize': float
-            }.items():
-                if key in data:
-                    try:
-                        value = attr(data[key])
-                        avatar_renderer.set_customization(**{key.lower(): value})
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Invalid value for {key}: {str(e)}")
-                        emit('error', {'message': f'Invalid value for {key}'})
-                        return
+            error = apply_avatar_update(get_session(), data)
+            if error is not None:
+                emit('error', {'message': error})
+                return
                         
             emit('customization_updated', {'status': 'success'})
         except Exception as e:
             logger.error(f"Error updating avatar: {str(e)}")
             emit('error', {'message': 'Error updating avatar customization'})
 
+    def ingest_pose(session, landmarks, expression, frame_size, timestamp):
+        """Feed tracked landmarks to calibration and the avatar render loop"""
+        # Update calibration state
+        session.capture_calibration_frame(landmarks, frame_size)
+        calibration_instruction = session.calibration_guide.update_calibration(landmarks)
+        save_completed_profile(session)
+        if calibration_instruction is not None:
+            emit('calibration_instruction', calibration_instruction)
+        
+        # The avatar render loop picks the pose up at its next tick
+        session.submit_pose(landmarks, expression, frame_size, timestamp)
+
+    @socketio.on('pose_data')
+    def handle_pose_data(data):
+        """Landmarks computed in the browser: no image decode or server-side inference"""
+        try:
+            session = get_session()
+            processing_stats = session.processing_stats
+            processing_stats['pose_detection']['start'] = received = time.time()
+            
+            if not data:
+                # The client lost the pose
+                session.pose_tracker.reset_tracking()
+                session.push_pose(None)
+                return
+            
+            try:
+                client_landmarks, frame_size = parse_client_landmarks(data)
+            except ValueError as e:
+                logger.error(f"Invalid pose data: {str(e)}")
+                emit('error', {'message': 'Invalid pose data'})
+                return
+                
+            landmarks, gesture = session.pose_tracker.ingest_landmarks(client_landmarks, frame_size[1], received)
+            processing_stats['pose_detection']['duration'] = time.time() - received
+            ingest_pose(session, landmarks, None, frame_size, received)
+            
+            emit('processed_frame', {
+                'gesture': gesture,
+                'calibration': session.calibration_guide.get_progress_delta(),
+                'processing_progress': {
+                    'pose_detection': min(100, (processing_stats['pose_detection']['duration'] / 0.033) * 100)
+                }
+            })
+        except Exception as e:
+            logger.error(f"Error in pose data handler: {str(e)}")
+            emit('error', {'message': 'Internal server error'})
+
     @socketio.on('video_frame')
     def handle_video_frame(data):
+        """Process one frame; the ack tells the client how many frames it may have in flight"""
+        session = get_session()
+        # Count the frame on receipt, then yield once so frames already waiting on the
+        # socket are received and counted before this one blocks the loop; the ack
+        # then shrinks the client's window by the real backlog
+        session.frames_in_flight += 1
+        socketio.sleep(0)
         try:
+            process_video_frame(session, data)
+        finally:
+            session.frames_in_flight -= 1
+        return {'credits': session.frame_credits(FRAME_CREDIT_WINDOW)}
+
+    def process_video_frame(session, data):
+        try:
+            processing_stats = session.processing_stats
             processing_stats['pose_detection']['start'] = time.time()
             
             try:
-                # Handle both data URL format and raw base64
-                encoded_data = data.split(',')[1] if ',' in data else data
-                nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
+                if isinstance(data, (bytes, bytearray)):
+                    # Binary JPEG frames from the encoding worker
+                    nparr = np.frombuffer(data, np.uint8)
+                else:
+                    # Handle both data URL format and raw base64
+                    encoded_data = data.split(',')[1] if ',' in data else data
+                    nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
                 frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                 
                 if frame is None:
@@ -159,49 +443,43 @@ def configure_routes(app, socketio):
 
             if frame.size > 0:
                 # Optimize frame for mobile
-                frame = resize_frame_for_mobile(frame)
+                frame = resize_frame_for_mobile(frame, frame_pool=session.frame_pool)
                 if frame is None:
                     emit('error', {'message': 'Error processing video frame'})
                     return
                 
                 try:
                     # Process frame with MediaPipe
-                    landmarks, face_landmarks, expression, gesture, processed_frame = pose_tracker.process_frame(frame)
+                    landmarks, face_landmarks, expression, gesture, processed_frame = session.pose_tracker.process_frame(frame)
                     processing_stats['pose_detection']['duration'] = time.time() - processing_stats['pose_detection']['start']
                     
                     if landmarks is not None:
-                        # Update calibration state
-                        calibration_instruction = calibration_guide.update_calibration(landmarks)
-                        emit('calibration_instruction', calibration_instruction)
-                        
-                        # Start avatar rendering with timing
-                        processing_stats['avatar_rendering']['start'] = time.time()
-                        pose_frame = pose_tracker.draw_pose(frame.copy(), landmarks, face_landmarks, expression, gesture)
-                        avatar_frame = avatar_renderer.render_avatar(landmarks, expression)
-                        processing_stats['avatar_rendering']['duration'] = time.time() - processing_stats['avatar_rendering']['start']
+                        ingest_pose(session, landmarks, expression, frame.shape[:2],
+                                    processing_stats['pose_detection']['start'])
+                        pose_frame = session.pose_tracker.draw_pose(session.frame_pool.copy('overlay', frame), landmarks, face_landmarks, expression, gesture)
                         
-                        # Optimize frames for mobile
+                        # Optimize frame for mobile
                         pose_data = optimize_frame_for_mobile(pose_frame)
-                        avatar_data = optimize_frame_for_mobile(avatar_frame)
                         
-                        if pose_data and avatar_data:
+                        if pose_data:
                             # Calculate and normalize processing progress
                             pose_progress = min(100, (processing_stats['pose_detection']['duration'] / 0.033) * 100)
-                            avatar_progress = min(100, (processing_stats['avatar_rendering']['duration'] / 0.033) * 100)
                             
+                            # Only calibration progress that changed rides along with the frame
+                            calibration_delta = session.calibration_guide.get_progress_delta()
                             emit('processed_frame', {
                                 'pose_frame': f'data:image/jpeg;base64,{pose_data}',
-                                'avatar_frame': f'data:image/jpeg;base64,{avatar_data}',
                                 'expression': expression,
                                 'gesture': gesture,
+                                'calibration': calibration_delta,
                                 'processing_progress': {
-                                    'pose_detection': pose_progress,
-                                    'avatar_rendering': avatar_progress
+                                    'pose_detection': pose_progress
                                 }
                             })
                         else:
                             emit('error', {'message': 'Error optimizing frames for mobile'})
                     else:
+                        session.push_pose(None)
                         emit('error', {'message': 'No pose detected'})
                         
                 except Exception as e:
@@ -0,0 +1,165 @@
+"""Labeled landmark sequences for the gesture and expression benchmark.
+
+A sequence is a dict with ``landmarks`` (T, 33, 4) pose landmarks in the layout
+produced by PoseTracker, ``labels`` (T,) with the gesture active at each frame
+(``none`` otherwise), and optionally ``face_landmarks`` (T, 468, 3) with
+per-frame ``expressions``. Recorded sequences are stored as .npz files with the
+same keys; synthetic sequences are generated deterministically from a seed.
+"""
+import glob
+import os
+
+import numpy as np
+
+FPS = 30
+DEPTH_SCALE = 640  # PoseTracker scales MediaPipe z by the frame width
+
+# Neutral standing pose in normalized image coordinates (y grows downwards)
+BASE_POSE = np.array([
+    [0.50, 0.20], [0.49, 0.19], [0.48, 0.19], [0.47, 0.19], [0.51, 0.19],
+    [0.52, 0.19], [0.53, 0.19], [0.46, 0.20], [0.54, 0.20], [0.49, 0.23],
+    [0.51, 0.23], [0.60, 0.35], [0.40, 0.35], [0.63, 0.50], [0.37, 0.50],
+    [0.64, 0.62], [0.36, 0.62], [0.65, 0.65], [0.35, 0.65], [0.64, 0.66],
+    [0.36, 0.66], [0.63, 0.64], [0.37, 0.64], [0.56, 0.65], [0.44, 0.65],
+    [0.56, 0.80], [0.44, 0.80], [0.56, 0.95], [0.44, 0.95], [0.57, 0.97],
+    [0.43, 0.97], [0.55, 0.98], [0.45, 0.98]
+])
+
+GESTURE_LABELS = ('waving', 'pointing', 'clapping', 'raising_hand')
+EXPRESSION_LABELS = ('neutral', 'closed_eyes', 'open_mouth', 'raised_eyebrows', 'frown')
+
+# Target metrics per expression: (eye ratio, mouth ratio, eyebrow height)
+EXPRESSION_TARGETS = {
+    'neutral': (0.30, 0.20, 0.45),
+    'closed_eyes': (0.08, 0.20, 0.45),
+    'open_mouth': (0.30, 0.70, 0.45),
+    'raised_eyebrows': (0.30, 0.20, 0.70),
+    'frown': (0.30, 0.20, 0.20)
+}
+LEFT_EYE = [33, 7, 163, 144, 145, 153]
+RIGHT_EYE = [362, 382, 381, 380, 374, 373]
+MOUTH = [61, 39, 267, 409]
+EYEBROWS = [70, 63, 105, 66, 107, 336, 296, 334, 293, 300]
+
+
+def _set_arm(frame, side, elbow, wrist):
+    """Place an arm's elbow and wrist (and the hand points around the wrist)"""
+    elbow_idx, wrist_idx = (13, 15) if side == 'left' else (14, 16)
+    hand = [17, 19, 21] if side == 'left' else [18, 20, 22]
+    frame[elbow_idx, :2] = elbow
+    offset = np.asarray(wrist) - frame[wrist_idx, :2]
+    frame[wrist_idx, :2] = wrist
+    frame[hand, :2] += offset
+
+
+def _pose_frame(gesture, t, rng, noise):
+    """One pose frame for the given gesture at time t (seconds into the gesture)"""
+    frame = np.zeros((33, 4))
+    frame[:, :2] = BASE_POSE
+    frame[:, 2] = 0.0
+    frame[:, 3] = 0.9
+
+    if gesture == 'waving':
+        _set_arm(frame, 'left', (0.66, 0.30), (0.68 + 0.12 * np.sin(2 * np.pi * 2.0 * t), 0.18))
+    elif gesture == 'pointing':
+        _set_arm(frame, 'left', (0.72, 0.35), (0.84, 0.35))
+    elif gesture == 'clapping':
+        gap = 0.02 + 0.10 * (1 + np.cos(2 * np.pi * 2.5 * t)) / 2
+        _set_arm(frame, 'left', (0.58, 0.47), (0.50 + gap / 2, 0.45))
+        _set_arm(frame, 'right', (0.42, 0.47), (0.50 - gap / 2, 0.45))
+    elif gesture == 'raising_hand':
+        _set_arm(frame, 'right', (0.39, 0.22), (0.38, 0.08))
+
+    # Idle sway plus per-landmark jitter
+    frame[:, 0] += 0.01 * np.sin(2 * np.pi * 0.3 * t)
+    frame[:, :2] += rng.normal(0, noise, (33, 2))
+    frame[:, 2] += rng.normal(0, noise, 33) * DEPTH_SCALE
+    frame[:, :2] = np.clip(frame[:, :2], 0, 1)
+    return frame
+
+
+def _face_frame(expression, rng, base, noise):
+    """One face mesh frame whose expression metrics match the target expression"""
+    eye_ratio, mouth_ratio, eyebrow_height = EXPRESSION_TARGETS[expression]
+    frame = base.copy()
+
+    for eye, cx in ((LEFT_EYE, 0.45), (RIGHT_EYE, 0.55)):
+        cy, half_width = 0.40, 0.03
+        vertical = eye_ratio * 2 * half_width
+        frame[eye[0], :2] = (cx - half_width, cy)
+        frame[eye[3], :2] = (cx + half_width, cy)
+        frame[eye[1], :2] = (cx - 0.01, cy - vertical / 2)
+        frame[eye[5], :2] = (cx - 0.01, cy + vertical / 2)
+        frame[eye[2], :2] = (cx + 0.01, cy - vertical / 2)
+        frame[eye[4], :2] = (cx + 0.01, cy + vertical / 2)
+
+    mx, my, half_width = 0.50, 0.55, 0.05
+    vertical = mouth_ratio * 2 * half_width
+    frame[MOUTH[0], :2] = (mx - half_width, my)
+    frame[MOUTH[2], :2] = (mx + half_width, my)
+    frame[MOUTH[1], :2] = (mx, my - vertical / 2)
+    frame[MOUTH[3], :2] = (mx, my + vertical / 2)
+
+    frame[EYEBROWS, 1] = eyebrow_height
+    frame[:, :2] += rng.normal(0, noise, (len(frame), 2))
+    return frame
+
+
+def synthetic_sequence(seed=0, segments=12, noise=0.003):
+    """Generate one labeled sequence alternating idle gaps and gestures/expressions"""
+    rng = np.random.default_rng(seed)
+    face_base = np.column_stack([rng.uniform(0.35, 0.65, (468, 2)), np.zeros(468)])
+
+    landmarks, labels, face_landmarks, expressions = [], [], [], []
+
+    def add_segment(gesture, expression, frames):
+        for i in range(frames):
+            landmarks.append(_pose_frame(gesture, i / FPS, rng, noise))
+            labels.append(gesture)
+            face_landmarks.append(_face_frame(expression, rng, face_base, noise / 3))
+            expressions.append(expression)
+
+    for _ in range(segments):
+        add_segment('none', 'neutral', int(rng.integers(45, 75)))
+        gesture = GESTURE_LABELS[rng.integers(len(GESTURE_LABELS))]
+        expression = EXPRESSION_LABELS[1 + rng.integers(len(EXPRESSION_LABELS) - 1)]
+        add_segment(gesture, expression, int(rng.integers(60, 90)))
+    add_segment('none', 'neutral', 45)
+
+    return {
+        'name': f'synthetic-{seed}',
+        'landmarks': np.array(landmarks),
+        'labels': np.array(labels),
+        'face_landmarks': np.array(face_landmarks),
+        'expressions': np.array(expressions)
+    }
+
+
+def load_sequences(paths):
+    """Load recorded .npz sequences from files or directories"""
+    sequences = []
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, '*.npz'))) if os.path.isdir(path) else [path]
+        for file in files:
+            data = np.load(file, allow_pickle=False)
+            sequence = {key: data[key] for key in data.files}
+            sequence['name'] = os.path.basename(file)
+            sequences.append(sequence)
+    return sequences
+
+
+def save_sequence(sequence, path):
+    """Store a sequence in the recorded .npz format"""
+    np.savez_compressed(path, **{key: value for key, value in sequence.items() if key != 'name'})
+
+
+def segments(labels, background):
+    """Contiguous (label, start, end) runs of labels other than the background label"""
+    runs = []
+    start = 0
+    for i in range(1, len(labels) + 1):
+        if i == len(labels) or labels[i] != labels[start]:
+            if labels[start] != background:
+                runs.append((str(labels[start]), start, i))
+            start = i
+    return runs
@@ -0,0 +1,247 @@
+"""Gesture and expression benchmark with regression thresholds.
+
+Replays labeled landmark sequences (recorded .npz files or synthetic ones)
+through GestureRecognizer and FaceTracker.detect_expression and reports, per
+class, precision/recall, detection delay in frames from onset, and per-frame
+CPU time. Results can be saved as a baseline and later runs checked against it.
+
+Usage (from the repository root):
+    python -m benchmarks.gesture_expression --synthetic 4 --save-baseline benchmarks/gesture_baseline.json
+    python -m benchmarks.gesture_expression recordings/ --baseline benchmarks/gesture_baseline.json
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.corpus import FPS, load_sequences, segments, synthetic_sequence
+from utils.gesture_classifier import load_classifier
+from utils.gesture_recognizer import GestureRecognizer
+
+logger = logging.getLogger(__name__)
+
+# Allowed drift relative to the baseline before a run counts as a regression
+REGRESSION_THRESHOLDS = {
+    'precision_drop': 0.05,
+    'recall_drop': 0.05,
+    'delay_increase_frames': 3.0,
+    'cpu_time_ratio': 1.5
+}
+# Frames after a gesture ends in which a matching detection still counts
+DETECTION_GRACE_FRAMES = 10
+
+
+class ReplayClock:
+    """Deterministic clock advanced one frame at a time during replay"""
+
+    def __init__(self, fps=FPS):
+        self.frame = 0
+        self.fps = fps
+
+    def __call__(self):
+        return 1000.0 + self.frame / self.fps
+
+
+def replay_gestures(sequence, classifier=None):
+    """Feed a sequence frame by frame, returning detections and CPU time per frame"""
+    clock = ReplayClock()
+    recognizer = GestureRecognizer(classifier=classifier, clock=clock)
+    landmarks = sequence['landmarks']
+    detections = [None] * len(landmarks)
+    cpu_times = np.zeros(len(landmarks))
+
+    for i, frame in enumerate(landmarks):
+        clock.frame = i
+        start = time.process_time()
+        recognizer.add_landmarks(frame)
+        detections[i] = recognizer.detect_gestures()
+        cpu_times[i] = time.process_time() - start
+
+    return detections, cpu_times
+
+
+def replay_expressions(sequence, face_tracker):
+    """Classify each face frame, returning predictions and CPU time per frame"""
+    face_landmarks = sequence['face_landmarks']
+    predictions = [None] * len(face_landmarks)
+    cpu_times = np.zeros(len(face_landmarks))
+
+    for i, frame in enumerate(face_landmarks):
+        start = time.process_time()
+        predictions[i] = face_tracker.detect_expression(frame)
+        cpu_times[i] = time.process_time() - start
+
+    return predictions, cpu_times
+
+
+def score_events(labels, detections, background, grace_frames):
+    """Event-level precision/recall and onset delay per class.
+
+    A labeled segment is recalled if a matching detection occurs between its onset
+    and ``grace_frames`` after it ends; detections outside every matching segment
+    window are false positives.
+    """
+    stats = {}
+
+    def class_stats(label):
+        return stats.setdefault(label, {'tp': 0, 'fn': 0, 'fp': 0, 'delays': []})
+
+    runs = segments(labels, background)
+    matched = np.zeros(len(detections), dtype=bool)
+    for label, start, end in runs:
+        window_end = min(len(detections), end + grace_frames)
+        hits = [i for i in range(start, window_end) if detections[i] == label]
+        entry = class_stats(label)
+        if hits:
+            entry['tp'] += 1
+            entry['delays'].append(hits[0] - start)
+            matched[hits] = True
+        else:
+            entry['fn'] += 1
+
+    for i, detection in enumerate(detections):
+        if detection is not None and detection != background and not matched[i]:
+            class_stats(detection)['fp'] += 1
+
+    return stats
+
+
+def summarize(stats, cpu_times):
+    """Collapse accumulated counts into precision, recall, delay and CPU time"""
+    report = {'classes': {}}
+    for label, entry in sorted(stats.items()):
+        detected = entry['tp'] + entry['fp']
+        labeled = entry['tp'] + entry['fn']
+        report['classes'][label] = {
+            'precision': entry['tp'] / detected if detected else None,
+            'recall': entry['tp'] / labeled if labeled else None,
+            'mean_delay_frames': float(np.mean(entry['delays'])) if entry['delays'] else None,
+            'segments': labeled,
+            'false_positives': entry['fp']
+        }
+    cpu_times = np.concatenate(cpu_times) if cpu_times else np.zeros(1)
+    report['cpu_us_per_frame'] = {
+        'mean': float(np.mean(cpu_times) * 1e6),
+        'p95': float(np.percentile(cpu_times, 95) * 1e6)
+    }
+    return report
+
+
+def merge_stats(total, stats):
+    for label, entry in stats.items():
+        merged = total.setdefault(label, {'tp': 0, 'fn': 0, 'fp': 0, 'delays': []})
+        for key in ('tp', 'fn', 'fp'):
+            merged[key] += entry[key]
+        merged['delays'].extend(entry['delays'])
+
+
+def run_benchmark(sequences, classifier=None, include_expressions=True):
+    """Replay every sequence and produce the gesture and expression reports"""
+    gesture_stats, gesture_cpu = {}, []
+    expression_stats, expression_cpu = {}, []
+    face_tracker = None
+
+    for sequence in sequences:
+        detections, cpu_times = replay_gestures(sequence, classifier)
+        merge_stats(gesture_stats, score_events(sequence['labels'], detections, 'none',
+                                                DETECTION_GRACE_FRAMES))
+        gesture_cpu.append(cpu_times)
+
+        if include_expressions and 'face_landmarks' in sequence:
+            if face_tracker is None:
+                from utils.face_tracker import FaceTracker
+                face_tracker = FaceTracker()
+            predictions, cpu_times = replay_expressions(sequence, face_tracker)
+            # Expressions are per-frame states, so only onset changes count as events
+            events = [p if i == 0 or p != predictions[i - 1] else None for i, p in enumerate(predictions)]
+            merge_stats(expression_stats, score_events(sequence['expressions'], events, 'neutral', 0))
+            expression_cpu.append(cpu_times)
+
+    report = {'gestures': summarize(gesture_stats, gesture_cpu)}
+    if expression_cpu:
+        report['expressions'] = summarize(expression_stats, expression_cpu)
+    return report
+
+
+def find_regressions(report, baseline, thresholds=REGRESSION_THRESHOLDS):
+    """List human-readable regressions of a report against a baseline report"""
+    regressions = []
+    for section, base_section in baseline.items():
+        current = report.get(section)
+        if current is None:
+            continue
+        for label, base in base_section['classes'].items():
+            stats = current['classes'].get(label)
+            if stats is None:
+                continue
+            for metric, limit in (('precision', 'precision_drop'), ('recall', 'recall_drop')):
+                if base[metric] is not None and stats[metric] is not None:
+                    if stats[metric] < base[metric] - thresholds[limit]:
+                        regressions.append(f"{section}/{label} {metric} {stats[metric]:.2f} < "
+                                           f"baseline {base[metric]:.2f}")
+            if base['mean_delay_frames'] is not None and stats['mean_delay_frames'] is not None:
+                if stats['mean_delay_frames'] > base['mean_delay_frames'] + thresholds['delay_increase_frames']:
+                    regressions.append(f"{section}/{label} delay {stats['mean_delay_frames']:.1f} frames > "
+                                       f"baseline {base['mean_delay_frames']:.1f}")
+        base_cpu = base_section['cpu_us_per_frame']['mean']
+        cpu = current['cpu_us_per_frame']['mean']
+        if cpu > base_cpu * thresholds['cpu_time_ratio']:
+            regressions.append(f"{section} CPU {cpu:.1f}us/frame > {thresholds['cpu_time_ratio']}x "
+                               f"baseline {base_cpu:.1f}us")
+    return regressions
+
+
+def format_report(report):
+    lines = []
+    for section, data in report.items():
+        lines.append(f"{section}: {data['cpu_us_per_frame']['mean']:.1f}us/frame mean, "
+                     f"{data['cpu_us_per_frame']['p95']:.1f}us p95")
+        lines.append(f"  {'class':<16}{'precision':>10}{'recall':>8}{'delay':>8}{'segments':>10}{'fp':>6}")
+        for label, stats in data['classes'].items():
+            fmt = lambda value, spec: format(value, spec) if value is not None else 'n/a'
+            lines.append(f"  {label:<16}{fmt(stats['precision'], '.2f'):>10}{fmt(stats['recall'], '.2f'):>8}"
+                         f"{fmt(stats['mean_delay_frames'], '.1f'):>8}{stats['segments']:>10}"
+                         f"{stats['false_positives']:>6}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gesture and expression recognition')
+    parser.add_argument('recordings', nargs='*', help='Recorded .npz sequences or directories')
+    parser.add_argument('--synthetic', type=int, default=0, help='Number of synthetic sequences to add')
+    parser.add_argument('--seed', type=int, default=0, help='First synthetic sequence seed')
+    parser.add_argument('--classifier', default=None, help='Gesture classifier weights to evaluate')
+    parser.add_argument('--no-expressions', action='store_true', help='Skip expression benchmark')
+    parser.add_argument('--baseline', default=None, help='Fail if results regress against this report')
+    parser.add_argument('--save-baseline', default=None, help='Write this run as a new baseline')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sequences = load_sequences(args.recordings)
+    sequences += [synthetic_sequence(args.seed + i) for i in range(args.synthetic)]
+    if not sequences:
+        parser.error('No sequences: pass recordings or --synthetic N')
+
+    classifier = load_classifier(args.classifier) if args.classifier else None
+    report = run_benchmark(sequences, classifier, include_expressions=not args.no_expressions)
+    print(format_report(report))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Accuracy/latency report for the tracking precision tiers.
+
+Replays recorded clips through PoseTracker once per tier and reports per-frame
+latency alongside landmark error measured against the reference (top) tier.
+
+Usage (from the repository root):
+    python -m benchmarks.tracking_tiers clip1.mp4 clip2.mp4 [--tiers fast balanced] [--json report.json]
+"""
+import argparse
+import json
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from utils.pose_tracker import PoseTracker
+from utils.tracking_tiers import PRECISION_TIERS, REFERENCE_TIER
+
+logger = logging.getLogger(__name__)
+
+VISIBILITY_THRESHOLD = 0.5
+
+
+def load_clip(path, max_frames=None, max_dimension=640):
+    """Decode a clip into a list of BGR frames plus its frame rate"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise IOError(f"Unable to open clip: {path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        success, frame = capture.read()
+        if not success:
+            break
+        height, width = frame.shape[:2]
+        longest = max(height, width)
+        if longest > max_dimension:
+            scale = max_dimension / longest
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)),
+                               interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+    capture.release()
+    return frames, fps
+
+
+def run_tier(tier, frames, fps):
+    """Track every frame with a fresh tracker, returning landmarks and latencies"""
+    tracker = PoseTracker(tier=tier)
+    landmarks = np.full((len(frames), 33, 4), np.nan)
+    latencies = np.zeros(len(frames))
+
+    for i, frame in enumerate(frames):
+        start = time.perf_counter()
+        result = tracker.process_frame(frame, timestamp=i / fps)[0]
+        latencies[i] = time.perf_counter() - start
+        if result is not None:
+            landmarks[i] = result
+
+    return landmarks, latencies
+
+
+def landmark_error(landmarks, reference, frame_size):
+    """Mean pixel error over landmarks visible in both runs"""
+    height, width = frame_size
+    visible = ((landmarks[..., 3] > VISIBILITY_THRESHOLD) &
+               (reference[..., 3] > VISIBILITY_THRESHOLD))
+    if not np.any(visible):
+        return None
+
+    delta = (landmarks[..., :2] - reference[..., :2]) * np.array([width, height])
+    distances = np.linalg.norm(delta, axis=-1)
+    return float(np.mean(distances[visible]))
+
+
+def benchmark_clip(path, tiers, max_frames=None):
+    """Run every tier on one clip and summarise accuracy and latency"""
+    frames, fps = load_clip(path, max_frames)
+    if not frames:
+        raise ValueError(f"No frames decoded from clip: {path}")
+
+    runs = {tier: run_tier(tier, frames, fps) for tier in set(tiers) | {REFERENCE_TIER}}
+    reference = runs[REFERENCE_TIER][0]
+
+    report = {}
+    for tier in tiers:
+        landmarks, latencies = runs[tier]
+        detected = ~np.isnan(landmarks[:, 0, 0])
+        report[tier] = {
+            'frames': len(frames),
+            'detection_rate': float(np.mean(detected)),
+            'latency_mean_ms': float(np.mean(latencies) * 1000),
+            'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'fps': float(1.0 / np.mean(latencies)),
+            'error_px': landmark_error(landmarks, reference, frames[0].shape[:2])
+        }
+    return report
+
+
+def format_report(reports):
+    """Render per-clip reports as a plain-text table"""
+    lines = []
+    header = f"{'tier':<10}{'detect':>8}{'mean ms':>10}{'p95 ms':>10}{'fps':>8}{'err px':>10}"
+    for path, report in reports.items():
+        lines.append(path)
+        lines.append(header)
+        for tier, stats in report.items():
+            error = f"{stats['error_px']:.2f}" if stats['error_px'] is not None else 'n/a'
+            lines.append(f"{tier:<10}{stats['detection_rate']:>8.2f}{stats['latency_mean_ms']:>10.1f}"
+                         f"{stats['latency_p95_ms']:>10.1f}{stats['fps']:>8.1f}{error:>10}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare tracking precision tiers on recorded clips')
+    parser.add_argument('clips', nargs='+', help='Video files to replay')
+    parser.add_argument('--tiers', nargs='+', default=list(PRECISION_TIERS),
+                        choices=list(PRECISION_TIERS), help='Tiers to evaluate')
+    parser.add_argument('--max-frames', type=int, default=None, help='Limit frames per clip')
+    parser.add_argument('--json', dest='json_path', default=None, help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    reports = {path: benchmark_clip(path, args.tiers, args.max_frames) for path in args.clips}
+    print(format_report(reports))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,190 @@
 import sys
 import os
+import time
+import threading
+import cv2
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QProgressBar, QVBoxLayout, QWidget
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPalette, QColor
+from PyQt5.QtCore import Qt, QThread, QRect, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
 
-# Set the Qt platform to offscreen
-os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+# Render offscreen unless a platform is chosen (e.g. QT_QPA_PLATFORM=xcb for a visible window)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from utils.frame_pool import FramePool
+from utils.pose_tracker import PoseTracker
+from utils.smplx_renderer import SMPLXRenderer
+
+FRAME_BUDGET = 1 / 30  # Seconds per frame the inference load bar is measured against
+STATS_INTERVAL = 0.25  # Seconds between readout refreshes
+
+
+class LatestFrame:
+    """Single-slot mailbox between two threads; a newer frame replaces an unread one.
+
+    Frame buffers circulate: replaced and released frames go back to a free list
+    the producer writes into next, so it never allocates per frame and never
+    overwrites a frame the consumer still holds.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._free = []
+        self.dropped = 0
+
+    def put(self, frame, metadata):
+        with self._condition:
+            if self._item is not None:
+                self.dropped += 1
+                self._free.append(self._item[0])
+            self._item = (frame, metadata)
+            self._condition.notify()
+
+    def release(self, frame):
+        """Return a processed frame's buffer for reuse"""
+        with self._condition:
+            self._free.append(frame)
+
+    def reusable(self):
+        """A buffer that is safe to capture into, or None"""
+        with self._condition:
+            return self._free.pop() if self._free else None
+
+    def take(self, timeout=0.1):
+        """(frame, metadata), or None if nothing arrived within ``timeout``"""
+        with self._condition:
+            if self._item is None:
+                self._condition.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class CaptureThread(QThread):
+    """Read camera frames into recycled buffers and hand the newest to inference"""
+    failed = pyqtSignal(str)
+
+    def __init__(self, mailbox, camera_index=0):
+        super().__init__()
+        self.mailbox = mailbox
+        self.camera_index = camera_index
+
+    def run(self):
+        capture = cv2.VideoCapture(self.camera_index)
+        if not capture.isOpened():
+            self.failed.emit(f"Could not open camera {self.camera_index}")
+            return
+        try:
+            while not self.isInterruptionRequested():
+                ok, frame = capture.read(self.mailbox.reusable())
+                if not ok:
+                    self.failed.emit("Camera stopped delivering frames")
+                    return
+                self.mailbox.put(frame, time.time())
+        finally:
+            capture.release()
+
+
+class InferenceWorker(QThread):
+    """Track the pose and render the avatar for the newest captured frame"""
+    frame_ready = pyqtSignal()
+
+    def __init__(self, mailbox, display, tracking_tier=None):
+        super().__init__()
+        self.mailbox = mailbox
+        # Rendered frames wait here for the GUI; only the newest is painted
+        self.display = display
+        self.tracking_tier = tracking_tier
+        self.frame_pool = FramePool()
+
+    def run(self):
+        # MediaPipe graphs are created on the thread that uses them
+        tracker = PoseTracker(tier=self.tracking_tier, frame_pool=self.frame_pool)
+        renderer = SMPLXRenderer(frame_pool=self.frame_pool)
+        while not self.isInterruptionRequested():
+            item = self.mailbox.take()
+            if item is None:
+                continue
+            frame, capture_time = item
+            start = time.time()
+            landmarks, _, expression, _, _ = tracker.process_frame(frame, capture_time)
+            tracked = time.time()
+            self.mailbox.release(frame)
+            image = renderer.render_avatar(landmarks, expression, timestamp=capture_time)
+            # The renderer's pool recycles its buffers, so hand the GUI one it owns until release
+            shown = self.display.reusable()
+            if shown is None or shown.shape != image.shape:
+                shown = image.copy()
+            else:
+                shown[...] = image
+            self.display.put(shown, {
+                'capture_time': capture_time,
+                'inference': tracked - start,
+                'rendering': time.time() - tracked
+            })
+            self.frame_ready.emit()
+
+
+class AvatarView(QWidget):
+    """Paint rendered frames straight from their NumPy buffers"""
 
-class AvatarInterface(QMainWindow):
     def __init__(self):
+        super().__init__()
+        self._image = None
+        self._buffer = None
+        self.setMinimumSize(320, 240)
+
+    def set_frame(self, frame):
+        """Show ``frame`` and return the buffer it replaces, which is no longer referenced"""
+        # Wrap the buffer without copying; keep a reference so it outlives the QImage
+        height, width = frame.shape[:2]
+        previous, self._buffer = self._buffer, frame
+        self._image = QImage(frame.data, width, height, frame.strides[0], QImage.Format_RGB888)
+        self.update()
+        return previous
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self._image is not None:
+            size = self._image.size().scaled(self.size(), Qt.KeepAspectRatio)
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(self.rect().center())
+            painter.drawImage(target, self._image)
+        painter.end()
+
+
+class PipelineStats:
+    """Smoothed display rate, stage timings and capture-to-display latency"""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.values = {'fps': 0.0, 'latency': 0.0, 'inference': 0.0, 'rendering': 0.0}
+        self._last_display = None
+
+    def _update(self, key, value):
+        self.values[key] += self.smoothing * (value - self.values[key])
+
+    def record(self, timings, now=None):
+        now = time.time() if now is None else now
+        if self._last_display is not None and now > self._last_display:
+            self._update('fps', 1.0 / (now - self._last_display))
+        self._last_display = now
+        self._update('latency', now - timings['capture_time'])
+        self._update('inference', timings['inference'])
+        self._update('rendering', timings['rendering'])
+
+    def summary(self):
+        v = self.values
+        return (f"{v['fps']:.1f} fps | latency {v['latency'] * 1000:.0f} ms | "
+                f"inference {v['inference'] * 1000:.0f} ms | render {v['rendering'] * 1000:.1f} ms")
+
+
+class AvatarInterface(QMainWindow):
+    def __init__(self, camera_index=0, tracking_tier=None):
         super().__init__()
         self.setWindowTitle('Avatar Control Interface')
         self.setStyleSheet("""
@@ -35,6 +211,12 @@ class AvatarInterface(QMainWindow):
                 background-color: #00ff00;
             }
         """)
+        self.camera_index = camera_index
+        self.tracking_tier = tracking_tier or os.getenv('TRACKING_TIER')
+        self.capture_thread = None
+        self.inference_worker = None
+        self.stats = PipelineStats()
+        self._last_readout = 0
 
         # Create central widget and layout
         central_widget = QWidget()
@@ -42,32 +224,82 @@ class AvatarInterface(QMainWindow):
         layout = QVBoxLayout(central_widget)
 
         # Add widgets
+        self.avatar_view = AvatarView()
         self.response_label = QLabel("Waiting for command...")
         self.start_button = QPushButton("Start Interaction")
-        self.progress_bar = QProgressBar()
+        self.progress_bar = QProgressBar()  # Inference load relative to the frame budget
         self.progress_bar.setMaximum(100)
 
+        layout.addWidget(self.avatar_view, 1)
         layout.addWidget(self.response_label)
         layout.addWidget(self.start_button)
         layout.addWidget(self.progress_bar)
 
         # Connect signals
-        self.start_button.clicked.connect(self.start_interaction)
+        self.start_button.clicked.connect(self.toggle_pipeline)
 
         self.setMinimumSize(400, 200)
 
-    def start_interaction(self):
+    def toggle_pipeline(self):
+        if self.capture_thread is None:
+            self.start_pipeline()
+        else:
+            self.stop_pipeline()
+
+    def start_pipeline(self):
+        """Capture, track and render locally: no encoding, decoding or network hop"""
+        mailbox = LatestFrame()
+        self.display = LatestFrame()
+        self.stats = PipelineStats()
+        self.capture_thread = CaptureThread(mailbox, self.camera_index)
+        self.inference_worker = InferenceWorker(mailbox, self.display, self.tracking_tier)
+        self.capture_thread.failed.connect(self.on_pipeline_error)
+        self.inference_worker.frame_ready.connect(self.on_frame_ready)
+        self.inference_worker.start()
+        self.capture_thread.start()
+        self.start_button.setText("Stop Interaction")
+        self.response_label.setText("Starting camera...")
+
+    def stop_pipeline(self):
+        for thread in (self.capture_thread, self.inference_worker):
+            if thread is not None:
+                thread.requestInterruption()
+                thread.wait()
+        self.capture_thread = None
+        self.inference_worker = None
+        self.start_button.setText("Start Interaction")
         self.progress_bar.setValue(0)
-        QTimer.singleShot(100, self.update_progress)
 
-    def update_progress(self):
-        current = self.progress_bar.value()
-        if current < 100:
-            self.progress_bar.setValue(current + 1)
-            QTimer.singleShot(50, self.update_progress)
+    def on_pipeline_error(self, message):
+        self.stop_pipeline()
+        self.response_label.setText(message)
+
+    def on_frame_ready(self):
+        # Several signals may be queued for one frame; later ones find the slot empty
+        item = self.display.take(timeout=0)
+        if item is None:
+            return
+        frame, timings = item
+        previous = self.avatar_view.set_frame(frame)
+        if previous is not None:
+            self.display.release(previous)
+        now = time.time()
+        self.stats.record(timings, now)
+        if now - self._last_readout >= STATS_INTERVAL:
+            self._last_readout = now
+            self.response_label.setText(self.stats.summary())
+            load = self.stats.values['inference'] + self.stats.values['rendering']
+            self.progress_bar.setValue(int(min(100, load / FRAME_BUDGET * 100)))
+
+    def closeEvent(self, event):
+        self.stop_pipeline()
+        super().closeEvent(event)
 
 def launch_qt_interface():
     app = QApplication(sys.argv)
     window = AvatarInterface()
     window.show()
     app.exec_()  # Remove sys.exit to prevent main thread from exiting
+
+if __name__ == '__main__':
+    launch_qt_interface()
@@ -50,6 +50,10 @@ def create_app():
         app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'default_secret_key')
         app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
         
+        # Calibration profile store (pooled SQL connections)
+        from utils.profile_store import configure_database
+        configure_database(app)
+        
         # Configure Socket.IO with improved settings
         socketio = SocketIO(
             app,
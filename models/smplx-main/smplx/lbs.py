@@ -18,7 +18,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
 
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 import numpy as np
 
 import torch
@@ -163,6 +163,9 @@ def lbs(
     parents: Tensor,
     lbs_weights: Tensor,
     pose2rot: bool = True,
+    v_shaped: Optional[Tensor] = None,
+    J: Optional[Tensor] = None,
+    sparse_J_regressor: Optional[Tuple[Tensor, Tensor]] = None,
 ) -> Tuple[Tensor, Tensor]:
     ''' Performs Linear Blend Skinning with the given shape and pose parameters
 
@@ -191,6 +194,14 @@ def lbs(
             matrices. The default value is True. If False, then the pose tensor
             should already contain rotation matrices and have a size of
             Bx(J + 1)x9
+        v_shaped: torch.tensor BxVx3, optional
+            The shaped template, if already known. Together with `J` this
+            skips the shape blend and the joint regression (pose-only path)
+        J: torch.tensor BxJx3, optional
+            The rest joints of `v_shaped`. Both may have a batch size of 1
+        sparse_J_regressor: tuple of torch.tensor (JxK, JxK), optional
+            The index/weight form of `J_regressor` (see `sparse_regressor`);
+            if given, joints are regressed from the referenced vertices only
         dtype: torch.dtype, optional
 
         Returns
@@ -205,12 +216,16 @@ def lbs(
     batch_size = max(betas.shape[0], pose.shape[0])
     device, dtype = betas.device, betas.dtype
 
-    # Add shape contribution
-    v_shaped = v_template + blend_shapes(betas, shapedirs)
+    if v_shaped is None or J is None:
+        # Add shape contribution
+        v_shaped = v_template + blend_shapes(betas, shapedirs)
 
-    # Get the joints
-    # NxJx3 array
-    J = vertices2joints(J_regressor, v_shaped)
+        # Get the joints
+        # NxJx3 array
+        if sparse_J_regressor is not None:
+            J = vertices2joints_sparse(*sparse_J_regressor, v_shaped)
+        else:
+            J = vertices2joints(J_regressor, v_shaped)
 
     # 3. Add pose blend shapes
     # N x J x 3 x 3
@@ -232,7 +247,8 @@ def lbs(
 
     v_posed = pose_offsets + v_shaped
     # 4. Get the global joint location
-    J_transformed, A = batch_rigid_transform(rot_mats, J, parents, dtype=dtype)
+    J_transformed, A = batch_rigid_transform(
+        rot_mats, J.expand(batch_size, -1, -1), parents, dtype=dtype)
 
     # 5. Do skinning:
     # W is N x V x (J + 1)
@@ -272,6 +288,74 @@ def vertices2joints(J_regressor: Tensor, vertices: Tensor) -> Tensor:
     return torch.einsum('bik,ji->bjk', [vertices, J_regressor])
 
 
+def sparse_regressor(
+    J_regressor: Tensor,
+    eps: float = 0.0
+) -> Tuple[Tensor, Tensor]:
+    ''' Converts a dense regressor to per-joint index/weight pairs
+
+    Parameters
+    ----------
+    J_regressor : torch.tensor JxV
+        The dense regressor
+    eps : float, optional
+        Weights with an absolute value up to `eps` are dropped
+
+    Returns
+    -------
+    index : torch.tensor JxK, dtype = torch.long
+        The vertices each joint depends on, K being the largest number of
+        vertices of any joint. Shorter rows are padded with weight 0
+    weights : torch.tensor JxK
+        The regression weights of these vertices
+    '''
+    mask = J_regressor.abs() > eps
+    num_nonzero = max(int(mask.sum(dim=1).max()), 1)
+    # Stable sort puts every row's non-zero entries first, in vertex order
+    index = torch.sort(mask.to(torch.uint8), dim=1, descending=True,
+                       stable=True).indices[:, :num_nonzero]
+    weights = torch.gather(J_regressor, 1, index) * torch.gather(
+        mask, 1, index).to(J_regressor.dtype)
+    return index, weights
+
+
+def vertices2joints_sparse(
+    index: Tensor,
+    weights: Tensor,
+    vertices: Tensor
+) -> Tensor:
+    ''' Calculates the 3D joint locations from the vertices they depend on
+
+    Equivalent to `vertices2joints` with the regressor returned by
+    `sparse_regressor`, but only the vertices with a non-zero weight are
+    read.
+
+    Parameters
+    ----------
+    index : torch.tensor JxK
+        The vertex indices of each joint
+    weights : torch.tensor JxK
+        The regression weights of these vertices
+    vertices : torch.tensor BxVx3
+        The tensor of mesh vertices
+
+    Returns
+    -------
+    torch.tensor BxJx3
+        The location of the joints
+    '''
+    batch_size = vertices.shape[0]
+    num_joints, num_nonzero = index.shape
+    # Gather x, y and z of every referenced vertex in one flat lookup
+    coords = (index.unsqueeze(dim=-1) * 3 + torch.arange(
+        3, dtype=index.dtype, device=index.device)).view(-1)
+    gathered = torch.index_select(
+        vertices.reshape(batch_size, -1), 1, coords).view(
+            batch_size, num_joints, num_nonzero, 3)
+    # (J x 1 x K) x (B x J x K x 3) -> B x J x 1 x 3
+    return torch.matmul(weights.unsqueeze(dim=1), gathered).squeeze(dim=2)
+
+
 def blend_shapes(betas: Tensor, shape_disps: Tensor) -> Tensor:
     ''' Calculates the per vertex displacement due to the blend shapes
 
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# Max-Planck-Gesellschaft zur Förderung der Wissenschaften e.V. (MPG) is
+# holder of all proprietary rights on this computer program.
+# You can only use this computer program if you have closed
+# a license agreement with MPG or you get the right to use the computer
+# program from someone who is authorized to grant you that right.
+# Any use of the computer program without a valid license is prohibited and
+# liable to prosecution.
+#
+# Copyright©2019 Max-Planck-Gesellschaft zur Förderung
+# der Wissenschaften e.V. (MPG). acting on behalf of its Max Planck Institute
+# for Intelligent Systems and the Max Planck Institute for Biological
+# Cybernetics. All rights reserved.
+#
+# Contact: ps-license@tuebingen.mpg.de
+
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import os.path as osp
+import sys
+import time
+
+import argparse
+
+import torch
+
+sys.path.insert(0, osp.dirname(osp.dirname(osp.abspath(__file__))))
+import smplx  # noqa: E402
+from smplx.lbs import (  # noqa: E402
+    vertices2joints, vertices2joints_sparse, sparse_regressor)
+
+
+def time_function(function, repeats):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(model_folder, model_type='smplx', ext='npz', gender='neutral',
+         batch_sizes=(1, 8, 32, 128), repeats=50, device='cpu'):
+    model = smplx.create(model_folder, model_type=model_type,
+                         gender=gender, ext=ext)
+    J_regressor = model.J_regressor.to(device)
+    index, weights = sparse_regressor(J_regressor)
+    num_joints, num_verts = J_regressor.shape
+
+    print(f'{model.name()}: {num_joints} joints x {num_verts} vertices, '
+          f'at most {index.shape[1]} vertices per joint '
+          f'({index.numel() / J_regressor.numel():.1%} of the dense '
+          'regressor)')
+    print(f'Sparse path enabled in the model: {model.use_sparse_regressor}')
+    print(f'{"batch":>6} {"dense ms":>10} {"sparse ms":>10} '
+          f'{"speedup":>8} {"max diff":>10}')
+
+    with torch.no_grad():
+        for batch_size in batch_sizes:
+            vertices = torch.randn([batch_size, num_verts, 3],
+                                   dtype=J_regressor.dtype, device=device)
+            dense = vertices2joints(J_regressor, vertices)
+            sparse = vertices2joints_sparse(index, weights, vertices)
+            max_diff = (dense - sparse).abs().max().item()
+
+            def sync():
+                if vertices.is_cuda:
+                    torch.cuda.synchronize()
+
+            dense_time = time_function(
+                lambda: (vertices2joints(J_regressor, vertices), sync()),
+                repeats)
+            sparse_time = time_function(
+                lambda: (vertices2joints_sparse(index, weights, vertices),
+                         sync()),
+                repeats)
+            print(f'{batch_size:>6} {dense_time * 1000:>10.3f} '
+                  f'{sparse_time * 1000:>10.3f} '
+                  f'{dense_time / sparse_time:>7.1f}x {max_diff:>10.2e}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare dense and sparse joint regression')
+    parser.add_argument('--model-folder', required=True, type=str,
+                        help='The path to the model folder')
+    parser.add_argument('--model-type', default='smplx', type=str,
+                        choices=['smpl', 'smplh', 'smplx', 'mano', 'flame'],
+                        help='The type of model to load')
+    parser.add_argument('--gender', type=str, default='neutral',
+                        help='The gender of the model')
+    parser.add_argument('--ext', type=str, default='npz',
+                        help='Which extension to use for loading')
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 8, 32, 128],
+                        help='The batch sizes to time')
+    parser.add_argument('--repeats', type=int, default=50,
+                        help='Timed calls per batch size')
+    parser.add_argument('--device', type=str, default='cpu',
+                        help='The device to run on')
+
+    args = parser.parse_args()
+    main(osp.expanduser(osp.expandvars(args.model_folder)),
+         model_type=args.model_type, ext=args.ext, gender=args.gender,
+         batch_sizes=args.batch_sizes, repeats=args.repeats,
+         device=args.device)
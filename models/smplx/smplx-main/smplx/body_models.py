@@ -14,7 +14,7 @@
 #
 # Contact: ps-license@tuebingen.mpg.de
 
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, Union, Tuple
 import os
 import os.path as osp
 
@@ -26,7 +26,8 @@ import torch
 import torch.nn as nn
 
 from .lbs import (
-    lbs, vertices2landmarks, find_dynamic_lmk_idx_and_bcoords, blend_shapes)
+    lbs, vertices2landmarks, find_dynamic_lmk_idx_and_bcoords, blend_shapes,
+    vertices2joints, vertices2joints_sparse, sparse_regressor)
 
 from .vertex_ids import vertex_ids as VERTEX_IDS
 from .utils import (
@@ -50,6 +51,8 @@ class SMPL(nn.Module):
     NUM_JOINTS = 23
     NUM_BODY_JOINTS = 23
     SHAPE_SPACE_DIM = 300
+    # Largest fraction of the dense regressor the sparse one may occupy
+    SPARSE_REGRESSOR_DENSITY = 0.25
 
     def __init__(
         self, model_path: str,
@@ -253,6 +256,19 @@ class SMPL(nn.Module):
             data_struct.J_regressor), dtype=dtype)
         self.register_buffer('J_regressor', j_regressor)
 
+        # Each joint depends on a few dozen vertices at most, so keep the
+        # non-zero weights and regress joints with a gather when that is
+        # much smaller than the dense matrix
+        regressor_index, regressor_weights = sparse_regressor(j_regressor)
+        self.use_sparse_regressor = (
+            regressor_index.numel() <=
+            self.SPARSE_REGRESSOR_DENSITY * j_regressor.numel())
+        if self.use_sparse_regressor:
+            self.register_buffer('J_regressor_index', regressor_index,
+                                 persistent=False)
+            self.register_buffer('J_regressor_weights', regressor_weights,
+                                 persistent=False)
+
         # Pose blend shape basis: 6890 x 3 x 207, reshaped to 6890*3 x 207
         num_pose_basis = data_struct.posedirs.shape[-1]
         # 207 x 20670
@@ -268,6 +284,9 @@ class SMPL(nn.Module):
         lbs_weights = to_tensor(to_np(data_struct.weights), dtype=dtype)
         self.register_buffer('lbs_weights', lbs_weights)
 
+        # Shaped template and rest joints of the last betas, see shape_state
+        self._shape_cache = None
+
     @property
     def num_betas(self):
         return self._num_betas
@@ -304,6 +323,63 @@ class SMPL(nn.Module):
         ]
         return '\n'.join(msg)
 
+    def shape_state(self, betas: Tensor) -> Tuple[Tensor, Tensor]:
+        ''' Returns the shaped template and its rest joints for `betas`
+
+            Both depend only on the shape, which is usually constant for a
+            subject, so they are cached and reused until different betas are
+            passed; the pose-only forward path then skips the shape blend and
+            the joint regression. Betas that require gradients bypass the cache.
+
+            Parameters
+            ----------
+            betas: torch.tensor, BxN_b
+                The shape parameters
+
+            Returns
+            -------
+            v_shaped: torch.tensor, BxVx3
+            joints: torch.tensor, BxJx3
+        '''
+        if betas.requires_grad and torch.is_grad_enabled():
+            v_shaped = self.v_template + blend_shapes(betas, self.shapedirs)
+            return v_shaped, self.regress_joints(v_shaped)
+
+        cache = self._shape_cache
+        if (cache is None or cache[0].shape != betas.shape or
+                cache[0].device != betas.device or
+                cache[1].device != self.v_template.device or
+                cache[1].dtype != self.v_template.dtype or
+                not torch.equal(cache[0], betas)):
+            with torch.no_grad():
+                v_shaped = self.v_template + blend_shapes(
+                    betas, self.shapedirs)
+                joints = self.regress_joints(v_shaped)
+            cache = (betas.detach().clone(), v_shaped, joints)
+            self._shape_cache = cache
+        return cache[1], cache[2]
+
+    @property
+    def sparse_J_regressor(self) -> Optional[Tuple[Tensor, Tensor]]:
+        ''' The (index, weights) form of the joint regressor, or None when
+            the dense regressor is used
+        '''
+        if not self.use_sparse_regressor:
+            return None
+        return self.J_regressor_index, self.J_regressor_weights
+
+    def regress_joints(self, vertices: Tensor) -> Tensor:
+        ''' Regresses the joints of BxVx3 vertices, reading only the vertices
+            the joints depend on when the regressor is sparse
+        '''
+        if self.use_sparse_regressor:
+            return vertices2joints_sparse(*self.sparse_J_regressor, vertices)
+        return vertices2joints(self.J_regressor, vertices)
+
+    def clear_shape_cache(self) -> None:
+        ''' Drops the cached shape state, e.g. after editing the template '''
+        self._shape_cache = None
+
     def forward_shape(
         self,
         betas: Optional[Tensor] = None,
@@ -371,6 +447,7 @@ class SMPL(nn.Module):
         batch_size = max(betas.shape[0], global_orient.shape[0],
                          body_pose.shape[0])
 
+        v_shaped, rest_joints = self.shape_state(betas)
         if betas.shape[0] != batch_size:
             num_repeats = int(batch_size / betas.shape[0])
             betas = betas.expand(num_repeats, -1)
@@ -378,7 +455,8 @@ class SMPL(nn.Module):
         vertices, joints = lbs(betas, full_pose, self.v_template,
                                self.shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
-                               self.lbs_weights, pose2rot=pose2rot)
+                               self.lbs_weights, pose2rot=pose2rot,
+                               v_shaped=v_shaped, J=rest_joints)
 
         joints = self.vertex_joint_selector(vertices, joints)
         # Map the joints to the current dataset
@@ -484,7 +562,8 @@ class SMPLLayer(SMPL):
                                self.shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
                                self.lbs_weights,
-                               pose2rot=False)
+                               pose2rot=False,
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         joints = self.vertex_joint_selector(vertices, joints)
         # Map the joints to the current dataset
@@ -736,10 +815,12 @@ class SMPLH(SMPL):
                                right_hand_pose], dim=1)
         full_pose += self.pose_mean
 
+        v_shaped, rest_joints = self.shape_state(betas)
         vertices, joints = lbs(betas, full_pose, self.v_template,
                                self.shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
-                               self.lbs_weights, pose2rot=pose2rot)
+                               self.lbs_weights, pose2rot=pose2rot,
+                               v_shaped=v_shaped, J=rest_joints)
 
         # Add any extra joints that might be needed
         joints = self.vertex_joint_selector(vertices, joints)
@@ -868,7 +949,8 @@ class SMPLHLayer(SMPLH):
         vertices, joints = lbs(betas, full_pose, self.v_template,
                                self.shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
-                               self.lbs_weights, pose2rot=False)
+                               self.lbs_weights, pose2rot=False,
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         # Add any extra joints that might be needed
         joints = self.vertex_joint_selector(vertices, joints)
@@ -1086,6 +1168,9 @@ class SMPLX(SMPLH):
                                             requires_grad=True)
             self.register_parameter('expression', expression_param)
 
+        # Joint regression of the expression blend shapes, computed on first use
+        self._expression_joint_dirs = None
+
     def name(self) -> str:
         return 'SMPL-X'
 
@@ -1093,6 +1178,20 @@ class SMPLX(SMPLH):
     def num_expression_coeffs(self):
         return self._num_expression_coeffs
 
+    def expression_joint_dirs(self) -> Tensor:
+        ''' Returns the rest joint displacements of the expression blend
+            shapes (J x 3 x N_e); joint regression is linear, so expressions
+            can be added to cached rest joints without regressing vertices
+        '''
+        dirs = self._expression_joint_dirs
+        if (dirs is None or dirs.device != self.expr_dirs.device or
+                dirs.dtype != self.expr_dirs.dtype):
+            with torch.no_grad():
+                dirs = torch.einsum(
+                    'ji,ikl->jkl', [self.J_regressor, self.expr_dirs])
+            self._expression_joint_dirs = dirs
+        return dirs
+
     def create_mean_pose(self, data_struct, flat_hand_mean=False):
         # Create the array for the mean pose. If flat_hand is false, then use
         # the mean that is given by the data, rather than the flat open hand
@@ -1231,6 +1330,14 @@ class SMPLX(SMPLH):
 
         batch_size = max(betas.shape[0], global_orient.shape[0],
                          body_pose.shape[0])
+        # The betas part of the shape comes from the cache; expressions change
+        # every frame and are added on top, joints through their regressed
+        # expression directions
+        shaped_template, rest_joints = self.shape_state(betas)
+        v_shaped = shaped_template + blend_shapes(expression, self.expr_dirs)
+        rest_joints = rest_joints + blend_shapes(
+            expression, self.expression_joint_dirs())
+
         # Concatenate the shape and expression coefficients
         scale = int(batch_size / betas.shape[0])
         if scale > 1:
@@ -1244,6 +1351,7 @@ class SMPLX(SMPLH):
                                shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
                                self.lbs_weights, pose2rot=pose2rot,
+                               v_shaped=v_shaped, J=rest_joints,
                                )
 
         lmk_faces_idx = self.lmk_faces_idx.unsqueeze(
@@ -1284,7 +1392,7 @@ class SMPLX(SMPLH):
 
         v_shaped = None
         if return_shaped:
-            v_shaped = self.v_template + blend_shapes(betas, self.shapedirs)
+            v_shaped = shaped_template.expand(betas.shape[0], -1, -1)
         else:
             v_shaped = Tensor(0)
         output = SMPLXOutput(vertices=vertices if return_verts else None,
@@ -1449,7 +1557,7 @@ class SMPLXLayer(SMPLX):
                                self.J_regressor, self.parents,
                                self.lbs_weights,
                                pose2rot=False,
-                               )
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         lmk_faces_idx = self.lmk_faces_idx.unsqueeze(
             dim=0).expand(batch_size, -1).contiguous()
@@ -1691,7 +1799,7 @@ class MANO(SMPL):
                                self.shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
                                self.lbs_weights, pose2rot=True,
-                               )
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         # # Add pre-selected extra joints that might be needed
         # joints = self.vertex_joint_selector(vertices, joints)
@@ -1759,7 +1867,8 @@ class MANOLayer(MANO):
         vertices, joints = lbs(betas, full_pose, self.v_template,
                                self.shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
-                               self.lbs_weights, pose2rot=False)
+                               self.lbs_weights, pose2rot=False,
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         if self.joint_mapper is not None:
             joints = self.joint_mapper(joints)
@@ -2097,7 +2206,7 @@ class FLAME(SMPL):
                                shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
                                self.lbs_weights, pose2rot=pose2rot,
-                               )
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         lmk_faces_idx = self.lmk_faces_idx.unsqueeze(
             dim=0).expand(batch_size, -1).contiguous()
@@ -2247,7 +2356,7 @@ class FLAMELayer(FLAME):
                                shapedirs, self.posedirs,
                                self.J_regressor, self.parents,
                                self.lbs_weights, pose2rot=False,
-                               )
+                               sparse_J_regressor=self.sparse_J_regressor)
 
         lmk_faces_idx = self.lmk_faces_idx.unsqueeze(
             dim=0).expand(batch_size, -1).contiguous()
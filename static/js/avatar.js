@@ -1,36 +1,191 @@
-let scene, camera, renderer, avatar;
-
-function initAvatar() {
-    scene = new THREE.Scene();
-    camera = new THREE.PerspectiveCamera(75, window.innerWidth / 2 / window.innerHeight, 0.1, 1000);
-    
-    renderer = new THREE.WebGLRenderer();
-    renderer.setSize(window.innerWidth / 2, window.innerHeight);
-    document.getElementById('avatar-container').appendChild(renderer.domElement);
-
-    // Load SMPL-X model
-    const loader = new THREE.ObjectLoader();
-    loader.load('/static/models/avatar_model.json', function(obj) {
-        avatar = obj;
-        scene.add(avatar);
-    });
-
-    camera.position.z = 5;
-    animate();
-}
+// Skinned SMPL-X avatar rendered on the client GPU.
+// The mesh, skinning weights and shape directions are fetched once from /avatar/model;
+// the server then sends betas once ('avatar_shape') and a small binary frame of
+// quantized joint rotations and root translation per tick ('avatar_pose').
+
+const POSE_STREAM_VERSION = 1;
+const POSE_HEADER_SIZE = 24;  // uint8 version, uint8 joints, uint16 sequence, float64 timestamp, 3 x float32 translation
+const ROTATION_SCALE = Math.PI / 32767;
+const TRANSLATION_SCALE = 0.8;  // Metres the avatar moves for half a frame of hip motion
 
-function animate() {
-    requestAnimationFrame(animate);
-    renderer.render(scene, camera);
+function decodeBase64(data, ArrayType) {
+    const bytes = Uint8Array.from(atob(data), (c) => c.charCodeAt(0));
+    return new ArrayType(bytes.buffer);
 }
 
-function updateAvatarPose(poseData) {
-    if (!avatar) return;
-    
-    // Map pose landmarks to avatar joints
-    // This is a simplified version - actual implementation would need full SMPL-X integration
-    avatar.rotation.x = poseData[0].y;
-    avatar.rotation.y = poseData[0].x;
+class SmplxViewer {
+    constructor(container) {
+        this.container = container;
+        this.scene = new THREE.Scene();
+        this.camera = new THREE.PerspectiveCamera(35, 4 / 3, 0.1, 100);
+        this.renderer = new THREE.WebGLRenderer({ antialias: true, alpha: true });
+        this.renderer.setPixelRatio(window.devicePixelRatio);
+        container.appendChild(this.renderer.domElement);
+
+        this.scene.add(new THREE.HemisphereLight(0xffffff, 0x444444, 0.8));
+        const light = new THREE.DirectionalLight(0xffffff, 0.6);
+        light.position.set(1, 2, 3);
+        this.scene.add(light);
+
+        this.mesh = null;
+        this.bones = [];
+        this.model = null;
+        this.restRoot = new THREE.Vector3();
+        this.pendingShape = null;
+        this.lastSequence = -1;
+        this._axis = new THREE.Vector3();
+
+        this.resize();
+        window.addEventListener('resize', () => this.resize());
+        this.ready = this.load();
+        this.animate();
+    }
+
+    async load() {
+        const response = await fetch('/avatar/model');
+        if (!response.ok) {
+            throw new Error(`Avatar model unavailable (${response.status})`);
+        }
+        const model = await response.json();
+        this.model = {
+            numBetas: model.num_betas,
+            parents: model.parents,
+            template: decodeBase64(model.positions, Float32Array),
+            shapeScale: model.shape_scale,
+            shapeOffsets: decodeBase64(model.shape_offsets, Int16Array),
+            joints: decodeBase64(model.joints, Float32Array),
+            jointShapedirs: decodeBase64(model.joint_shapedirs, Float32Array)
+        };
+
+        const geometry = new THREE.BufferGeometry();
+        geometry.setAttribute('position', new THREE.BufferAttribute(this.model.template.slice(), 3));
+        geometry.setAttribute('skinIndex', new THREE.BufferAttribute(decodeBase64(model.skin_index, Uint16Array), 4));
+        geometry.setAttribute('skinWeight', new THREE.BufferAttribute(decodeBase64(model.skin_weight, Float32Array), 4));
+        geometry.setIndex(new THREE.BufferAttribute(decodeBase64(model.index, Uint32Array), 1));
+
+        this.bones = model.parents.map(() => new THREE.Bone());
+        model.parents.forEach((parent, i) => {
+            if (parent >= 0) {
+                this.bones[parent].add(this.bones[i]);
+            }
+        });
+
+        const material = new THREE.MeshStandardMaterial({ color: 0x3498db, skinning: true, roughness: 0.7 });
+        this.mesh = new THREE.SkinnedMesh(geometry, material);
+        this.mesh.add(this.bones[0]);
+        this.mesh.bind(new THREE.Skeleton(this.bones));
+        this.scene.add(this.mesh);
+
+        this.setShape(this.pendingShape || new Array(this.model.numBetas).fill(0));
+    }
+
+    // Reshape the rest mesh and skeleton; runs once per session on the CPU
+    setShape(betas) {
+        if (!this.mesh) {
+            this.pendingShape = betas;
+            return;
+        }
+        const { numBetas, template, shapeScale, shapeOffsets, joints, jointShapedirs, parents } = this.model;
+        const count = Math.min(numBetas, betas.length);
+
+        const positions = this.mesh.geometry.attributes.position.array;
+        positions.set(template);
+        const size = template.length;
+        for (let b = 0; b < count; b++) {
+            const weight = betas[b] * shapeScale;
+            if (weight === 0) continue;
+            const offset = b * size;
+            for (let i = 0; i < size; i++) {
+                positions[i] += weight * shapeOffsets[offset + i];
+            }
+        }
+        this.mesh.geometry.attributes.position.needsUpdate = true;
+        this.mesh.geometry.computeVertexNormals();
+        this.mesh.geometry.computeBoundingSphere();
+
+        // Shaped rest joints -> bone offsets relative to their parents
+        const shaped = joints.slice();
+        for (let b = 0; b < count; b++) {
+            const offset = b * joints.length;
+            for (let i = 0; i < joints.length; i++) {
+                shaped[i] += betas[b] * jointShapedirs[offset + i];
+            }
+        }
+        this.bones.forEach((bone, j) => {
+            const parent = parents[j];
+            bone.quaternion.identity();
+            bone.position.set(shaped[3 * j], shaped[3 * j + 1], shaped[3 * j + 2]);
+            if (parent >= 0) {
+                bone.position.x -= shaped[3 * parent];
+                bone.position.y -= shaped[3 * parent + 1];
+                bone.position.z -= shaped[3 * parent + 2];
+            }
+        });
+        this.restRoot.copy(this.bones[0].position);
+        this.lastSequence = -1;  // A shape message starts a new stream
+        this.mesh.updateMatrixWorld(true);
+        this.mesh.skeleton.calculateInverses();
+        this.camera.position.set(this.restRoot.x, this.restRoot.y + 0.2, 3.5);
+        this.camera.lookAt(this.restRoot.x, this.restRoot.y + 0.2, 0);
+    }
+
+    setColor(hex) {
+        if (this.mesh) {
+            this.mesh.material.color.set(hex);
+        }
+    }
+
+    // Apply one binary pose frame; stale frames (older sequence) are ignored
+    applyPose(buffer) {
+        if (!this.mesh) return;
+        const view = new DataView(buffer);
+        if (view.getUint8(0) !== POSE_STREAM_VERSION) return;
+        const numJoints = Math.min(view.getUint8(1), this.bones.length);
+        const sequence = view.getUint16(2, true);
+        const age = (sequence - this.lastSequence) & 0xffff;
+        if (this.lastSequence >= 0 && (age === 0 || age > 0x8000)) return;
+        this.lastSequence = sequence;
+
+        let offset = POSE_HEADER_SIZE;
+        for (let j = 0; j < numJoints; j++, offset += 6) {
+            const x = view.getInt16(offset, true) * ROTATION_SCALE;
+            const y = view.getInt16(offset + 2, true) * ROTATION_SCALE;
+            const z = view.getInt16(offset + 4, true) * ROTATION_SCALE;
+            const angle = Math.sqrt(x * x + y * y + z * z);
+            const bone = this.bones[j];
+            if (angle < 1e-8) {
+                bone.quaternion.identity();
+            } else {
+                bone.quaternion.setFromAxisAngle(this._axis.set(x / angle, y / angle, z / angle), angle);
+            }
+        }
+        this.bones[0].position.set(
+            this.restRoot.x + TRANSLATION_SCALE * view.getFloat32(12, true),
+            this.restRoot.y + TRANSLATION_SCALE * view.getFloat32(16, true),
+            this.restRoot.z + TRANSLATION_SCALE * view.getFloat32(20, true)
+        );
+    }
+
+    resize() {
+        const width = this.container.clientWidth || 640;
+        const height = Math.round(width * 3 / 4);
+        this.renderer.setSize(width, height);
+        this.camera.aspect = width / height;
+        this.camera.updateProjectionMatrix();
+    }
+
+    animate() {
+        requestAnimationFrame(() => this.animate());
+        this.renderer.render(this.scene, this.camera);
+    }
 }
 
-window.addEventListener('load', initAvatar);
+// Connect a viewer to the server's pose stream; returns the viewer
+function connectSmplxViewer(socket, container) {
+    const viewer = new SmplxViewer(container);
+    viewer.ready.catch((error) => console.error('Error loading avatar model:', error));
+    socket.on('avatar_shape', (data) => viewer.setShape(data.betas));
+    socket.on('avatar_pose', (buffer) => viewer.applyPose(buffer));
+    socket.emit('avatar_stream', { enabled: true });
+    return viewer;
+}
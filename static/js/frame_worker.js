@@ -0,0 +1,23 @@
+// Encodes captured video frames to JPEG off the main thread.
+// Receives {bitmap, quality} (the ImageBitmap is transferred) and replies with
+// {buffer} (transferred ArrayBuffer of JPEG bytes) or {error}.
+let canvas = null;
+let ctx = null;
+
+self.onmessage = async (event) => {
+    const { bitmap, quality } = event.data;
+    try {
+        if (!canvas || canvas.width !== bitmap.width || canvas.height !== bitmap.height) {
+            canvas = new OffscreenCanvas(bitmap.width, bitmap.height);
+            ctx = canvas.getContext('2d');
+        }
+        ctx.drawImage(bitmap, 0, 0);
+        const blob = await canvas.convertToBlob({ type: 'image/jpeg', quality });
+        const buffer = await blob.arrayBuffer();
+        self.postMessage({ buffer }, [buffer]);
+    } catch (error) {
+        self.postMessage({ error: error.message });
+    } finally {
+        bitmap.close();
+    }
+};
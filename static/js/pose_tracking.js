@@ -36,9 +36,28 @@ async function setupPoseDetection() {
     detect();
 }
 
+// Landmarks go to the server as 33 x (x, y, z, visibility) float32s, so it can
+// skip image decoding and inference entirely
+const poseBuffer = new Float32Array(33 * 4);
+let poseVisible = false;
+
 function onPoseResults(results) {
     if (results.poseLandmarks) {
-        socket.emit('pose_data', results.poseLandmarks);
+        results.poseLandmarks.forEach((landmark, i) => {
+            poseBuffer[i * 4] = landmark.x;
+            poseBuffer[i * 4 + 1] = landmark.y;
+            poseBuffer[i * 4 + 2] = landmark.z;
+            poseBuffer[i * 4 + 3] = landmark.visibility ?? 1.0;
+        });
+        socket.emit('pose_data', {
+            landmarks: poseBuffer.buffer.slice(0),
+            width: results.image.width,
+            height: results.image.height
+        });
+        poseVisible = true;
+    } else if (poseVisible) {
+        socket.emit('pose_data', null);  // Pose lost
+        poseVisible = false;
     }
 }
 
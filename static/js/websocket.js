@@ -10,29 +10,58 @@ socket.on('avatar_update', (data) => {
 
 socket.on('voice_response', (data) => {
     console.log('Voice response:', data);
+    if (data.audio) {
+        new Audio(data.audio).play().catch((error) => console.error('Error playing reply:', error));
+    }
+});
+
+socket.on('voice_partial', (data) => {
+    console.log('Partial transcript:', data.transcript);
 });
 
-// Handle audio recording and voice commands
-let mediaRecorder;
-let audioChunks = [];
+// Stream microphone audio as 16-bit PCM chunks while a voice command is spoken,
+// so the server can return partial transcripts before the utterance ends
+const VOICE_CHUNK_SIZE = 4096;  // Samples per chunk (~85 ms at 48 kHz)
+let audioContext;
+let audioSource;
+let audioProcessor;
+let voiceStreaming = false;
 
 async function setupVoiceRecording() {
     try {
         const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        mediaRecorder = new MediaRecorder(stream);
-        
-        mediaRecorder.ondataavailable = (event) => {
-            audioChunks.push(event.data);
-        };
+        audioContext = new AudioContext();
+        audioSource = audioContext.createMediaStreamSource(stream);
+        audioProcessor = audioContext.createScriptProcessor(VOICE_CHUNK_SIZE, 1, 1);
         
-        mediaRecorder.onstop = () => {
-            const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
-            socket.emit('voice_command', audioBlob);
-            audioChunks = [];
+        audioProcessor.onaudioprocess = (event) => {
+            if (!voiceStreaming) return;
+            const samples = event.inputBuffer.getChannelData(0);
+            const pcm = new Int16Array(samples.length);
+            for (let i = 0; i < samples.length; i++) {
+                const s = Math.max(-1, Math.min(1, samples[i]));
+                pcm[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+            }
+            socket.emit('voice_chunk', pcm.buffer);
         };
+        audioSource.connect(audioProcessor);
+        audioProcessor.connect(audioContext.destination);
     } catch (error) {
         console.error('Error accessing microphone:', error);
     }
 }
 
+function startVoiceCommand() {
+    if (!audioContext || voiceStreaming) return;
+    audioContext.resume();
+    socket.emit('voice_stream_start', { sampleRate: audioContext.sampleRate });
+    voiceStreaming = true;
+}
+
+function stopVoiceCommand() {
+    if (!voiceStreaming) return;
+    voiceStreaming = false;
+    socket.emit('voice_stream_end');
+}
+
 window.addEventListener('load', setupVoiceRecording);
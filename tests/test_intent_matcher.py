@@ -0,0 +1,68 @@
+import pytest
+
+from utils.intent_matcher import INTENTS, SLOT_VALUES, IntentMatcher
+
+
+def filled_phrases():
+    """Every phrase of the table with each slot set to its first value"""
+    for entry in INTENTS:
+        for phrase in entry['phrases']:
+            values = {slot: next(iter(SLOT_VALUES[slot])) for slot in SLOT_VALUES}
+            yield entry['intent'], phrase.format(**values), values
+
+
+@pytest.mark.parametrize('intent, text, values', list(filled_phrases()))
+def test_every_phrase_matches_its_intent(intent, text, values):
+    match = IntentMatcher().match(text)
+    assert match is not None and match['intent'] == intent
+    assert match['confidence'] == 1.0
+    for slot, value in match['data'].items():
+        assert value == SLOT_VALUES[slot][values[slot]]
+
+
+@pytest.mark.parametrize('text, intent, data', [
+    ('Could you change the colour to blue please', 'change_color', {'color': '#0000ff'}),
+    ('change colour to gren', 'change_color', {'color': '#00ff00'}),
+    ('make it dashed', 'change_style', {'style': 'dashed'}),
+    ('use mesh', 'change_mode', {'mode': 'mesh'}),
+    ('calibrate me now', 'start_calibration', {}),
+])
+def test_paraphrases_above_threshold(text, intent, data):
+    match = IntentMatcher().match(text)
+    assert match is not None and match['confidence'] >= 0.7
+    assert (match['intent'], match['data']) == (intent, data)
+
+
+@pytest.mark.parametrize('text', [
+    'calibrate the camera',
+    'what is the weather like',
+    'change color to red and then dance and sing',
+    '',
+])
+def test_below_threshold_falls_back(text):
+    assert IntentMatcher().match(text) is None
+
+
+@pytest.mark.parametrize('text', [
+    'do not change color to red',
+    "don't make it blue",
+    'never switch to mesh mode',
+    'no red color',
+    "please don't calibrate me",
+    "I didn't say use dashed style",
+])
+def test_negated_commands_fall_back(text):
+    assert IntentMatcher().match(text) is None
+
+
+def test_threshold_is_configurable():
+    assert IntentMatcher(min_confidence=0.4).match('calibrate the camera')['intent'] == 'start_calibration'
+    assert IntentMatcher(min_confidence=0.8).match('use mesh') is None
+
+
+def test_metrics_count_local_and_fallback():
+    matcher = IntentMatcher()
+    matcher.match('turn red')
+    matcher.match('do not turn red')
+    matcher.match('tell me a story')
+    assert matcher.metrics() == {'local': 1, 'fallback': 2, 'hit_rate': 1 / 3}
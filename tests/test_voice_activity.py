@@ -0,0 +1,57 @@
+import numpy as np
+
+from utils.voice_activity import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+FRAME_BYTES = 2 * SAMPLE_RATE * 20 // 1000
+
+
+def pcm(seconds, kind, level=0.001, seed=0):
+    """16-bit PCM of a harmonic speech-like tone, white noise at ``level`` or digital silence"""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    if kind == 'speech':
+        signal = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 20)) * 0.2
+    elif kind == 'noise':
+        signal = np.random.default_rng(seed).normal(0, level, len(t))
+    else:
+        signal = np.zeros(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def speech_frames(vad, audio, chunk_bytes=3200):
+    forwarded = sum(len(vad.process(audio[i:i + chunk_bytes])) for i in range(0, len(audio), chunk_bytes))
+    return forwarded // FRAME_BYTES
+
+
+def test_speech_at_stream_open_is_kept():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    audio = pcm(1.0, 'speech') + pcm(0.2, 'noise') + pcm(1.0, 'speech')
+    # 100 speech frames; the short pause is held back and forwarded once speech resumes
+    assert speech_frames(vad, audio) >= 100
+    assert vad.noise_db <= vad.min_energy_db
+
+
+def test_floor_rises_after_digital_silence():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    speech_frames(vad, pcm(0.5, 'silence'))
+    assert vad.noise_db >= vad.min_energy_db - vad.margin_db
+    assert speech_frames(vad, pcm(3.0, 'noise', level=0.006)) == 0
+    assert vad.noise_db > vad.min_energy_db
+    assert speech_frames(vad, pcm(1.0, 'speech')) >= 50
+
+
+def test_quiet_start_is_not_speech():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    assert speech_frames(vad, pcm(1.0, 'noise')) == 0
+    assert speech_frames(vad, pcm(0.6, 'speech')) >= 30
+
+
+def test_reset_keeps_noise_floor_and_clears_stats():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    speech_frames(vad, pcm(1.0, 'noise', level=0.003) + pcm(0.5, 'speech'))
+    floor = vad.noise_db
+    assert vad.in_speech and vad.stats['speech_frames'] > 0
+    vad.reset()
+    assert vad.noise_db == floor
+    assert not vad.in_speech
+    assert vad.stats == {'frames': 0, 'speech_frames': 0}
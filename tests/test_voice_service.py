@@ -0,0 +1,155 @@
+import time
+import threading
+from concurrent import futures
+
+import numpy as np
+import pytest
+
+grpc = pytest.importorskip('grpc')
+speech_v1 = pytest.importorskip('google.cloud.speech_v1')
+dialogflow = pytest.importorskip('google.cloud.dialogflow')
+
+from utils.voice_service import VoiceService
+
+SAMPLE_RATE = 16000
+
+
+class FakeSpeech:
+    """StreamingRecognize: one interim result on the first audio, a final one when audio ends"""
+
+    def __init__(self, interim, final):
+        self.interim = interim
+        self.final = final
+        self.config = None
+        self.audio_bytes = 0
+        self.finished = threading.Event()
+
+    def streaming_recognize(self, requests, context):
+        try:
+            for request in requests:
+                if 'streaming_config' in request:
+                    self.config = request.streaming_config
+                    continue
+                first = self.audio_bytes == 0
+                self.audio_bytes += len(request.audio_content)
+                if first:
+                    yield speech_v1.StreamingRecognizeResponse(results=[speech_v1.StreamingRecognitionResult(
+                        alternatives=[speech_v1.SpeechRecognitionAlternative(transcript=self.interim)],
+                        stability=0.4)])
+            yield speech_v1.StreamingRecognizeResponse(results=[speech_v1.StreamingRecognitionResult(
+                alternatives=[speech_v1.SpeechRecognitionAlternative(transcript=self.final)],
+                is_final=True)])
+        finally:
+            self.finished.set()
+
+
+class FakeSessions:
+    """DetectIntent: a fixed reply, recording the queries it was asked"""
+
+    def __init__(self, reply, intent):
+        self.reply = reply
+        self.intent = intent
+        self.queries = []
+
+    def detect_intent(self, request, context):
+        self.queries.append((request.session, request.query_input.text.text))
+        return dialogflow.DetectIntentResponse(query_result=dialogflow.QueryResult(
+            fulfillment_text=self.reply, intent=dialogflow.Intent(display_name=self.intent)))
+
+
+@pytest.fixture
+def fake_cloud():
+    speech = FakeSpeech(interim='tell me', final='tell me a story')
+    sessions = FakeSessions(reply='Once upon a time.', intent='story')
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    server.add_generic_rpc_handlers((
+        grpc.method_handlers_generic_handler('google.cloud.speech.v1.Speech', {
+            'StreamingRecognize': grpc.stream_stream_rpc_method_handler(
+                speech.streaming_recognize,
+                request_deserializer=speech_v1.StreamingRecognizeRequest.deserialize,
+                response_serializer=speech_v1.StreamingRecognizeResponse.serialize)
+        }),
+        grpc.method_handlers_generic_handler('google.cloud.dialogflow.v2.Sessions', {
+            'DetectIntent': grpc.unary_unary_rpc_method_handler(
+                sessions.detect_intent,
+                request_deserializer=dialogflow.DetectIntentRequest.deserialize,
+                response_serializer=dialogflow.DetectIntentResponse.serialize)
+        })
+    ))
+    port = server.add_insecure_port('localhost:0')
+    server.start()
+    service = VoiceService(project_id='test-project', speech_endpoint=f'localhost:{port}',
+                           dialogflow_endpoint=f'localhost:{port}', pool_size=1)
+    yield service, speech, sessions
+    service.shutdown(wait=True)
+    server.stop(None)
+
+
+def pcm(seconds, voiced):
+    """16-bit PCM: a harmonic, speech-like tone or faint noise"""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    if voiced:
+        signal = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 20)) * 0.2
+    else:
+        signal = np.random.default_rng(0).normal(0, 0.001, len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def send(stream, audio, chunk_bytes=3200):
+    for start in range(0, len(audio), chunk_bytes):
+        stream.write(audio[start:start + chunk_bytes])
+
+
+def wait_for(service, event, timeout=5.0):
+    """All events drained until ``event`` is published"""
+    events = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        events += service.drain_events()
+        if any(name == event for _, name, _ in events):
+            return events
+        time.sleep(0.01)
+    raise AssertionError(f"No {event} within {timeout}s, got {events}")
+
+
+def test_streams_partials_then_final_reply(fake_cloud):
+    service, speech, sessions = fake_cloud
+    stream = service.start_stream('client-1', SAMPLE_RATE)
+    send(stream, pcm(0.3, voiced=False) + pcm(0.8, voiced=True))
+    events = wait_for(service, 'voice_partial')
+    send(stream, pcm(0.5, voiced=False))
+    stream.end()
+    events += wait_for(service, 'voice_response')
+
+    partials = [payload for _, name, payload in events if name == 'voice_partial']
+    assert partials[0] == {'transcript': 'tell me', 'stability': 0.4}
+    session_id, name, reply = events[-1]
+    assert (session_id, name) == ('client-1', 'voice_response')
+    assert reply['transcript'] == 'tell me a story'
+    assert reply['text'] == 'Once upon a time.'
+    assert reply['intent'] == 'story'
+    assert sessions.queries == [('projects/test-project/agent/sessions/client-1', 'tell me a story')]
+    assert speech.config.config.sample_rate_hertz == SAMPLE_RATE
+    assert speech.config.interim_results
+
+
+def test_silence_skips_recognition(fake_cloud):
+    service, speech, sessions = fake_cloud
+    stream = service.start_stream('client-1', SAMPLE_RATE)
+    send(stream, pcm(1.0, voiced=False))
+    stream.end()
+    events = wait_for(service, 'voice_response')
+    assert events[-1][2] == {'text': None, 'intent': None, 'transcript': ''}
+    assert speech.config is None and not sessions.queries
+
+
+def test_cancel_publishes_nothing(fake_cloud):
+    service, speech, sessions = fake_cloud
+    stream = service.start_stream('client-1', SAMPLE_RATE)
+    send(stream, pcm(0.3, voiced=False) + pcm(0.8, voiced=True))
+    wait_for(service, 'voice_partial')
+    stream.cancel()
+    assert speech.finished.wait(5.0)
+    service.shutdown(wait=True)
+    assert service.drain_events() == []
+    assert not sessions.queries
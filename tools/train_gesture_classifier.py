@@ -0,0 +1,129 @@
+"""Train the windowed gesture classifier used by GestureRecognizer.
+
+Training reuses the vendored MediaPipe model_maker gesture_recognizer tooling
+(hyperparameters, model options, focal loss and training loop); the classification
+head is then exported as plain NumPy arrays so inference needs no TensorFlow.
+
+Input recordings are .npz files holding ``landmarks`` (T, 33, 4) pose landmarks and
+``labels`` (T,) with the gesture active at each frame (``none`` otherwise). Every
+frame with a full history becomes one training window labelled by its last frame.
+
+Usage (from the repository root, with tensorflow installed):
+    python -m tools.train_gesture_classifier recordings/*.npz --output models/gesture_classifier.npz
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+
+from utils.gesture_classifier import GestureClassifier, NONE_LABEL, window_features
+
+logger = logging.getLogger(__name__)
+
+VENDORED_MEDIAPIPE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'static', 'models', 'mediapipe-master', 'mediapipe')
+
+
+def import_model_maker():
+    """Expose the vendored model_maker sources as part of the installed mediapipe package"""
+    import mediapipe
+    if VENDORED_MEDIAPIPE not in mediapipe.__path__:
+        mediapipe.__path__.append(VENDORED_MEDIAPIPE)
+
+    from mediapipe.model_maker.python.core.data import classification_dataset
+    from mediapipe.model_maker.python.vision.gesture_recognizer import gesture_recognizer
+    from mediapipe.model_maker.python.vision.gesture_recognizer import gesture_recognizer_options
+    from mediapipe.model_maker.python.vision.gesture_recognizer import hyperparameters
+    from mediapipe.model_maker.python.vision.gesture_recognizer import model_options
+    return classification_dataset, gesture_recognizer, gesture_recognizer_options, hyperparameters, model_options
+
+
+def load_windows(paths, window_length):
+    """Slice labelled recordings into (N, T, 33, 4) windows and (N,) labels"""
+    windows, labels = [], []
+    for path in paths:
+        data = np.load(path, allow_pickle=False)
+        landmarks = data['landmarks']
+        frame_labels = [str(label) for label in data['labels']]
+        for end in range(window_length, len(landmarks) + 1):
+            windows.append(landmarks[end - window_length:end])
+            labels.append(frame_labels[end - 1])
+    return np.stack(windows), labels
+
+
+def build_dataset(classification_dataset, features, label_ids, label_names):
+    """Wrap features and one-hot labels in a model_maker ClassificationDataset"""
+    import tensorflow as tf
+    one_hot = tf.one_hot(label_ids, depth=len(label_names))
+    dataset = tf.data.Dataset.from_tensor_slices((features.astype(np.float32), one_hot))
+    return classification_dataset.ClassificationDataset(
+        dataset=dataset, label_names=label_names, size=len(features))
+
+
+def export_head(model, labels, window_length, threshold):
+    """Fold the trained BatchNorm/ReLU/Dense head into a NumPy GestureClassifier"""
+    import tensorflow as tf
+    batch_norm = next(layer for layer in model.layers
+                      if isinstance(layer, tf.keras.layers.BatchNormalization))
+    dense = model.get_layer('custom_gesture_recognizer_out')
+
+    gamma, beta, moving_mean, moving_variance = batch_norm.get_weights()
+    scale = gamma / np.sqrt(moving_variance + batch_norm.epsilon)
+    shift = beta - moving_mean * scale
+    weights, bias = dense.get_weights()
+    return GestureClassifier(labels, scale, shift, weights, bias,
+                             window_length=window_length, threshold=threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the windowed gesture classifier')
+    parser.add_argument('recordings', nargs='+', help='Labelled landmark recordings (.npz)')
+    parser.add_argument('--output', default='models/gesture_classifier.npz', help='Exported weights')
+    parser.add_argument('--export-dir', default='/tmp/gesture_classifier', help='Training checkpoints')
+    parser.add_argument('--window-length', type=int, default=30)
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--dropout-rate', type=float, default=0.1)
+    parser.add_argument('--validation-fraction', type=float, default=0.2)
+    parser.add_argument('--threshold', type=float, default=0.6, help='Minimum confidence at runtime')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    (classification_dataset, gesture_recognizer, gesture_recognizer_options,
+     hyperparameters, model_options) = import_model_maker()
+
+    windows, labels = load_windows(args.recordings, args.window_length)
+    label_names = sorted(set(labels) | {NONE_LABEL})
+    label_ids = np.array([label_names.index(label) for label in labels])
+    features = window_features(windows)
+    logger.info(f"Loaded {len(features)} windows, {features.shape[1]} features, labels {label_names}")
+
+    data = build_dataset(classification_dataset, features, label_ids, label_names)
+    train_data, validation_data = data.split(1 - args.validation_fraction)
+
+    class WindowGestureRecognizer(gesture_recognizer.GestureRecognizer):
+        """model_maker gesture recognizer trained on landmark windows instead of hand embeddings"""
+
+        def __init__(self, *recognizer_args, **recognizer_kwargs):
+            super().__init__(*recognizer_args, **recognizer_kwargs)
+            self.embedding_size = features.shape[1]
+
+    options = gesture_recognizer_options.GestureRecognizerOptions(
+        # No hidden layers: the exported head stays a single matrix multiply
+        model_options=model_options.GestureRecognizerModelOptions(
+            dropout_rate=args.dropout_rate, layer_widths=[]),
+        hparams=hyperparameters.HParams(
+            learning_rate=args.learning_rate, batch_size=args.batch_size,
+            epochs=args.epochs, export_dir=args.export_dir))
+    recognizer = WindowGestureRecognizer.create(train_data, validation_data, options)
+
+    classifier = export_head(recognizer._model, label_names, args.window_length, args.threshold)
+    classifier.save(args.output)
+    logger.info(f"Exported gesture classifier to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDORED_SMPLX = os.path.join(ROOT_DIR, 'models', 'smplx-main')
+DEFAULT_MODEL_PATH = os.path.join(ROOT_DIR, 'models', 'smplx_models')
+NUM_BETAS = 10
+
+# MediaPipe pose landmark index -> SMPL-X joint index
+MEDIAPIPE_TO_SMPLX = {
+    11: 16,  # left_shoulder
+    12: 17,  # right_shoulder
+    13: 18,  # left_elbow
+    14: 19,  # right_elbow
+    15: 20,  # left_wrist
+    16: 21,  # right_wrist
+    23: 1,   # left_hip
+    24: 2,   # right_hip
+    25: 4,   # left_knee
+    26: 5,   # right_knee
+    27: 7,   # left_ankle
+    28: 8    # right_ankle
+}
+
+
+def import_smplx():
+    """Import the vendored smplx under models/, which caches the shaped template per
+    betas and regresses joints sparsely; an installed package is only a fallback"""
+    if os.path.isdir(VENDORED_SMPLX) and VENDORED_SMPLX not in sys.path:
+        sys.path.insert(0, VENDORED_SMPLX)
+    import smplx
+    if not hasattr(smplx.SMPL, 'shape_state'):
+        logger.warning(f"Using smplx from {os.path.dirname(smplx.__file__)} instead of {VENDORED_SMPLX}; "
+                       "shape caching and sparse joint regression are unavailable")
+    return smplx
+
+
+@lru_cache(maxsize=4)
+def load_body_model(gender='neutral', num_betas=NUM_BETAS):
+    """Load an SMPL-X model once per process; returns None if the model files are unavailable"""
+    model_path = os.getenv('SMPLX_MODEL_PATH', DEFAULT_MODEL_PATH)
+    try:
+        smplx = import_smplx()
+        model = smplx.create(model_path, model_type='smplx', gender=gender,
+                             num_betas=num_betas, use_pca=False)
+        model.eval()
+        logger.info(f"Loaded SMPL-X {gender} model from {model_path}")
+        return model
+    except Exception as e:
+        logger.error(f"SMPL-X model unavailable at {model_path}: {str(e)}")
+        return None
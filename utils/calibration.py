@@ -2,6 +2,7 @@ import time
 from enum import Enum
 import numpy as np
 import logging
+from .temporal_filter import OneEuroFilter
 
 logger = logging.getLogger(__name__)
 
@@ -30,14 +31,25 @@ class CalibrationGuide:
             'body_rotation': 0.2,   # Made more sensitive
             'squat_depth': 0.15     # Adjusted for better squat detection
         }
+        self.default_thresholds = dict(self.movement_thresholds)
         self.movement_progress = {
             'left': 0,
             'right': 0,
             'up': 0,
             'down': 0
         }
-        self.movement_history = []  # Track recent movements for smoothing
-        self.history_size = 5       # Number of frames to keep for smoothing
+        self.movement_filters = {}  # One-Euro filter per tracked movement
+        
+        # Profile data collected during calibration and persisted per user/device
+        self.movement_ranges = {}     # Raw measurement [min, max] per movement
+        self.limb_proportions = {}    # Limb lengths relative to torso length
+        self._proportion_samples = 0
+        self.profile_pending = False  # Set once calibration completes, until saved
+        
+        # Instruction version, bumped on every state change; clients get the full
+        # instruction once per version and only progress deltas in between
+        self.version = 0
+        self._sent_progress = {}
         self.instructions = {
             CalibrationState.NOT_STARTED: {
                 "title": "🎯 Let's Calibrate Your Avatar",
@@ -117,9 +129,86 @@ class CalibrationGuide:
         self.current_state = CalibrationState.HEAD_TURN
         self.state_start_time = time.time()
         self.reset_movement_progress()
-        self.movement_history = []
+        self.movement_ranges = {}
+        self.limb_proportions = {}
+        self._proportion_samples = 0
+        self.profile_pending = False
+        self._bump_version()
         return self.get_current_instruction()
         
+    @property
+    def is_calibrating(self):
+        """True while one of the guided movement stages is running"""
+        return self.current_state not in (CalibrationState.NOT_STARTED, CalibrationState.COMPLETED)
+        
+    def to_profile(self):
+        """Serialize calibration results for persistence"""
+        return {
+            'completed': self.current_state == CalibrationState.COMPLETED,
+            'movement_ranges': dict(self.movement_ranges),
+            'limb_proportions': dict(self.limb_proportions),
+            'thresholds': dict(self.movement_thresholds)
+        }
+        
+    def load_profile(self, profile):
+        """Restore a stored profile; a completed profile skips calibration entirely"""
+        if not profile:
+            return False
+        self.movement_ranges = dict(profile.get('movement_ranges', {}))
+        self.limb_proportions = dict(profile.get('limb_proportions', {}))
+        self.movement_thresholds.update(profile.get('thresholds', {}))
+        if profile.get('completed'):
+            logger.info("Loaded completed calibration profile")
+            self.current_state = CalibrationState.COMPLETED
+            self.state_start_time = None
+            self._bump_version()
+        return True
+        
+    def consume_completed_profile(self):
+        """Return the profile once after calibration completes, otherwise None"""
+        if not self.profile_pending:
+            return None
+        self.profile_pending = False
+        return self.to_profile()
+        
+    def _record_range(self, movement, value):
+        """Track the observed range of a raw movement measurement"""
+        value = float(value)
+        low, high = self.movement_ranges.get(movement, (value, value))
+        self.movement_ranges[movement] = [min(low, value), max(high, value)]
+        
+    def _update_limb_proportions(self, landmarks):
+        """Running mean of limb lengths relative to torso length (frontal stages only)"""
+        points = landmarks[:, :2]
+        shoulder_center = (points[11] + points[12]) / 2
+        hip_center = (points[23] + points[24]) / 2
+        torso = np.linalg.norm(shoulder_center - hip_center)
+        if torso <= 0:
+            return
+            
+        segments = {
+            'shoulder_width': (11, 12),
+            'upper_arm': ((11, 13), (12, 14)),
+            'forearm': ((13, 15), (14, 16)),
+            'hip_width': (23, 24),
+            'thigh': ((23, 25), (24, 26)),
+            'shin': ((25, 27), (26, 28))
+        }
+        self._proportion_samples += 1
+        for name, pairs in segments.items():
+            if isinstance(pairs[0], int):
+                pairs = (pairs,)
+            length = np.mean([np.linalg.norm(points[a] - points[b]) for a, b in pairs]) / torso
+            previous = self.limb_proportions.get(name, 0.0)
+            self.limb_proportions[name] = previous + (float(length) - previous) / self._proportion_samples
+            
+    def _tune_thresholds(self):
+        """Adapt movement thresholds to the ranges this user actually reached"""
+        for movement, (_, peak) in self.movement_ranges.items():
+            if movement in self.movement_thresholds:
+                default = self.default_thresholds[movement]
+                self.movement_thresholds[movement] = float(max(0.5 * default, min(default, 0.9 * peak)))
+        
     def reset_movement_progress(self):
         """Reset progress tracking with initialization logging"""
         logger.info(f"Resetting movement progress for state: {self.current_state}")
@@ -129,35 +218,34 @@ class CalibrationGuide:
             'up': 0,
             'down': 0
         }
-        self.movement_history = []
+        self.movement_filters = {}
         
     def _smooth_movement(self, new_value, direction):
-        """Apply smoothing to movement detection"""
-        self.movement_history.append({direction: new_value})
-        if len(self.movement_history) > self.history_size:
-            self.movement_history.pop(0)
+        """Apply One-Euro smoothing to movement detection"""
+        movement_filter = self.movement_filters.get(direction)
+        if movement_filter is None:
+            movement_filter = OneEuroFilter(min_cutoff=1.0, beta=0.1, shape=())
+            self.movement_filters[direction] = movement_filter
             
-        # Calculate smoothed value using weighted average
-        weights = np.linspace(0.5, 1.0, len(self.movement_history))
-        smoothed = 0
-        weight_sum = 0
+        return float(movement_filter(new_value))
         
-        for i, hist in enumerate(self.movement_history):
-            if direction in hist:
-                smoothed += hist[direction] * weights[i]
-                weight_sum += weights[i]
-                
-        return smoothed / weight_sum if weight_sum > 0 else 0
+    def _bump_version(self):
+        self.version += 1
+        self._sent_progress = {}
         
     def update_calibration(self, landmarks):
-        """Update calibration state with enhanced feedback"""
+        """Update calibration state; returns the full instruction only when the state changed"""
         if landmarks is None or self.current_state == CalibrationState.COMPLETED:
-            return self.get_current_instruction()
+            return None
             
         if self.state_start_time is None:
-            return self.get_current_instruction()
+            return None
             
+        version = self.version
         try:
+            if self.current_state in (CalibrationState.HEAD_TURN, CalibrationState.ARMS_RAISE):
+                self._update_limb_proportions(landmarks)
+                
             # Update movement progress with smoothing
             self._update_movement_progress(landmarks)
             
@@ -166,14 +254,12 @@ class CalibrationGuide:
                 logger.info(f"Completed calibration state: {self.current_state}")
                 self._advance_state()
                 
-            # Get updated instruction
-            instruction = self.get_current_instruction()
-            instruction['animation'] = self._get_animation_hints()
-            return instruction
-            
         except Exception as e:
             logger.error(f"Error updating calibration: {str(e)}")
+            
+        if self.version != version:
             return self.get_current_instruction()
+        return None
         
     def _update_movement_progress(self, landmarks):
         """Update movement detection with improved accuracy"""
@@ -184,6 +270,7 @@ class CalibrationGuide:
             
             # Calculate head rotation with enhanced detection
             head_rotation = abs(nose[0] - (left_ear[0] + right_ear[0])/2)
+            self._record_range('head_rotation', head_rotation)
             smoothed = self._smooth_movement(
                 head_rotation / self.movement_thresholds['head_rotation'],
                 'rotation'
@@ -201,6 +288,7 @@ class CalibrationGuide:
             # Enhanced arm raise detection
             left_raise = max(0, left_shoulder[1] - left_wrist[1])
             right_raise = max(0, right_shoulder[1] - right_wrist[1])
+            self._record_range('arm_raise', max(left_raise, right_raise))
             
             smoothed = self._smooth_movement(
                 max(left_raise, right_raise) / self.movement_thresholds['arm_raise'],
@@ -219,8 +307,9 @@ class CalibrationGuide:
             shoulder_width = abs(right_shoulder[0] - left_shoulder[0])
             hip_alignment = abs(hip_center[0] - (left_shoulder[0] + right_shoulder[0])/2)
             
-            rotation = min(1.0, (1 - shoulder_width) / self.movement_thresholds['body_rotation'] + 
-                         hip_alignment / self.movement_thresholds['body_rotation'])
+            raw_rotation = (1 - shoulder_width) + hip_alignment
+            self._record_range('body_rotation', raw_rotation)
+            rotation = min(1.0, raw_rotation / self.movement_thresholds['body_rotation'])
             
             smoothed = self._smooth_movement(rotation, 'rotation')
             
@@ -238,6 +327,7 @@ class CalibrationGuide:
             ankle_height = ankle_center[1]
             
             squat_depth = (knee_height - ankle_height) / (hip_height - ankle_height)
+            self._record_range('squat_depth', squat_depth)
             smoothed = self._smooth_movement(
                 squat_depth / self.movement_thresholds['squat_depth'],
                 'squat'
@@ -275,10 +365,17 @@ class CalibrationGuide:
             logger.info(f"Advancing from {prev_state} to {self.current_state}")
             self.state_start_time = time.time()
             self.reset_movement_progress()
+            self._bump_version()
+            if self.current_state == CalibrationState.COMPLETED:
+                self._tune_thresholds()
+                self.profile_pending = True
         else:
             logger.info("Calibration completed successfully")
             self.current_state = CalibrationState.COMPLETED
             self.state_start_time = None
+            self._tune_thresholds()
+            self.profile_pending = True
+            self._bump_version()
             
     def _get_animation_hints(self):
         """Provide enhanced animation hints for smoother visualization"""
@@ -313,34 +410,59 @@ class CalibrationGuide:
             }
         }.get(self.current_state, None)
         
-    def get_current_instruction(self):
-        """Get current instruction with enhanced progress tracking"""
-        instruction = self.instructions[self.current_state]
+    def _overall_progress(self):
+        """Percentage of the current stage completed"""
+        if self.current_state in (CalibrationState.NOT_STARTED, CalibrationState.COMPLETED):
+            return 0
+        if self.current_state in [CalibrationState.HEAD_TURN, CalibrationState.BODY_TURN]:
+            return int((self.movement_progress['left'] + self.movement_progress['right']) * 50)
+        return int((self.movement_progress['up'] + self.movement_progress['down']) * 50)
         
-        # Calculate detailed progress
-        progress = 0
-        if self.current_state != CalibrationState.NOT_STARTED and self.current_state != CalibrationState.COMPLETED:
-            if self.current_state in [CalibrationState.HEAD_TURN, CalibrationState.BODY_TURN]:
-                progress = int((self.movement_progress['left'] + self.movement_progress['right']) * 50)
-            elif self.current_state == CalibrationState.ARMS_RAISE:
-                progress = int((self.movement_progress['up'] + self.movement_progress['down']) * 50)
-            elif self.current_state == CalibrationState.SQUAT:
-                progress = int((self.movement_progress['down'] + self.movement_progress['up']) * 50)
-                
-        # Add time remaining if applicable
-        time_remaining = None
+    def _time_remaining(self):
+        """Whole seconds left in the current stage, if it is timed"""
         if self.state_start_time and self.current_state in self.state_durations:
             elapsed = time.time() - self.state_start_time
-            remaining = max(0, self.state_durations[self.current_state] - elapsed)
-            time_remaining = int(remaining)
+            return int(max(0, self.state_durations[self.current_state] - elapsed))
+        return None
+        
+    def get_progress_delta(self):
+        """Progress fields changed since the last call, tagged with the instruction version"""
+        current = {
+            'progress': self._overall_progress(),
+            'time_remaining': self._time_remaining()
+        }
+        delta = {key: value for key, value in current.items() if self._sent_progress.get(key) != value}
+        
+        sent_movement = self._sent_progress.setdefault('movement_progress', {})
+        movement = {}
+        for direction, value in self.movement_progress.items():
+            value = round(float(value), 2)
+            if sent_movement.get(direction) != value:
+                movement[direction] = value
+                sent_movement[direction] = value
+        if movement:
+            delta['movement_progress'] = movement
             
+        if not delta:
+            return None
+        self._sent_progress.update(current)
+        delta['version'] = self.version
+        return delta
+        
+    def get_current_instruction(self):
+        """Full instruction for the current state (sent once per version)"""
+        instruction = self.instructions[self.current_state]
+        self._sent_progress = {}
+        self.get_progress_delta()  # The full instruction carries the current progress
         return {
+            "version": self.version,
             "state": self.current_state.value,
             "title": instruction["title"],
             "text": instruction["text"],
             "details": instruction["details"],
             "success_criteria": instruction["success_criteria"],
-            "progress": progress,
-            "time_remaining": time_remaining,
-            "movement_progress": self.movement_progress
+            "animation": self._get_animation_hints(),
+            "progress": self._sent_progress['progress'],
+            "time_remaining": self._sent_progress['time_remaining'],
+            "movement_progress": dict(self._sent_progress['movement_progress'])
         }
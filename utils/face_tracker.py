@@ -1,15 +1,17 @@
 import mediapipe as mp
 import numpy as np
 import cv2
+from .tracking_tiers import get_tier
 
 class FaceTracker:
-    def __init__(self):
+    def __init__(self, tier=None):
+        self.tier, tier_settings = get_tier(tier)
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
+            refine_landmarks=tier_settings['refine_landmarks'],
+            min_detection_confidence=tier_settings['min_detection_confidence'],
+            min_tracking_confidence=tier_settings['min_tracking_confidence']
         )
         
         # Define facial expression landmarks for common expressions
@@ -20,18 +22,20 @@ class FaceTracker:
             'eyebrows': [70, 63, 105, 66, 107, 336, 296, 334, 293, 300]
         }
         
-    def process_frame(self, frame):
-        """Process a frame and return face landmarks"""
+    def process_frame(self, frame, image_rgb=None):
+        """Process a frame and return face landmarks (pass ``image_rgb`` to skip the conversion)"""
         if frame is None:
             return None
             
         # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if image_rgb is None:
+            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        writeable = image_rgb.flags.writeable
         image_rgb.flags.writeable = False
         
         # Process the frame
         results = self.face_mesh.process(image_rgb)
-        image_rgb.flags.writeable = True
+        image_rgb.flags.writeable = writeable
         
         if not results.multi_face_landmarks:
             return None
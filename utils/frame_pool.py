@@ -0,0 +1,42 @@
+import numpy as np
+
+
+class FramePool:
+    """Reusable image buffers for one session.
+
+    Each named buffer is double-buffered: consecutive ``acquire`` calls for the
+    same name alternate between slots, so the image handed out for the previous
+    frame (e.g. one still being encoded or emitted) is never overwritten by the
+    next one. Buffers are reallocated only when the requested shape changes.
+    """
+
+    def __init__(self, depth=2):
+        self.depth = depth
+        self._slots = {}
+        self._next = {}
+
+    def acquire(self, name, shape, dtype=np.uint8, zero=False):
+        """Next buffer for ``name``; contents are stale unless ``zero`` is set"""
+        shape = tuple(shape)
+        slots = self._slots.get(name)
+        if slots is None or slots[0].shape != shape or slots[0].dtype != dtype:
+            slots = [np.empty(shape, dtype=dtype) for _ in range(self.depth)]
+            self._slots[name] = slots
+            self._next[name] = 0
+
+        index = self._next[name]
+        self._next[name] = (index + 1) % self.depth
+        buffer = slots[index]
+        if zero:
+            buffer.fill(0)
+        return buffer
+
+    def copy(self, name, image):
+        """Pooled equivalent of ``image.copy()``"""
+        buffer = self.acquire(name, image.shape, image.dtype)
+        np.copyto(buffer, image)
+        return buffer
+
+    def release(self):
+        self._slots.clear()
+        self._next.clear()
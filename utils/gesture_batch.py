@@ -0,0 +1,115 @@
+import time
+import logging
+import numpy as np
+from .gesture_classifier import NONE_LABEL, window_features
+from .gesture_recognizer import (MIN_WAVE_AMPLITUDE, MIN_WAVE_CYCLES, POINTING_ARM_ANGLE,
+                                 MIN_CLAPS, RAISED_HAND_MARGIN)
+
+logger = logging.getLogger(__name__)
+
+GESTURES = ('waving', 'pointing', 'clapping', 'raising_hand')
+
+
+class BatchGestureEvaluator:
+    """Evaluate gestures for every active session in one set of vectorized operations.
+
+    Landmark windows of all registered GestureRecognizers are stacked into a single
+    (sessions, T, 33, 4) tensor per tick; detections are dispatched back to each
+    recognizer, which applies its own cooldowns. A window is only evaluated after a
+    new frame arrived, so stale windows (slow or lost tracking) never re-detect.
+    """
+
+    def __init__(self, history_length=30, num_landmarks=33, classifier=None, capacity=8):
+        self.history_length = history_length
+        self.num_landmarks = num_landmarks
+        self.classifier = classifier
+        self.recognizers = {}
+        self._evaluated_frames = {}  # session_id -> frames_seen at its last evaluation
+        self._windows = np.zeros((capacity, history_length, num_landmarks, 4))
+
+    def register(self, session_id, recognizer):
+        """Route a session's gesture detection through the batched evaluator"""
+        recognizer.batched = True
+        self.recognizers[session_id] = recognizer
+
+    def unregister(self, session_id):
+        recognizer = self.recognizers.pop(session_id, None)
+        self._evaluated_frames.pop(session_id, None)
+        if recognizer is not None:
+            recognizer.batched = False
+
+    def _stack_windows(self, recognizers):
+        """Copy every ready session's window into the preallocated batch tensor"""
+        if len(recognizers) > len(self._windows):
+            capacity = max(len(recognizers), 2 * len(self._windows))
+            self._windows = np.zeros((capacity, self.history_length, self.num_landmarks, 4))
+        for i, recognizer in enumerate(recognizers):
+            recognizer.current_window(out=self._windows[i])
+        return self._windows[:len(recognizers)]
+
+    def evaluate(self, current_time=None):
+        """Run one tick; returns {session_id: gesture or None} for sessions whose full window moved"""
+        if current_time is None:
+            current_time = time.time()
+
+        ready = [(session_id, recognizer) for session_id, recognizer in self.recognizers.items()
+                 if recognizer.count >= self.history_length and
+                 recognizer.frames_seen != self._evaluated_frames.get(session_id)]
+        if not ready:
+            return {}
+        for session_id, recognizer in ready:
+            self._evaluated_frames[session_id] = recognizer.frames_seen
+
+        windows = self._stack_windows([recognizer for _, recognizer in ready])
+        if self.classifier is not None:
+            detections = self._classify(windows)
+        else:
+            detections = self._detect_heuristics(windows)
+
+        results = {}
+        for (session_id, recognizer), detected in zip(ready, detections):
+            results[session_id] = recognizer.apply_detections(detected, current_time)
+        return results
+
+    def _classify(self, windows):
+        """Batched classifier scores: one (sessions, F) x (F, C) matrix multiply"""
+        probabilities = self.classifier.scores(window_features(windows))
+        best = np.argmax(probabilities, axis=1)
+        confidence = probabilities[np.arange(len(best)), best]
+        detections = []
+        for label_idx, score in zip(best, confidence):
+            label = self.classifier.labels[label_idx]
+            confident = score >= self.classifier.threshold and label != NONE_LABEL
+            detections.append([label] if confident else [])
+        return detections
+
+    def _detect_heuristics(self, windows):
+        """Compute every heuristic gesture feature for all sessions at once"""
+        current = windows[:, -1]
+
+        # Waving: zero crossings of wrist x around its window mean, plus amplitude
+        wrist_x = windows[:, :, 15:17, 0]
+        signs = np.signbit(wrist_x - wrist_x.mean(axis=1, keepdims=True))
+        crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1)
+        amplitude = np.ptp(wrist_x, axis=1)
+        waving = np.any((crossings >= MIN_WAVE_CYCLES * 2) & (amplitude > MIN_WAVE_AMPLITUDE), axis=1)
+
+        # Pointing: angle between upper arm and forearm on the current frame
+        upper_arm = current[:, 13:15, :3] - current[:, 11:13, :3]
+        forearm = current[:, 15:17, :3] - current[:, 13:15, :3]
+        norms = np.linalg.norm(upper_arm, axis=-1) * np.linalg.norm(forearm, axis=-1)
+        cosine = np.divide(np.einsum('sij,sij->si', upper_arm, forearm), norms,
+                           out=np.ones_like(norms), where=norms > 0)
+        pointing = np.any(np.arccos(np.clip(cosine, -1.0, 1.0)) > POINTING_ARM_ANGLE, axis=1)
+
+        # Clapping: enough local minima of the hand distance
+        distances = np.linalg.norm(windows[:, :, 15, :3] - windows[:, :, 16, :3], axis=-1)
+        interior = distances[:, 1:-1]
+        minima = np.count_nonzero((interior < distances[:, :-2]) & (interior < distances[:, 2:]), axis=1)
+        clapping = minima >= MIN_CLAPS
+
+        # Raising hand: a wrist well above its shoulder on the current frame
+        raising_hand = np.any(current[:, 15:17, 1] < current[:, 11:13, 1] - RAISED_HAND_MARGIN, axis=1)
+
+        flags = np.stack([waving, pointing, clapping, raising_hand], axis=1)
+        return [[GESTURES[g] for g in np.flatnonzero(row)] for row in flags]
@@ -0,0 +1,105 @@
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper-body landmarks used as classifier input: nose, shoulders, elbows, wrists, hips
+FEATURE_LANDMARKS = np.array([0, 11, 12, 13, 14, 15, 16, 23, 24])
+NONE_LABEL = 'none'
+DEFAULT_CLASSIFIER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'gesture_classifier.npz')
+
+
+def window_features(windows):
+    """Normalize (..., T, 33, 4) landmark windows into flat (..., T * 9 * 2) feature vectors.
+
+    Each frame is centered on the shoulder midpoint and the window is scaled by
+    its mean shoulder width, so features are invariant to position and distance.
+    """
+    windows = np.asarray(windows)
+    points = windows[..., FEATURE_LANDMARKS, :2]
+    center = (windows[..., 11:12, :2] + windows[..., 12:13, :2]) / 2
+    shoulder_width = np.linalg.norm(windows[..., 11, :2] - windows[..., 12, :2], axis=-1)
+    scale = np.maximum(shoulder_width.mean(axis=-1), 1e-3)[..., None, None, None]
+    features = (points - center) / scale
+    return features.reshape(*features.shape[:-3], -1)
+
+
+class GestureClassifier:
+    """Linear gesture classifier over normalized landmark windows.
+
+    Weights are trained offline (tools/train_gesture_classifier.py) and exported as
+    NumPy arrays, so inference is one affine/ReLU step and one small matrix multiply.
+    """
+
+    def __init__(self, labels, scale, shift, weights, bias, window_length=30, threshold=0.6):
+        self.labels = list(labels)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.shift = np.asarray(shift, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.window_length = int(window_length)
+        self.threshold = float(threshold)
+        self._hidden = np.zeros(self.weights.shape[0], dtype=np.float32)
+        self._logits = np.zeros(self.weights.shape[1], dtype=np.float32)
+
+    @classmethod
+    def load(cls, path):
+        """Load exported classifier weights from an .npz file"""
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            labels=[str(label) for label in data['labels']],
+            scale=data['scale'],
+            shift=data['shift'],
+            weights=data['weights'],
+            bias=data['bias'],
+            window_length=int(data['window_length']),
+            threshold=float(data['threshold'])
+        )
+
+    def save(self, path):
+        """Export classifier weights to an .npz file"""
+        np.savez(path, labels=np.array(self.labels), scale=self.scale, shift=self.shift,
+                 weights=self.weights, bias=self.bias, window_length=self.window_length,
+                 threshold=self.threshold)
+
+    def scores(self, features):
+        """Class probabilities for a batch of (B, F) feature vectors"""
+        hidden = np.maximum(features * self.scale + self.shift, 0)
+        logits = hidden @ self.weights + self.bias
+        logits -= logits.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=-1, keepdims=True)
+        return probabilities
+
+    def classify(self, window):
+        """Return (label, confidence) for one (T, 33, 4) window; label is None below threshold"""
+        np.multiply(window_features(window), self.scale, out=self._hidden)
+        self._hidden += self.shift
+        np.maximum(self._hidden, 0, out=self._hidden)
+        np.dot(self._hidden, self.weights, out=self._logits)
+        self._logits += self.bias
+
+        best = int(np.argmax(self._logits))
+        self._logits -= self._logits[best]
+        confidence = float(1.0 / np.exp(self._logits).sum())
+        label = self.labels[best]
+        if label == NONE_LABEL or confidence < self.threshold:
+            return None, confidence
+        return label, confidence
+
+
+def load_classifier(path=None):
+    """Load the deployed classifier, or return None so callers fall back to heuristics"""
+    path = path or os.getenv('GESTURE_CLASSIFIER_PATH', DEFAULT_CLASSIFIER_PATH)
+    if not os.path.exists(path):
+        logger.info(f"No gesture classifier at {path}, using heuristic detectors")
+        return None
+    try:
+        classifier = GestureClassifier.load(path)
+        logger.info(f"Loaded gesture classifier with labels {classifier.labels}")
+        return classifier
+    except Exception as e:
+        logger.error(f"Error loading gesture classifier: {str(e)}")
+        return None
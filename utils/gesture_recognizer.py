@@ -1,27 +1,187 @@
 import numpy as np
-from collections import deque
 import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Heuristic thresholds, shared with the batched detector in gesture_batch
+MIN_WAVE_AMPLITUDE = 0.15  # Minimum wave movement
+MIN_WAVE_CYCLES = 2  # Minimum number of back-and-forth movements
+POINTING_ARM_ANGLE = 2.8  # Radians, about 160 degrees
+MIN_CLAPS = 2  # Local minima of the hand distance
+RAISED_HAND_MARGIN = 0.2  # How far above the shoulder a wrist must be
 
 class GestureRecognizer:
-    def __init__(self, history_length=30):
+    def __init__(self, history_length=30, num_landmarks=33, classifier=None, clock=time.time):
         self.history_length = history_length
-        self.landmark_history = deque(maxlen=history_length)
+        self.clock = clock  # Injectable so recorded sequences can be replayed faster than real time
         self.last_gesture_time = {}  # Cooldown for gesture detection
         self.gesture_cooldown = 2.0  # Seconds between same gesture detection
-        
+
+        # Fixed ring buffer of landmark frames; index is the next slot to write
+        self.landmark_buffer = np.zeros((history_length, num_landmarks, 4))
+        self.index = 0
+        self.count = 0
+        self.frames_seen = 0  # Total frames added; tells batched evaluation when the window moved
+
+        # Incrementally maintained features (left wrist: 15, right wrist: 16)
+        self.wrist_indices = (15, 16)
+        self._wrist_x = self.landmark_buffer[:, 15:17, 0]  # View into the ring buffer
+        self._wrist_order = np.zeros(history_length, dtype=np.int64)
+        self._wrist_window = np.zeros((history_length, 2))
+        self._wrist_offset = np.zeros((history_length, 2))
+        self._wrist_signs = np.zeros((history_length, 2), dtype=bool)
+        self._wrist_crossings = np.zeros((history_length - 1, 2), dtype=bool)
+        self.wrist_mean = np.zeros(2)
+        self.zero_crossings = np.zeros(2, dtype=np.int64)
+        self._wrist_max = np.zeros(2)
+        self._wrist_min = np.zeros(2)
+
+        self._hand_distance = np.zeros(history_length)
+        self._distance_minima = np.zeros(history_length, dtype=bool)
+        self.distance_minima = 0
+
+        self.arm_angles = np.zeros(2)  # Angle between upper arm and forearm, per side
+        self._upper_arm = np.zeros((2, 3))
+        self._forearm = np.zeros((2, 3))
+        self._arm_norms = np.zeros((2, 2))
+        self._scratch = np.zeros((2, 3))
+
+        # Optional learned classifier replaces the heuristic detectors
+        if classifier is not None and classifier.window_length != history_length:
+            logger.warning(f"Gesture classifier expects {classifier.window_length}-frame windows, "
+                           f"history is {history_length}; using heuristic detectors")
+            classifier = None
+        self.classifier = classifier
+        self._window_base = np.arange(history_length)
+        self._window_order = np.arange(history_length)
+        self._window = np.zeros_like(self.landmark_buffer)
+
+        # When registered with a BatchGestureEvaluator, detections arrive per tick
+        self.batched = False
+        self.pending_gesture = None
+
+    @property
+    def landmark_history(self):
+        """Landmark frames in chronological order (copy of the ring buffer)"""
+        if self.count < self.history_length:
+            return self.landmark_buffer[:self.count].copy()
+        return np.roll(self.landmark_buffer, -self.index, axis=0)
+
     def add_landmarks(self, landmarks):
-        """Add landmarks to history"""
-        if landmarks is not None:
-            self.landmark_history.append(landmarks)
-            
+        """Add landmarks to the ring buffer and update features incrementally"""
+        if landmarks is None:
+            return
+
+        slot = self.index
+        full = self.count == self.history_length
+        self.frames_seen += 1
+
+        # Retire the features of the frame being overwritten
+        if full:
+            self.distance_minima -= self._distance_minima[slot]
+
+        self.landmark_buffer[slot] = landmarks
+        self.index = (slot + 1) % self.history_length
+        if full:
+            # The new oldest frame has no earlier neighbour, so it can no longer be a minimum
+            oldest = self.index
+            self.distance_minima -= self._distance_minima[oldest]
+            self._distance_minima[oldest] = False
+        else:
+            self.count += 1
+
+        self._update_wrist_features(slot)
+        self._update_hand_distance(slot)
+        self._update_arm_angles(slot)
+
+    def _update_wrist_features(self, slot):
+        """Wrist mean, range and zero crossings of x-position around the window mean.
+
+        The mean moves with every frame, so crossings are recounted against the
+        current mean over the (at most ``history_length``) chronological window.
+        """
+        count = self.count
+        order = self._wrist_order[:count]
+        np.add(self._window_base[:count], self.index - count, out=order)
+        np.remainder(order, self.history_length, out=order)
+        wrist_x = self._wrist_window[:count]
+        np.take(self._wrist_x, order, axis=0, out=wrist_x)
+
+        np.mean(wrist_x, axis=0, out=self.wrist_mean)
+        signs = self._wrist_signs[:count]
+        offset = self._wrist_offset[:count]
+        np.subtract(wrist_x, self.wrist_mean, out=offset)
+        np.signbit(offset, out=signs)
+        crossed = self._wrist_crossings[:count - 1]
+        np.not_equal(signs[1:], signs[:-1], out=crossed)
+        np.sum(crossed, axis=0, out=self.zero_crossings)
+
+        np.max(wrist_x, axis=0, out=self._wrist_max)
+        np.min(wrist_x, axis=0, out=self._wrist_min)
+
+    def _update_hand_distance(self, slot):
+        """Hand distance per frame and local minima of the distance signal"""
+        frame = self.landmark_buffer[slot]
+        delta = self._scratch[1]
+        np.subtract(frame[15, :3], frame[16, :3], out=delta)
+        self._hand_distance[slot] = np.sqrt(np.dot(delta, delta))
+        self._distance_minima[slot] = False
+
+        # The previous frame is a minimum once both of its neighbours are known
+        if self.count >= 3:
+            prev_slot = (slot - 1) % self.history_length
+            before_slot = (slot - 2) % self.history_length
+            prev = self._hand_distance[prev_slot]
+            is_minimum = (prev < self._hand_distance[before_slot] and
+                          prev < self._hand_distance[slot])
+            self._distance_minima[prev_slot] = is_minimum
+            self.distance_minima += is_minimum
+
+    def _update_arm_angles(self, slot):
+        """Angle between upper arm and forearm for both arms of the current frame"""
+        frame = self.landmark_buffer[slot]
+        # Shoulders (11, 12), elbows (13, 14) and wrists (15, 16) are contiguous slices
+        np.subtract(frame[13:15, :3], frame[11:13, :3], out=self._upper_arm)
+        np.subtract(frame[15:17, :3], frame[13:15, :3], out=self._forearm)
+
+        dots = self._scratch[0, :2]
+        np.einsum('ij,ij->i', self._upper_arm, self._forearm, out=dots)
+        np.einsum('ij,ij->i', self._upper_arm, self._upper_arm, out=self._arm_norms[0])
+        np.einsum('ij,ij->i', self._forearm, self._forearm, out=self._arm_norms[1])
+        norms = self._arm_norms[0]
+        norms *= self._arm_norms[1]
+        np.sqrt(norms, out=norms)
+
+        self.arm_angles.fill(0.0)
+        np.divide(dots, norms, out=self.arm_angles, where=norms > 0)
+        np.clip(self.arm_angles, -1.0, 1.0, out=self.arm_angles)
+        np.arccos(self.arm_angles, out=self.arm_angles, where=norms > 0)
+
+    def current_window(self, out=None):
+        """Copy the ring buffer into a preallocated chronological window"""
+        if out is None:
+            out = self._window
+        np.add(self._window_base, self.index, out=self._window_order)
+        np.remainder(self._window_order, self.history_length, out=self._window_order)
+        np.take(self.landmark_buffer, self._window_order, axis=0, out=out)
+        return out
+
     def detect_gestures(self):
-        """Detect various gestures from landmark history"""
-        if len(self.landmark_history) < self.history_length:
+        """Detect various gestures from incrementally maintained features"""
+        if self.count < self.history_length:
             return None
-            
-        current_time = time.time()
+
+        if self.batched:
+            gesture, self.pending_gesture = self.pending_gesture, None
+            return gesture
+
+        current_time = self.clock()
+        if self.classifier is not None:
+            return self._classify_gesture(current_time)
+
         detected_gestures = []
-        
+
         # Check each gesture
         gestures = {
             'waving': self._detect_waving,
@@ -29,100 +189,70 @@ class GestureRecognizer:
             'clapping': self._detect_clapping,
             'raising_hand': self._detect_raising_hand
         }
-        
+
         for gesture_name, detect_func in gestures.items():
             # Check cooldown
             if current_time - self.last_gesture_time.get(gesture_name, 0) > self.gesture_cooldown:
                 if detect_func():
                     detected_gestures.append(gesture_name)
                     self.last_gesture_time[gesture_name] = current_time
-                    
+
         return detected_gestures[0] if detected_gestures else None
-        
+
+    def apply_detections(self, gesture_names, current_time):
+        """Accept detections computed elsewhere (batched evaluation), applying cooldowns"""
+        detected_gestures = []
+        for gesture_name in gesture_names:
+            if current_time - self.last_gesture_time.get(gesture_name, 0) > self.gesture_cooldown:
+                detected_gestures.append(gesture_name)
+                self.last_gesture_time[gesture_name] = current_time
+
+        if detected_gestures:
+            self.pending_gesture = detected_gestures[0]
+        return self.pending_gesture
+
+    def _classify_gesture(self, current_time):
+        """Detect a gesture with the learned classifier (one matrix multiply per frame)"""
+        gesture, _ = self.classifier.classify(self.current_window())
+        if gesture is None:
+            return None
+        if current_time - self.last_gesture_time.get(gesture, 0) <= self.gesture_cooldown:
+            return None
+        self.last_gesture_time[gesture] = current_time
+        return gesture
+
     def _detect_waving(self):
         """Detect waving gesture (side-to-side hand movement)"""
-        # Use wrist points (left: 15, right: 16)
-        wrist_indices = [15, 16]  # Left and right wrist
-        min_wave_amplitude = 0.15  # Minimum wave movement
-        min_cycles = 2  # Minimum number of back-and-forth movements
-        
-        for wrist_idx in wrist_indices:
-            positions = np.array([frame[wrist_idx][:2] for frame in self.landmark_history])
-            x_positions = positions[:, 0]
-            
-            # Calculate zero crossings of x-position around mean
-            mean_x = np.mean(x_positions)
-            zero_crossings = np.where(np.diff(np.signbit(x_positions - mean_x)))[0]
-            
-            amplitude = np.max(x_positions) - np.min(x_positions)
-            
-            if len(zero_crossings) >= min_cycles * 2 and amplitude > min_wave_amplitude:
+        for side in range(len(self.wrist_indices)):
+            amplitude = self._wrist_max[side] - self._wrist_min[side]
+            if self.zero_crossings[side] >= MIN_WAVE_CYCLES * 2 and amplitude > MIN_WAVE_AMPLITUDE:
                 return True
-                
+
         return False
-        
+
     def _detect_pointing(self):
         """Detect pointing gesture (extended arm with index finger)"""
-        # Check last frame for pointing pose
-        current_frame = self.landmark_history[-1]
-        
-        # Check both arms
-        for (shoulder, elbow, wrist) in [(11, 13, 15), (12, 14, 16)]:
-            # Get joint positions
-            shoulder_pos = current_frame[shoulder][:3]
-            elbow_pos = current_frame[elbow][:3]
-            wrist_pos = current_frame[wrist][:3]
-            
-            # Calculate angles
-            vec1 = elbow_pos - shoulder_pos
-            vec2 = wrist_pos - elbow_pos
-            
-            # Check if arm is extended (angle close to 180 degrees)
-            angle = np.arccos(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
-            if angle > 2.8:  # About 160 degrees
-                return True
-                
-        return False
-        
+        # Check if arm is extended (angle close to 180 degrees)
+        return bool(np.any(self.arm_angles > POINTING_ARM_ANGLE))
+
     def _detect_clapping(self):
         """Detect clapping gesture (hands coming together repeatedly)"""
-        # Use wrist points
-        left_wrist_idx, right_wrist_idx = 15, 16
         min_clap_speed = 0.1
-        min_claps = 2
-        
-        # Calculate distances between hands over time
-        distances = []
-        for frame in self.landmark_history:
-            left_pos = frame[left_wrist_idx][:3]
-            right_pos = frame[right_wrist_idx][:3]
-            distance = np.linalg.norm(left_pos - right_pos)
-            distances.append(distance)
-            
+
         # Look for multiple distance minima (claps)
-        distances = np.array(distances)
-        min_indices = []
-        for i in range(1, len(distances) - 1):
-            if distances[i] < distances[i-1] and distances[i] < distances[i+1]:
-                min_indices.append(i)
-                
-        if len(min_indices) >= min_claps:
+        if self.distance_minima >= MIN_CLAPS:
             # Check if claps are fast enough
-            time_between_claps = len(distances) / len(min_indices)
+            time_between_claps = self.count / self.distance_minima
             return time_between_claps < (self.history_length / min_clap_speed)
-            
+
         return False
-        
+
     def _detect_raising_hand(self):
         """Detect raised hand gesture"""
-        # Use wrist and shoulder points
+        current_frame = self.landmark_buffer[(self.index - 1) % self.history_length]
         for wrist_idx, shoulder_idx in [(15, 11), (16, 12)]:  # Check both arms
-            current_frame = self.landmark_history[-1]
-            wrist_pos = current_frame[wrist_idx]
-            shoulder_pos = current_frame[shoulder_idx]
-            
             # Check if wrist is significantly above shoulder
-            if wrist_pos[1] < shoulder_pos[1] - 0.2:  # Y coordinates, lower value means higher position
+            if current_frame[wrist_idx][1] < current_frame[shoulder_idx][1] - RAISED_HAND_MARGIN:  # Lower y means higher position
                 return True
-                
+
         return False
@@ -1,34 +1,18 @@
-from google.cloud import speech_v1
-from google.cloud import dialogflow
 from google.cloud import texttospeech
+from .voice_service import FALLBACK_REPLY, get_voice_service
 
-def process_speech(audio_content):
-    client = speech_v1.SpeechClient()
-    
-    audio = speech_v1.RecognitionAudio(content=audio_content)
-    config = speech_v1.RecognitionConfig(
-        encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
-        language_code="en-US"
-    )
-    
-    response = client.recognize(config=config, audio=audio)
+def process_speech(audio_content, session_id="user123"):
+    """Transcribe a whole utterance and answer it, locally for known commands and
+    with Dialogflow otherwise.
+
+    Uses the shared voice service, so the speech and Dialogflow clients (and
+    their connections) are reused across calls. Prefer ``start_stream`` on the
+    service for live audio.
+    """
+    service = get_voice_service()
+    text = service.recognize(audio_content)
     
-    # Process with Dialogflow
-    if response.results:
-        text = response.results[0].alternatives[0].transcript
-        session_client = dialogflow.SessionsClient()
-        session = session_client.session_path("my-project-101-436505", "user123")
-        
-        text_input = dialogflow.TextInput(text=text, language_code="en-US")
-        query_input = dialogflow.QueryInput(text=text_input)
-        
-        dialogflow_response = session_client.detect_intent(
-            request={"session": session, "query_input": query_input}
-        )
-        
-        return {
-            'text': dialogflow_response.query_result.fulfillment_text,
-            'intent': dialogflow_response.query_result.intent.display_name
-        }
+    if text:
+        return service.answer(text, session_id)
     
-    return {'text': 'Sorry, I did not understand that.', 'intent': None}
+    return dict(FALLBACK_REPLY)
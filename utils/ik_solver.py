@@ -0,0 +1,263 @@
+import threading
+import logging
+import numpy as np
+from .body_model import NUM_BETAS, load_body_model
+
+logger = logging.getLogger(__name__)
+
+NUM_BODY_JOINTS = 22  # Pelvis plus the 21 SMPL-X body joints; hands and face stay at rest
+NUM_POSE_JOINTS = 55
+SPINE_JOINTS = (3, 6, 9)
+
+# Virtual landmarks appended after the 33 MediaPipe ones
+MID_SHOULDER = 33
+MID_EAR = 34
+
+# (SMPL-X joint, SMPL-X child, MediaPipe start, MediaPipe end): the joint is rotated so
+# its bone towards the child points along the observed landmark segment
+LIMB_BONES = (
+    (1, 4, 23, 25), (2, 5, 24, 26),      # hips -> knees
+    (4, 7, 25, 27), (5, 8, 26, 28),      # knees -> ankles
+    (7, 10, 27, 31), (8, 11, 28, 32),    # ankles -> toes
+    (12, 15, MID_SHOULDER, MID_EAR),     # neck -> head
+    (16, 18, 11, 13), (17, 19, 12, 14),  # shoulders -> elbows
+    (18, 20, 13, 15), (19, 21, 14, 16)   # elbows -> wrists
+)
+
+
+def _normalize(v):
+    return v / np.maximum(np.linalg.norm(v, axis=-1, keepdims=True), 1e-9)
+
+
+def _frames(across, up):
+    """Rotation matrices whose columns are ``across``, ``up`` made orthogonal, and their cross"""
+    x = _normalize(across)
+    y = _normalize(up - np.sum(up * x, axis=-1, keepdims=True) * x)
+    return np.stack([x, y, np.cross(x, y)], axis=-1)
+
+
+def swing(a, b):
+    """Smallest rotations taking unit vectors ``a`` to ``b`` (batched over leading axes)"""
+    v = np.cross(a, b)
+    c = np.sum(a * b, axis=-1)
+    # Antiparallel pairs: turn half way round an axis perpendicular to a
+    flip = c < -1 + 1e-6
+    if np.any(flip):
+        helper = np.where(np.abs(a[..., :1]) < 0.9, [1.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+        v = np.where(flip[..., None], _normalize(np.cross(a, helper)), v)
+        c = np.where(flip, 0.0, c)
+    k = np.zeros(v.shape + (3,))
+    k[..., 0, 1], k[..., 0, 2], k[..., 1, 2] = -v[..., 2], v[..., 1], -v[..., 0]
+    k[..., 1, 0], k[..., 2, 0], k[..., 2, 1] = v[..., 2], -v[..., 1], v[..., 0]
+    scale = np.where(flip, 2.0, 1.0 / (1.0 + c))
+    return np.eye(3) + k + scale[..., None, None] * (k @ k)
+
+
+def rotation_to_axis_angle(R):
+    """(..., 3) axis-angle of (..., 3, 3) rotation matrices"""
+    cos = np.clip((np.trace(R, axis1=-2, axis2=-1) - 1) / 2, -1.0, 1.0)
+    angle = np.arccos(cos)
+    axis = np.stack([R[..., 2, 1] - R[..., 1, 2], R[..., 0, 2] - R[..., 2, 0], R[..., 1, 0] - R[..., 0, 1]], axis=-1)
+    sin = np.sin(angle)
+    result = axis * np.where(sin > 1e-6, angle / np.maximum(2 * sin, 1e-12), 0.5)[..., None]
+
+    # Near pi the skew part vanishes; take the axis from the symmetric part instead
+    near_pi = cos < -0.99
+    if np.any(near_pi):
+        B = (R[near_pi] + np.eye(3)) / 2
+        column = np.argmax(np.diagonal(B, axis1=-2, axis2=-1), axis=-1)
+        axis = _normalize(B[np.arange(len(B)), :, column])
+        signs = np.where(np.sum(axis * result[near_pi], axis=-1) < 0, -1.0, 1.0)
+        result[near_pi] = axis * (angle[near_pi] * signs)[..., None]
+    return result
+
+
+def axis_angle_to_rotation(pose):
+    """(..., 3, 3) rotation matrices of (..., 3) axis-angle vectors"""
+    angle = np.linalg.norm(pose, axis=-1)
+    axis = pose / np.maximum(angle, 1e-12)[..., None]
+    zero = np.zeros_like(angle)
+    k = np.stack([zero, -axis[..., 2], axis[..., 1],
+                  axis[..., 2], zero, -axis[..., 0],
+                  -axis[..., 1], axis[..., 0], zero], axis=-1).reshape(pose.shape + (3,))
+    s, c = np.sin(angle)[..., None, None], np.cos(angle)[..., None, None]
+    return np.eye(3) + s * k + (1 - c) * (k @ k)
+
+
+def landmarks_to_model_space(landmarks, frame_sizes):
+    """(N, 35, 3) isotropic points (SMPL-X axes: x to the subject's left, y up, z towards the camera)
+    and (N, 35) visibility from (N, 33, 4) normalized landmarks"""
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    frame_sizes = np.asarray(frame_sizes, dtype=np.float64).reshape(-1, 2)
+    points = np.empty(landmarks.shape[:2] + (3,))
+    points[..., 0] = landmarks[..., 0] * frame_sizes[:, None, 1]
+    points[..., 1] = -landmarks[..., 1] * frame_sizes[:, None, 0]
+    points[..., 2] = -landmarks[..., 2]  # Already in pixels of frame width
+    visibility = landmarks[..., 3]
+
+    # Virtual landmarks for the neck bone
+    points = np.concatenate([points, (points[:, 11:12] + points[:, 12:13]) / 2,
+                             (points[:, 7:8] + points[:, 8:9]) / 2], axis=1)
+    visibility = np.concatenate([visibility, np.minimum(visibility[:, 11:12], visibility[:, 12:13]),
+                                 np.minimum(visibility[:, 7:8], visibility[:, 8:9])], axis=1)
+    return points, visibility
+
+
+class PoseSolver:
+    """Analytic inverse kinematics from MediaPipe landmarks to SMPL-X body rotations.
+
+    The rest skeleton comes from the body model's ``shape_state`` (shaped template joints).
+    The pelvis orientation is the rotation between the observed and rest torso frames
+    (hip line and hip-to-shoulder axis); the shoulder line's remaining twist is spread
+    over the three spine joints. Each limb joint is then rotated, parent first, by the
+    smallest rotation that lines its rest bone up with the observed bone direction.
+    That swing is applied on top of the previous frame's rotation, so bone twist
+    (unobservable from directions) carries over instead of snapping back. Bones whose
+    landmarks are not visible keep their previous rotation. Everything is vectorized
+    over a batch of subjects.
+    """
+
+    def __init__(self, body_model, visibility_threshold=0.5, cache_size=32):
+        self.body_model = body_model
+        self.visibility_threshold = visibility_threshold
+        self.cache_size = cache_size
+        self.parents = body_model.parents.detach().cpu().numpy()[:NUM_BODY_JOINTS].astype(np.int64)
+        self._rest_cache = {}
+        self._lock = threading.Lock()
+
+    def rest_joints(self, betas=None):
+        """(22, 3) rest joint positions of a shape, cached per betas vector.
+
+        The model's own shape cache holds one shape; this keeps one per subject.
+        """
+        key = None if betas is None else tuple(np.round(np.asarray(betas, dtype=np.float64)[:NUM_BETAS], 6))
+        with self._lock:
+            joints = self._rest_cache.get(key)
+        if joints is not None:
+            return joints
+
+        import torch
+        model = self.body_model
+        with torch.no_grad():
+            betas_tensor = torch.zeros((1, model.num_betas), dtype=model.shapedirs.dtype)
+            if key is not None:
+                values = torch.as_tensor(key[:model.num_betas], dtype=model.shapedirs.dtype)
+                betas_tensor[0, :len(values)] = values
+            _, joints = model.shape_state(betas_tensor)
+        joints = joints[0, :NUM_BODY_JOINTS].cpu().numpy().astype(np.float64)
+
+        with self._lock:
+            if len(self._rest_cache) >= self.cache_size:
+                self._rest_cache.pop(next(iter(self._rest_cache)))
+            self._rest_cache[key] = joints
+        return joints
+
+    def solve(self, landmarks, frame_sizes, rest_joints, previous=None):
+        """Local joint rotations (N, 22, 3, 3) for (N, 33, 4) landmarks.
+
+        ``frame_sizes`` are (N, 2) heights and widths, ``rest_joints`` (N, 22, 3) and
+        ``previous`` the (N, 22, 3, 3) rotations of the last frame (identity if None).
+        """
+        points, visibility = landmarks_to_model_space(landmarks, frame_sizes)
+        visible = visibility >= self.visibility_threshold
+        count = len(points)
+        local = np.tile(np.eye(3), (count, NUM_BODY_JOINTS, 1, 1)) if previous is None else previous.copy()
+
+        # Pelvis: observed torso frame against the rest torso frame
+        rest = rest_joints
+        rest_up = (rest[:, 16] + rest[:, 17]) / 2 - (rest[:, 1] + rest[:, 2]) / 2
+        observed_up = points[:, MID_SHOULDER] - (points[:, 23] + points[:, 24]) / 2
+        torso_visible = visible[:, [11, 12, 23, 24]].all(axis=1)
+        observed_hips = _frames(points[:, 23] - points[:, 24], observed_up)
+        rest_hips = _frames(rest[:, 1] - rest[:, 2], rest_up)
+        root = observed_hips @ np.swapaxes(rest_hips, -1, -2)
+        local[:, 0] = np.where(torso_visible[:, None, None], root, local[:, 0])
+
+        # Spine: the shoulder line's twist relative to the pelvis, spread evenly
+        observed_shoulders = _frames(points[:, 11] - points[:, 12], observed_up)
+        rest_shoulders = _frames(rest[:, 16] - rest[:, 17], rest_up)
+        relative = np.swapaxes(local[:, 0], -1, -2) @ observed_shoulders @ np.swapaxes(rest_shoulders, -1, -2)
+        spine = axis_angle_to_rotation(rotation_to_axis_angle(relative) / len(SPINE_JOINTS))
+        for joint in SPINE_JOINTS:
+            local[:, joint] = np.where(torso_visible[:, None, None], spine, local[:, joint])
+
+        # Limbs, parent first: global rotations are accumulated as joints are solved
+        bones = {joint: (child, start, end) for joint, child, start, end in LIMB_BONES}
+        world = np.empty_like(local)
+        world[:, 0] = local[:, 0]
+        for joint in range(1, NUM_BODY_JOINTS):
+            parent_world = world[:, self.parents[joint]]
+            bone = bones.get(joint)
+            if bone is not None:
+                child, start, end = bone
+                target = _normalize(np.einsum('nji,nj->ni', parent_world, points[:, end] - points[:, start]))
+                current = _normalize(np.einsum('nij,nj->ni', local[:, joint], rest[:, child] - rest[:, joint]))
+                solved = swing(current, target) @ local[:, joint]
+                ok = (visible[:, start] & visible[:, end])[:, None, None]
+                local[:, joint] = np.where(ok, solved, local[:, joint])
+            world[:, joint] = parent_world @ local[:, joint]
+        return local
+
+
+class BatchPoseSolver:
+    """Solve SMPL-X poses for every session with a new landmark frame in one batch per tick.
+
+    Sessions ``submit`` their latest landmarks; ``solve`` runs the pending frames
+    through one vectorized PoseSolver call, warm-started from each session's last
+    solution. The SMPL-X model is loaded on first use; without it nothing is solved.
+    """
+
+    def __init__(self, gender='neutral', visibility_threshold=0.5):
+        self.gender = gender
+        self.visibility_threshold = visibility_threshold
+        self._solver = None
+        self._unavailable = False
+        self._pending = {}
+        self._previous = {}
+
+    @property
+    def solver(self):
+        if self._solver is None and not self._unavailable:
+            body_model = load_body_model(self.gender)
+            if body_model is None:
+                self._unavailable = True
+            else:
+                self._solver = PoseSolver(body_model, self.visibility_threshold)
+        return self._solver
+
+    def submit(self, session_id, landmarks, frame_size, betas=None, timestamp=None):
+        """Queue a frame; a newer frame from the same session replaces an unsolved one"""
+        self._pending[session_id] = (np.array(landmarks, dtype=np.float64), frame_size, betas, timestamp)
+
+    def forget(self, session_id):
+        """Drop a session's pending frame and warm start (tracking lost or disconnected)"""
+        self._pending.pop(session_id, None)
+        self._previous.pop(session_id, None)
+
+    def solve(self):
+        """{session_id: (landmarks, (55, 3) axis-angle pose, timestamp)} for all pending frames"""
+        if not self._pending:
+            return {}
+        pending, self._pending = self._pending, {}
+        solver = self.solver
+        if solver is None:
+            return {session_id: (landmarks, None, timestamp)
+                    for session_id, (landmarks, _, _, timestamp) in pending.items()}
+
+        session_ids = list(pending)
+        frames = [pending[session_id] for session_id in session_ids]
+        identity = np.tile(np.eye(3), (NUM_BODY_JOINTS, 1, 1))
+        local = solver.solve(
+            np.stack([landmarks for landmarks, _, _, _ in frames]),
+            np.array([frame_size for _, frame_size, _, _ in frames], dtype=np.float64),
+            np.stack([solver.rest_joints(betas) for _, _, betas, _ in frames]),
+            np.stack([self._previous.get(session_id, identity) for session_id in session_ids])
+        )
+
+        poses = np.zeros((len(frames), NUM_POSE_JOINTS, 3))
+        poses[:, :NUM_BODY_JOINTS] = rotation_to_axis_angle(local)
+        results = {}
+        for i, (session_id, (landmarks, _, _, timestamp)) in enumerate(zip(session_ids, frames)):
+            self._previous[session_id] = local[i]
+            results[session_id] = (landmarks, poses[i], timestamp)
+        return results
@@ -0,0 +1,165 @@
+import re
+import difflib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Slot values recognized inside commands; colours resolve to the hex update_avatar expects
+SLOT_VALUES = {
+    'color': {
+        'red': '#ff0000', 'green': '#00ff00', 'blue': '#0000ff', 'yellow': '#ffff00',
+        'white': '#ffffff', 'orange': '#ffa500', 'purple': '#800080', 'pink': '#ffc0cb',
+        'cyan': '#00ffff', 'gray': '#808080'
+    },
+    'style': {'solid': 'solid', 'dashed': 'dashed', 'gradient': 'gradient'},
+    'mode': {'skeleton': 'skeleton', 'mesh': 'mesh'}
+}
+
+# Commands that map directly onto existing socket events
+INTENTS = (
+    {
+        'intent': 'start_calibration',
+        'event': 'start_calibration',
+        'reply': 'Starting calibration.',
+        'phrases': ('start calibration', 'begin calibration', 'calibrate', 'calibrate me',
+                    'recalibrate', 'restart calibration')
+    },
+    {
+        'intent': 'change_color',
+        'event': 'update_avatar',
+        'reply': 'Avatar updated.',
+        'phrases': ('change color to {color}', 'make it {color}', 'make avatar {color}',
+                    'set color to {color}', 'turn {color}', '{color} color')
+    },
+    {
+        'intent': 'change_style',
+        'event': 'update_avatar',
+        'reply': 'Avatar updated.',
+        'phrases': ('use {style} style', 'switch to {style} style', 'change style to {style}',
+                    '{style} lines', 'make it {style}')
+    },
+    {
+        'intent': 'change_mode',
+        'event': 'update_avatar',
+        'reply': 'Avatar updated.',
+        'phrases': ('switch to {mode} mode', 'use {mode} mode', 'show {mode}', '{mode} mode',
+                    'change mode to {mode}')
+    }
+)
+
+SYNONYMS = {'colour': 'color', 'grey': 'gray', 'colours': 'color', 'colors': 'color'}
+# A negated command must never run locally as its opposite; these always go to Dialogflow
+NEGATIONS = frozenset(('not', 'no', 'never', "don't", 'dont', "doesn't", "didn't", "won't", "can't", 'cannot', 'stop'))
+STOPWORDS = frozenset(('please', 'can', 'you', 'could', 'would', 'the', 'a', 'an', 'my', 'me', 'now', 'hey'))
+
+
+def _features(tokens):
+    """Unigrams plus adjacent-token bigrams"""
+    return set(tokens) | {f'{a} {b}' for a, b in zip(tokens, tokens[1:])}
+
+
+class IntentMatcher:
+    """Resolve common voice commands locally before falling back to Dialogflow.
+
+    The phrase table is compiled once into an inverted index of token unigrams and
+    bigrams. A transcript is normalized, slot values (colours, styles, modes) are
+    replaced by placeholders, and unknown words are snapped to the closest
+    vocabulary word. Candidates sharing a feature are then scored by Dice overlap.
+    Matches below ``min_confidence``, and any transcript containing a negation,
+    return None so the caller can ask Dialogflow.
+    """
+
+    def __init__(self, intents=INTENTS, min_confidence=0.7):
+        self.min_confidence = min_confidence
+        self.stats = {'local': 0, 'fallback': 0}
+        self._lock = threading.Lock()
+        self._slot_lookup = {value: slot for slot, values in SLOT_VALUES.items() for value in values}
+        self._phrases = []  # (intent entry, feature count, required slots)
+        self._index = {}
+        vocabulary = set(self._slot_lookup)
+        for entry in intents:
+            for phrase in entry['phrases']:
+                tokens = [t for t in phrase.split() if t not in STOPWORDS]
+                features = _features(tokens)
+                slots = frozenset(t[1:-1] for t in tokens if t.startswith('{'))
+                for feature in features:
+                    self._index.setdefault(feature, []).append(len(self._phrases))
+                self._phrases.append((entry, len(features), slots))
+                vocabulary.update(t for t in tokens if not t.startswith('{'))
+        self._vocabulary = sorted(vocabulary)
+        self._corrections = {}  # Fuzzy lookups are cached per unknown word
+
+    def _correct(self, token):
+        """Closest vocabulary word for a token outside the vocabulary (or the token itself)"""
+        correction = self._corrections.get(token)
+        if correction is None:
+            close = difflib.get_close_matches(token, self._vocabulary, n=1, cutoff=0.8)
+            correction = close[0] if close else token
+            if len(self._corrections) < 4096:
+                self._corrections[token] = correction
+        return correction
+
+    def _tokenize(self, text):
+        """Normalized tokens with slot values swapped for placeholders, the slot values,
+        and whether the text is negated"""
+        tokens, slots, negated = [], {}, False
+        for token in re.findall(r"[a-z']+", text.lower()):
+            token = SYNONYMS.get(token, token)
+            if token in NEGATIONS or token.endswith("n't"):
+                negated = True
+                continue
+            if token in STOPWORDS:
+                continue
+            if token not in self._index and token not in self._slot_lookup:
+                token = self._correct(token)
+            slot = self._slot_lookup.get(token)
+            if slot is not None:
+                slots[slot] = SLOT_VALUES[slot][token]
+                token = '{' + slot + '}'
+            tokens.append(token)
+        return tokens, slots, negated
+
+    def match(self, text):
+        """{'intent', 'confidence', 'event', 'data', 'reply'} for a confident local match, else None"""
+        tokens, slots, negated = self._tokenize(text or '')
+        if negated:
+            with self._lock:
+                self.stats['fallback'] += 1
+            return None
+        features = _features(tokens)
+
+        overlaps = {}
+        for feature in features:
+            for phrase in self._index.get(feature, ()):
+                overlaps[phrase] = overlaps.get(phrase, 0) + 1
+
+        best, confidence = None, 0.0
+        for phrase, overlap in overlaps.items():
+            entry, size, required = self._phrases[phrase]
+            if not required.issubset(slots):
+                continue
+            score = 2 * overlap / (len(features) + size)
+            if score > confidence:
+                best, confidence = entry, score
+
+        with self._lock:
+            if best is None or confidence < self.min_confidence:
+                self.stats['fallback'] += 1
+                return None
+            self.stats['local'] += 1
+
+        return {
+            'intent': best['intent'],
+            'confidence': round(confidence, 2),
+            'event': best['event'],
+            'data': {slot: slots[slot] for slot in sorted(slots)} if best['event'] == 'update_avatar' else {},
+            'reply': best['reply']
+        }
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats['local'] + stats['fallback']
+        stats['hit_rate'] = stats['local'] / total if total else 0.0
+        return stats
@@ -0,0 +1,272 @@
+import time
+import logging
+import numpy as np
+from .body_model import import_smplx
+
+logger = logging.getLogger(__name__)
+
+# Vertex clustering cell sizes (metres) for each level of detail; 0 keeps the full mesh
+LOD_CELL_SIZES = (0.0, 0.015, 0.03, 0.05)
+LIGHT_DIRECTION = np.array([0.3, 0.4, 0.87])
+
+
+def decimate(vertices, faces, cell_size):
+    """Vertex-clustering decimation.
+
+    Vertices are snapped to a grid of ``cell_size`` and each cell is represented
+    by its member closest to the cell mean, so every LOD vertex is an original
+    vertex and can be skinned with the original weights. Returns the kept vertex
+    indices and the faces re-indexed into them.
+    """
+    if cell_size <= 0:
+        return np.arange(len(vertices)), faces
+
+    cells = np.floor(vertices / cell_size).astype(np.int64)
+    _, cluster, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.reshape(-1)
+    means = np.zeros((len(counts), 3))
+    np.add.at(means, cluster, vertices)
+    means /= counts[:, None]
+
+    # Representative: member with the smallest distance to its cluster mean
+    distance = np.linalg.norm(vertices - means[cluster], axis=1)
+    order = np.lexsort((distance, cluster))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cluster[order[1:]] != cluster[order[:-1]]
+    keep = order[first]  # One vertex per cluster, in cluster order
+
+    lod_faces = cluster[faces]
+    valid = ((lod_faces[:, 0] != lod_faces[:, 1]) & (lod_faces[:, 1] != lod_faces[:, 2]) &
+             (lod_faces[:, 0] != lod_faces[:, 2]))
+    lod_faces = lod_faces[valid]
+    _, unique = np.unique(np.sort(lod_faces, axis=1), axis=0, return_index=True)
+    return keep, lod_faces[np.sort(unique)]  # Original winding of the first duplicate
+
+
+def rasterize(image, vertices, faces, face_colors):
+    """Flat-shaded scanline rasterization of front-facing triangles.
+
+    ``vertices`` are (V, 3) pixel x, pixel y and depth (larger is nearer). All
+    triangles are rasterized together: every (face, row) pair of the bounding
+    boxes gets its covered pixel span from the three edge equations, and the
+    spans are expanded into pixel fragments in one step. Each fragment's depth
+    is interpolated from its face's depth plane at the pixel centre and tested
+    against a depth buffer built with ``np.maximum.at``; ties go to the later
+    fragment, so every pixel is written exactly once, by its nearest fragment.
+    """
+    height, width = image.shape[:2]
+    triangles = vertices[faces]
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+
+    # Image y points down, so front faces have negative signed area
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    # Elementwise min/max over the three corners (much faster than reducing a length-3 axis)
+    low = np.minimum(np.minimum(a[:, :2], b[:, :2]), c[:, :2])
+    high = np.maximum(np.maximum(a[:, :2], b[:, :2]), c[:, :2])
+    low = np.maximum(np.floor(low), 0).astype(np.int64)
+    high = np.minimum(np.ceil(high), (width - 1, height - 1)).astype(np.int64)
+    rows = high[:, 1] - low[:, 1] + 1
+    front = np.flatnonzero((area < 0) & (rows > 0) & (high[:, 0] >= low[:, 0]))
+    if len(front) == 0:
+        return image
+
+    # Edge functions: with negative area a pixel centre (x, y) is inside when
+    # ex * x + ey * y + e0 >= 0 holds for all three edges
+    a, b, c = a[front], b[front], c[front]
+    start_points = np.stack([a, b, c], axis=1)[..., :2]  # (F, 3 edges, 2)
+    end_points = np.stack([b, c, a], axis=1)[..., :2]
+    dx = end_points[..., 0] - start_points[..., 0]
+    dy = end_points[..., 1] - start_points[..., 1]
+    ex, ey = dy, -dx
+    e0 = dx * start_points[..., 1] - dy * start_points[..., 0]
+    low, rows = low[front], rows[front]
+
+    # Depth plane z = a.z + dz_dx * (x - a.x) + dz_dy * (y - a.y) of every face
+    area = area[front]
+    dz_dx = ((b[:, 2] - a[:, 2]) * (c[:, 1] - a[:, 1]) - (c[:, 2] - a[:, 2]) * (b[:, 1] - a[:, 1])) / area
+    dz_dy = ((c[:, 2] - a[:, 2]) * (b[:, 0] - a[:, 0]) - (b[:, 2] - a[:, 2]) * (c[:, 0] - a[:, 0])) / area
+
+    # One entry per (face, row): intersect the three half-planes at the row centre
+    row_face = np.repeat(np.arange(len(front)), rows)
+    row_y = low[row_face, 1] + np.arange(rows.sum()) - np.repeat(np.cumsum(rows) - rows, rows)
+    slope = ex[row_face]
+    offset = ey[row_face] * (row_y[:, None] + 0.5) + e0[row_face]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = -offset / slope - 0.5  # Pixel index where the edge crosses the row
+    left_bounds = np.where(slope > 0, crossing, -np.inf)
+    right_bounds = np.where(slope < 0, crossing, np.inf)
+    left = np.maximum(np.maximum(left_bounds[:, 0], left_bounds[:, 1]), left_bounds[:, 2])
+    right = np.minimum(np.minimum(right_bounds[:, 0], right_bounds[:, 1]), right_bounds[:, 2])
+    blocked = (slope == 0) & (offset < 0)
+    blocked = blocked[:, 0] | blocked[:, 1] | blocked[:, 2]
+    start = np.maximum(np.ceil(left), low[row_face, 0])
+    end = np.minimum(np.floor(right), width - 1)
+    spans = np.where(blocked, 0, np.maximum(end - start + 1, 0)).astype(np.int64)
+    if spans.sum() == 0:
+        return image
+
+    # Expand spans into pixel fragments with depth interpolated at the pixel centres
+    step = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    pixel = np.repeat(row_y * width + start.astype(np.int64), spans) + step
+    row_depth = a[row_face, 2] + dz_dx[row_face] * (start + 0.5 - a[row_face, 0]) + \
+        dz_dy[row_face] * (row_y + 0.5 - a[row_face, 1])
+    fragment_face = np.repeat(row_face, spans)
+    depth = np.repeat(row_depth, spans) + dz_dx[fragment_face] * step
+
+    # Depth test against a z-buffer, then one winning fragment per pixel
+    depth_buffer = np.full(height * width, -np.inf)
+    np.maximum.at(depth_buffer, pixel, depth)
+    visible = np.flatnonzero(depth >= depth_buffer[pixel])
+    fragment_buffer = np.full(height * width, -1, dtype=np.int64)
+    np.maximum.at(fragment_buffer, pixel[visible], visible)
+    covered = np.flatnonzero(fragment_buffer >= 0)
+    owner = front[fragment_face[fragment_buffer[covered]]]
+    image.reshape(-1, image.shape[2])[covered] = face_colors[owner]
+    return image
+
+
+class MeshLevel:
+    """Skinning data of one level of detail, gathered from the full model"""
+
+    def __init__(self, body_model, cell_size):
+        import torch
+        template = body_model.v_template.detach().cpu().numpy()
+        faces = np.asarray(body_model.faces, dtype=np.int64)
+        self.vertex_ids, self.faces = decimate(template, faces, cell_size)
+        ids = torch.as_tensor(self.vertex_ids)
+
+        num_pose_basis = body_model.posedirs.shape[0]
+        self.posedirs = body_model.posedirs.view(num_pose_basis, -1, 3)[:, ids].reshape(num_pose_basis, -1)
+        self.lbs_weights = body_model.lbs_weights[ids]
+        self.num_faces = len(self.faces)
+
+
+class LodController:
+    """Pick the level of detail that keeps render time inside the frame budget"""
+
+    def __init__(self, num_levels, budget, smoothing=0.2, settle_frames=15):
+        self.num_levels = num_levels
+        self.budget = budget
+        self.smoothing = smoothing
+        self.settle_frames = settle_frames
+        self.level = 0
+        self.average = None
+        self._frames_at_level = 0
+
+    def update(self, duration):
+        """Record one render time; returns the level to use for the next frame"""
+        self.average = duration if self.average is None else \
+            self.average + self.smoothing * (duration - self.average)
+        self._frames_at_level += 1
+        if self._frames_at_level < self.settle_frames:
+            return self.level
+
+        if self.average > self.budget and self.level < self.num_levels - 1:
+            self._change_level(self.level + 1)
+        elif self.average < 0.5 * self.budget and self.level > 0:
+            self._change_level(self.level - 1)
+        return self.level
+
+    def _change_level(self, level):
+        logger.info(f"Mesh LOD {self.level} -> {level} (avg render {self.average * 1000:.1f}ms)")
+        self.level = level
+        self.average = None
+        self._frames_at_level = 0
+
+
+class MeshAvatarRenderer:
+    """SMPL-X mesh avatar posed with smplx.lbs and rasterized on the CPU.
+
+    The shaped rest mesh and its joints depend only on ``betas``; they come from the
+    body model's ``shape_state`` and are kept per renderer (the model caches one shape),
+    so each frame runs the pose part of LBS (rotations, rigid transforms, pose
+    correctives and skinning) on the current level-of-detail vertices only.
+    """
+
+    def __init__(self, body_model, width=640, height=480, frame_budget=1/30, budget_fraction=0.5,
+                 cell_sizes=LOD_CELL_SIZES):
+        import torch
+        self.torch = torch
+        self.lbs = import_smplx().lbs
+        self.body_model = body_model
+        self.width = width
+        self.height = height
+        self.levels = [MeshLevel(body_model, cell_size) for cell_size in cell_sizes]
+        self.lod = LodController(len(self.levels), frame_budget * budget_fraction)
+        self.pose_mean = getattr(body_model, 'pose_mean', None)
+        self._shape_key = None
+        self._v_shaped = None
+        self._joints = None
+
+        logger.info("Mesh LODs: " + ", ".join(f"{level.num_faces} faces" for level in self.levels))
+
+    def _shaped(self, betas):
+        """Rest-pose vertices and joints for the given shape, cached until betas change"""
+        key = None if betas is None else tuple(np.round(betas, 6))
+        if self._v_shaped is None or key != self._shape_key:
+            torch = self.torch
+            model = self.body_model
+            with torch.no_grad():
+                betas_tensor = torch.zeros((1, model.num_betas), dtype=model.shapedirs.dtype)
+                if betas is not None:
+                    values = torch.as_tensor(betas[:model.num_betas], dtype=model.shapedirs.dtype)
+                    betas_tensor[0, :len(values)] = values
+                v_shaped, self._joints = model.shape_state(betas_tensor)
+                self._v_shaped = v_shaped[0]
+            self._shape_key = key
+        return self._v_shaped, self._joints
+
+    def pose_vertices(self, full_pose, betas=None, level=None):
+        """Posed (V, 3) vertices of one LOD from a (J, 3) axis-angle pose"""
+        torch = self.torch
+        level = self.levels[self.lod.level if level is None else level]
+        v_shaped, joints = self._shaped(betas)
+
+        with torch.no_grad():
+            pose = torch.as_tensor(full_pose, dtype=v_shaped.dtype).reshape(1, -1)
+            if self.pose_mean is not None:
+                pose = pose + self.pose_mean[:pose.shape[1]]
+            num_joints = pose.shape[1] // 3
+            rot_mats = self.lbs.batch_rodrigues(pose.view(-1, 3)).view(1, num_joints, 3, 3)
+
+            # Pose correctives and skinning on the LOD vertices only
+            ident = torch.eye(3, dtype=v_shaped.dtype)
+            pose_feature = (rot_mats[:, 1:] - ident).view(1, -1)
+            v_posed = v_shaped[level.vertex_ids] + \
+                torch.matmul(pose_feature, level.posedirs).view(-1, 3)
+            _, transforms = self.lbs.batch_rigid_transform(
+                rot_mats, joints[:, :num_joints], self.body_model.parents[:num_joints])
+
+            T = torch.matmul(level.lbs_weights[:, :num_joints], transforms.view(num_joints, 16)).view(-1, 4, 4)
+            vertices = torch.matmul(T[:, :3, :3], v_posed[..., None])[..., 0] + T[:, :3, 3]
+        return vertices.cpu().numpy()
+
+    def render(self, full_pose, betas=None, color=(200, 200, 200), size=1.0, out=None):
+        """Render one frame (into ``out`` if given); the LOD adapts to the measured render time"""
+        start = time.perf_counter()
+        level = self.levels[self.lod.level]
+        vertices = self.pose_vertices(full_pose, betas)
+        if out is None:
+            image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        else:
+            image = out
+            image.fill(0)
+
+        # Orthographic camera looking down -Z with the pelvis at the image centre
+        scale = 0.42 * self.height * size
+        projected = np.empty_like(vertices)
+        center = self._joints[0, 0].numpy()
+        projected[:, 0] = self.width / 2 + scale * (vertices[:, 0] - center[0])
+        projected[:, 1] = self.height / 2 - scale * (vertices[:, 1] - center[1])
+        projected[:, 2] = vertices[:, 2]
+
+        # Lambert flat shading per face
+        triangles = vertices[level.faces]
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True) + 1e-12
+        intensity = 0.3 + 0.7 * np.clip(normals @ LIGHT_DIRECTION, 0, 1)
+        face_colors = (intensity[:, None] * np.asarray(color, dtype=np.float64)).astype(np.uint8)
+
+        rasterize(image, projected, level.faces, face_colors)
+        self.lod.update(time.perf_counter() - start)
+        return image
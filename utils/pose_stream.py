@@ -0,0 +1,127 @@
+import base64
+import struct
+import logging
+import numpy as np
+from .body_model import NUM_BETAS
+
+logger = logging.getLogger(__name__)
+
+POSE_STREAM_VERSION = 1
+NUM_STREAM_JOINTS = 22  # global_orient + 21 body joints; hands and face stay at rest
+# version, joint count, sequence, timestamp, root translation (x, y, z)
+POSE_HEADER = struct.Struct('<BBHd3f')
+ROTATION_SCALE = 32767 / np.pi  # int16 steps per radian of axis-angle
+SKIN_INFLUENCES = 4  # Joints per vertex in the browser's skinned mesh
+
+
+def _wrap_axis_angle(pose):
+    """Equivalent axis-angle rotations with angles in [0, pi]"""
+    angle = np.linalg.norm(pose, axis=1, keepdims=True)
+    wrap = angle > np.pi
+    if np.any(wrap):
+        scale = np.where(wrap, 1 - 2 * np.pi / np.maximum(angle, 1e-12), 1.0)
+        pose = pose * scale
+    return pose
+
+
+def root_translation(landmarks):
+    """Hip centre in frame-centred units (x right, y up; 1 = half the frame)"""
+    hips = (landmarks[23, :2] + landmarks[24, :2]) / 2
+    return 2 * hips[0] - 1, 1 - 2 * hips[1], 0.0
+
+
+class PoseStreamEncoder:
+    """Pack solved SMPL-X poses into small binary frames for the browser's skinned viewer.
+
+    A frame is a fixed header (version, joint count, sequence number, timestamp and
+    root translation) followed by the axis-angle rotation of every streamed joint,
+    quantized to int16 (about 1e-4 rad resolution): 156 bytes for the body joints.
+    Betas only change with a new shape fit, so they are sent separately and once.
+    """
+
+    def __init__(self, num_joints=NUM_STREAM_JOINTS):
+        self.num_joints = num_joints
+        self.sequence = 0
+        self._buffer = bytearray(POSE_HEADER.size + num_joints * 3 * 2)
+        self._rotations = np.frombuffer(self._buffer, dtype='<i2', offset=POSE_HEADER.size).reshape(num_joints, 3)
+        self._betas = None
+        self._shape_sent = False
+
+    def set_shape(self, betas):
+        """Queue the subject's betas (None for the mean shape) for the next shape message"""
+        self._betas = None if betas is None else [float(b) for b in betas[:NUM_BETAS]]
+        self._shape_sent = False
+
+    def pending_shape(self):
+        """The shape message if it has not been sent yet, else None"""
+        if self._shape_sent:
+            return None
+        self._shape_sent = True
+        return {'betas': self._betas or [0.0] * NUM_BETAS}
+
+    def encode(self, pose, translation, timestamp):
+        """Binary frame for a (J, 3) axis-angle pose; only the streamed joints are sent"""
+        pose = _wrap_axis_angle(np.asarray(pose, dtype=np.float64).reshape(-1, 3)[:self.num_joints])
+        if len(pose) < self.num_joints:
+            raise ValueError(f"Expected {self.num_joints} joint rotations, got {len(pose)}")
+        POSE_HEADER.pack_into(self._buffer, 0, POSE_STREAM_VERSION, self.num_joints,
+                              self.sequence & 0xFFFF, timestamp, *translation)
+        np.rint(np.clip(pose, -np.pi, np.pi) * ROTATION_SCALE, out=self._rotations, casting='unsafe')
+        self.sequence += 1
+        return bytes(self._buffer)
+
+
+def decode_pose(data):
+    """(sequence, timestamp, translation, (J, 3) axis-angle pose) of one encoded frame"""
+    version, num_joints, sequence, timestamp, *translation = POSE_HEADER.unpack_from(data, 0)
+    if version != POSE_STREAM_VERSION:
+        raise ValueError(f"Unsupported pose stream version {version}")
+    rotations = np.frombuffer(data, dtype='<i2', count=num_joints * 3, offset=POSE_HEADER.size)
+    return sequence, timestamp, tuple(translation), rotations.reshape(num_joints, 3) / ROTATION_SCALE
+
+
+def _encode_array(array, dtype):
+    return base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode('ascii')
+
+
+def skinned_model_asset(body_model, num_betas=NUM_BETAS):
+    """Everything the browser needs to build and reshape a skinned SMPL-X mesh.
+
+    Arrays are base64 little-endian buffers. Skinning keeps each vertex's four
+    strongest joints. Shape directions are int16 with one shared scale, since the
+    viewer applies betas once per session on the CPU; joint positions get their
+    own shape directions so the skeleton follows the shape.
+    """
+    import torch
+    with torch.no_grad():
+        v_template = body_model.v_template.detach().cpu().numpy()
+        shapedirs = body_model.shapedirs[..., :num_betas].detach().cpu().numpy()  # (V, 3, B)
+        J_regressor = body_model.J_regressor.detach().cpu().numpy()
+        weights = body_model.lbs_weights.detach().cpu().numpy()
+    parents = body_model.parents.detach().cpu().numpy().astype(np.int64)
+    parents[0] = -1
+
+    joints = J_regressor @ v_template
+    joint_shapedirs = np.einsum('jv,vcb->bjc', J_regressor, shapedirs)
+
+    skin_index = np.argsort(-weights, axis=1)[:, :SKIN_INFLUENCES]
+    skin_weight = np.take_along_axis(weights, skin_index, axis=1)
+    skin_weight /= np.maximum(skin_weight.sum(axis=1, keepdims=True), 1e-12)
+
+    shape_scale = max(float(np.abs(shapedirs).max()), 1e-12) / 32767
+    shape_offsets = np.rint(shapedirs.transpose(2, 0, 1) / shape_scale)  # (B, V, 3)
+
+    return {
+        'num_vertices': len(v_template),
+        'num_joints': len(parents),
+        'num_betas': num_betas,
+        'parents': parents.tolist(),
+        'positions': _encode_array(v_template, '<f4'),
+        'index': _encode_array(np.asarray(body_model.faces, dtype=np.int64), '<u4'),
+        'skin_index': _encode_array(skin_index, '<u2'),
+        'skin_weight': _encode_array(skin_weight, '<f4'),
+        'shape_scale': shape_scale,
+        'shape_offsets': _encode_array(shape_offsets, '<i2'),
+        'joints': _encode_array(joints, '<f4'),
+        'joint_shapedirs': _encode_array(joint_shapedirs, '<f4')
+    }
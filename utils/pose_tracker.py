@@ -3,26 +3,93 @@ import mediapipe as mp
 import numpy as np
 from .face_tracker import FaceTracker
 from .gesture_recognizer import GestureRecognizer
+from .gesture_classifier import load_classifier
+from .temporal_filter import OneEuroFilter
+from .tracking_tiers import get_tier
+from .skeleton_raster import SkeletonRaster
+
+NUM_POSE_LANDMARKS = 33
+DEFAULT_CLIENT_FRAME_SIZE = (480, 640)  # (height, width) assumed when a client omits it
+
+def parse_client_landmarks(data):
+    """Validate landmarks computed in the browser.
+
+    Accepts MediaPipe's list of {x, y, z, visibility} objects, or a dict holding
+    such a list (or 132 float32s as binary) under ``landmarks`` plus the video
+    ``width``/``height``. Returns ((33, 4) array, (height, width)); raises
+    ValueError on anything malformed.
+    """
+    frame_size = DEFAULT_CLIENT_FRAME_SIZE
+    if isinstance(data, dict):
+        if 'width' in data and 'height' in data:
+            try:
+                frame_size = (int(data['height']), int(data['width']))
+            except (TypeError, ValueError, OverflowError) as e:
+                raise ValueError(f"Malformed frame size: {str(e)}")
+            if not (0 < frame_size[0] <= 4096 and 0 < frame_size[1] <= 4096):
+                raise ValueError("Invalid frame size")
+        data = data.get('landmarks')
+
+    if isinstance(data, (bytes, bytearray)):
+        if len(data) != NUM_POSE_LANDMARKS * 4 * 4:
+            raise ValueError("Expected 33 float32 landmarks")
+        landmarks = np.frombuffer(data, dtype='<f4').reshape(NUM_POSE_LANDMARKS, 4).astype(np.float64)
+    elif isinstance(data, list) and len(data) == NUM_POSE_LANDMARKS:
+        try:
+            landmarks = np.array([[p['x'], p['y'], p.get('z', 0.0), p.get('visibility', 1.0)] for p in data],
+                                 dtype=np.float64)
+        except (TypeError, KeyError) as e:
+            raise ValueError(f"Malformed landmark: {str(e)}")
+    else:
+        raise ValueError("Expected 33 landmarks")
+
+    if not np.all(np.isfinite(landmarks)):
+        raise ValueError("Non-finite landmark values")
+    if np.any(np.abs(landmarks[:, :3]) > 10):
+        raise ValueError("Landmark coordinates out of range")
+    landmarks[:, 3] = np.clip(landmarks[:, 3], 0, 1)
+    return landmarks, frame_size
 
 class PoseTracker:
-    def __init__(self):
+    def __init__(self, tier=None, frame_pool=None):
+        self.tier, self.tier_settings = get_tier(tier)
+        self.input_resolution = self.tier_settings['input_resolution']
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
-        self.face_tracker = FaceTracker()
-        self.gesture_recognizer = GestureRecognizer()
+        self.face_tracker = FaceTracker(tier=self.tier)
+        self.gesture_recognizer = GestureRecognizer(classifier=load_classifier())
+        
+        # Landmark output stream is smoothed here instead of inside MediaPipe,
+        # so downstream consumers (gestures, calibration, renderer) share one filter
+        self.landmark_filter = OneEuroFilter(min_cutoff=1.5, beta=0.7)
+        self.raster = SkeletonRaster(self.mp_pose.POSE_CONNECTIONS)
+        self.frame_pool = frame_pool  # Reused inference/RGB buffers when provided
         
         # Configure pose tracking for CPU operation
         self.pose = self.mp_pose.Pose(
             static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
+            model_complexity=self.tier_settings['model_complexity'],
+            smooth_landmarks=False,
             enable_segmentation=False,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
+            min_detection_confidence=self.tier_settings['min_detection_confidence'],
+            min_tracking_confidence=self.tier_settings['min_tracking_confidence']
         )
         
-    def process_frame(self, frame):
+    def _resize_for_inference(self, frame):
+        """Downscale frame to the tier's input resolution (landmarks are normalized)"""
+        height, width = frame.shape[:2]
+        longest = max(height, width)
+        if longest <= self.input_resolution:
+            return frame
+        scale = self.input_resolution / longest
+        size = (int(width * scale), int(height * scale))
+        dst = None
+        if self.frame_pool is not None:
+            dst = self.frame_pool.acquire('inference', (size[1], size[0]) + frame.shape[2:])
+        return cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+        
+    def process_frame(self, frame, timestamp=None):
         """Process a frame and return pose landmarks, face expression, and detected gestures"""
         if frame is None or frame.size == 0:
             return None, None, None, None, None
@@ -30,16 +97,18 @@ class PoseTracker:
         try:
             # Get image dimensions
             height, width = frame.shape[:2]
+            frame = self._resize_for_inference(frame)
                 
             # Convert the BGR image to RGB
-            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            dst = self.frame_pool.acquire('rgb', frame.shape) if self.frame_pool is not None else None
+            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
             
             # Process the frame with MediaPipe
             image_rgb.flags.writeable = False
             pose_results = self.pose.process(image_rgb)
             
             # Process face landmarks
-            face_landmarks = self.face_tracker.process_frame(frame)
+            face_landmarks = self.face_tracker.process_frame(frame, image_rgb)
             expression = self.face_tracker.detect_expression(face_landmarks) if face_landmarks is not None else None
             
             image_rgb.flags.writeable = True
@@ -55,73 +124,72 @@ class PoseTracker:
                     
                     landmarks.append([x, y, z, visibility])
                 
-                landmarks = np.array(landmarks)
-                landmarks[:, :2] = np.clip(landmarks[:, :2], 0, 1)
-                
-                # Update gesture recognizer and detect gestures
-                self.gesture_recognizer.add_landmarks(landmarks)
-                gesture = self.gesture_recognizer.detect_gestures()
-                
+                landmarks, gesture = self._track_landmarks(np.array(landmarks), timestamp)
                 return landmarks, face_landmarks, expression, gesture, image_rgb
                 
+            self.landmark_filter.reset()
             return None, face_landmarks, expression, None, image_rgb
             
         except Exception as e:
             print(f"Error processing frame: {str(e)}")
             return None, None, None, None, None
         
+    def _track_landmarks(self, landmarks, timestamp=None):
+        """Smooth raw landmarks in place and update gesture recognition"""
+        np.copyto(landmarks, self.landmark_filter(landmarks, timestamp))
+        landmarks[:, :2] = np.clip(landmarks[:, :2], 0, 1)
+        
+        # Update gesture recognizer and detect gestures
+        self.gesture_recognizer.add_landmarks(landmarks)
+        return landmarks, self.gesture_recognizer.detect_gestures()
+        
+    def ingest_landmarks(self, landmarks, frame_width, timestamp=None):
+        """Track landmarks computed by the client (normalized x/y/z, visibility):
+        the same smoothing and gestures as process_frame, without any image work"""
+        landmarks = np.array(landmarks, dtype=np.float64)
+        landmarks[:, 2] *= frame_width  # Match process_frame's pixel-scaled depth
+        return self._track_landmarks(landmarks, timestamp)
+        
+    def reset_tracking(self):
+        """Forget filter state after the client lost the pose"""
+        self.landmark_filter.reset()
+        
     def draw_pose(self, image, landmarks, face_landmarks=None, expression=None, gesture=None):
-        """Draw pose landmarks, facial expression, and detected gestures on the image"""
+        """Draw pose landmarks, facial expression, and detected gestures onto the image in place"""
         if landmarks is None or image is None:
             return image
             
         try:
-            # Convert BGR to RGB for consistency
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            # Draw directly in BGR (colours below are the BGR equivalents of the
+            # RGB colours this view has always used)
+            height, width = image.shape[:2]
+            points = (landmarks[:, :2] * (width, height)).astype(np.int32)
+            joint_mask = self.raster.joint_mask(points, landmarks[:, 3], image)
             
             # Draw pose landmarks
-            height, width = image_rgb.shape[:2]
-            for i, (x, y, z, v) in enumerate(landmarks):
-                if v > 0.5:  # Only draw visible landmarks
-                    px = int(x * width)
-                    py = int(y * height)
-                    # Ensure radius is positive and within bounds
-                    radius = max(1, min(20, int(abs(5 * (1 + z)))))  # Fixed radius calculation
-                    if 0 <= px < width and 0 <= py < height and radius > 0:
-                        cv2.circle(image_rgb, (px, py), radius, (0, 255, 0), -1)
-                    
+            joints = np.flatnonzero(joint_mask)
+            radii = np.clip(np.abs(5 * (1 + landmarks[joints, 2])).astype(int), 1, 20)
+            self.raster.draw_joints(image, points[joints], radii, color=(0, 255, 0), line_type=cv2.LINE_8)
+            
             # Draw connections
-            for connection in self.mp_pose.POSE_CONNECTIONS:
-                start_idx = connection[0]
-                end_idx = connection[1]
-                
-                if (start_idx < len(landmarks) and end_idx < len(landmarks) and
-                    landmarks[start_idx][3] > 0.5 and landmarks[end_idx][3] > 0.5):
-                    
-                    start_point = (int(landmarks[start_idx][0] * width),
-                                int(landmarks[start_idx][1] * height))
-                    end_point = (int(landmarks[end_idx][0] * width),
-                                int(landmarks[end_idx][1] * height))
-                    
-                    if (0 <= start_point[0] < width and 0 <= start_point[1] < height and
-                        0 <= end_point[0] < width and 0 <= end_point[1] < height):
-                        cv2.line(image_rgb, start_point, end_point, (255, 0, 0), 2)
+            segments = self.raster.segments(points, self.raster.segment_mask(joint_mask))
+            self.raster.draw_segments(image, segments, 2, color=(0, 0, 255), line_type=cv2.LINE_8)
             
             # Draw facial expression if available
             text_y = 30
             if expression:
-                cv2.putText(image_rgb, f"Expression: {expression}", 
+                cv2.putText(image, f"Expression: {expression}", 
                            (10, text_y), cv2.FONT_HERSHEY_SIMPLEX, 1, 
-                           (0, 255, 255), 2)
+                           (255, 255, 0), 2)
                 text_y += 40
                 
             # Draw detected gesture if available
             if gesture:
-                cv2.putText(image_rgb, f"Gesture: {gesture}", 
+                cv2.putText(image, f"Gesture: {gesture}", 
                            (10, text_y), cv2.FONT_HERSHEY_SIMPLEX, 1, 
-                           (255, 255, 0), 2)
+                           (0, 255, 255), 2)
             
-            return cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+            return image
             
         except Exception as e:
             print(f"Error drawing pose: {str(e)}")
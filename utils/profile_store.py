@@ -0,0 +1,135 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+logger = logging.getLogger(__name__)
+
+db = SQLAlchemy()
+
+DEFAULT_DATABASE_URI = 'sqlite:///calibration_profiles.db'
+PROFILE_ID_LENGTH = 64
+
+
+def valid_profile_id(profile_id):
+    """Whether a client-supplied profile id fits the primary key column"""
+    return isinstance(profile_id, str) and 0 < len(profile_id) <= PROFILE_ID_LENGTH
+
+
+class CalibrationProfile(db.Model):
+    """Calibration results persisted per user or device"""
+    __tablename__ = 'calibration_profiles'
+
+    profile_id = db.Column(db.String(PROFILE_ID_LENGTH), primary_key=True)
+    completed = db.Column(db.Boolean, nullable=False, default=False)
+    movement_ranges = db.Column(db.JSON, nullable=False, default=dict)
+    limb_proportions = db.Column(db.JSON, nullable=False, default=dict)
+    thresholds = db.Column(db.JSON, nullable=False, default=dict)
+    betas = db.Column(db.JSON, nullable=True)  # Fitted SMPL-X shape, filled in by the background fit
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'completed': self.completed,
+            'movement_ranges': self.movement_ranges or {},
+            'limb_proportions': self.limb_proportions or {},
+            'thresholds': self.thresholds or {},
+            'betas': self.betas
+        }
+
+
+def configure_database(app):
+    """Set the SQL store URI and connection pool options on the Flask app"""
+    uri = os.getenv('DATABASE_URL', DEFAULT_DATABASE_URI)
+    if uri.startswith('postgres://'):
+        uri = uri.replace('postgres://', 'postgresql://', 1)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if not uri.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DATABASE_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DATABASE_MAX_OVERFLOW', 10)),
+            'pool_pre_ping': True,
+            'pool_recycle': 300
+        }
+
+
+class ProfileStore:
+    """Calibration profiles in SQL with an in-process LRU cache in front"""
+
+    def __init__(self, app, cache_size=256):
+        self.app = app
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+
+    def _remember(self, profile_id, profile):
+        with self._lock:
+            self._cache[profile_id] = profile
+            self._cache.move_to_end(profile_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def load(self, profile_id):
+        """Return a stored profile dict, or None if the profile is unknown"""
+        if not valid_profile_id(profile_id):
+            return None
+
+        with self._lock:
+            profile = self._cache.get(profile_id)
+            if profile is not None:
+                self._cache.move_to_end(profile_id)
+                return profile
+
+        try:
+            with self.app.app_context():
+                record = db.session.get(CalibrationProfile, profile_id)
+                profile = record.to_dict() if record is not None else None
+        except Exception as e:
+            logger.error(f"Error loading calibration profile {profile_id}: {str(e)}")
+            return None
+
+        if profile is not None:
+            self._remember(profile_id, profile)
+        return profile
+
+    def save(self, profile_id, profile):
+        """Persist a profile dict and refresh the cache"""
+        if not valid_profile_id(profile_id):
+            return False
+
+        try:
+            with self.app.app_context():
+                record = db.session.get(CalibrationProfile, profile_id)
+                if record is None:
+                    record = CalibrationProfile(profile_id=profile_id)
+                    db.session.add(record)
+                record.completed = bool(profile.get('completed', False))
+                record.movement_ranges = profile.get('movement_ranges', {})
+                record.limb_proportions = profile.get('limb_proportions', {})
+                record.thresholds = profile.get('thresholds', {})
+                if 'betas' in profile:
+                    record.betas = profile['betas']
+                db.session.commit()
+                self._remember(profile_id, record.to_dict())
+            logger.info(f"Saved calibration profile {profile_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving calibration profile {profile_id}: {str(e)}")
+            with self.app.app_context():
+                db.session.rollback()
+            return False
+
+    def save_betas(self, profile_id, betas):
+        """Attach a fitted body shape to an existing profile"""
+        profile = self.load(profile_id)
+        if profile is None:
+            return False
+        return self.save(profile_id, dict(profile, betas=betas))
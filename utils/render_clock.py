@@ -0,0 +1,132 @@
+import time
+import numpy as np
+from .ik_solver import axis_angle_to_rotation, rotation_to_axis_angle
+
+
+class PoseTimeline:
+    """The two most recent solved poses, sampled at arbitrary render times.
+
+    Sampling runs ``lag`` sample intervals behind the render time, so most
+    frames interpolate between the two samples; times past the latest sample
+    extrapolate along the latest motion, clamped to ``max_extrapolation`` of an
+    interval so a stalled tracker does not fling the avatar away. Joint rotations
+    are blended on the rotation group rather than component-wise, so a solver axis
+    flip near pi does not swing the limb through the rest pose. Once no sample
+    arrived for ``stale_intervals`` intervals (at least ``min_stale_time`` seconds)
+    the timeline stops returning poses, so a client that stopped sending frames
+    stops receiving rendered ones.
+    """
+
+    def __init__(self, lag=0.5, max_extrapolation=0.5, smoothing=0.2, stale_intervals=4, min_stale_time=0.25):
+        self.lag = lag
+        self.max_extrapolation = max_extrapolation
+        self.smoothing = smoothing
+        self.stale_intervals = stale_intervals
+        self.min_stale_time = min_stale_time
+        self.sample_interval = None  # Running average of the time between solved poses
+        self._times = [None, None]
+        self._landmarks = [None, None]
+        self._poses = [None, None]
+        self._landmark_out = None
+        self._pose_out = None
+
+    def push(self, timestamp, landmarks, pose=None):
+        """Record a solved pose; the older of the two stored samples is dropped"""
+        if self._times[1] is not None and self.is_stale(timestamp):
+            # After a tracking gap, don't blend from the old sample or count the gap as an interval
+            self._times = [None, None]
+            self._landmarks = [None, None]
+            self._poses = [None, None]
+        elif self._times[1] is not None and timestamp > self._times[1]:
+            interval = timestamp - self._times[1]
+            self.sample_interval = interval if self.sample_interval is None else \
+                self.sample_interval + self.smoothing * (interval - self.sample_interval)
+        self._times = [self._times[1], timestamp]
+        self._landmarks = [self._landmarks[1], np.array(landmarks, dtype=np.float64)]
+        self._poses = [self._poses[1], None if pose is None else np.array(pose, dtype=np.float64)]
+
+    def clear(self):
+        self.sample_interval = None
+        self._times = [None, None]
+        self._landmarks = [None, None]
+        self._poses = [None, None]
+
+    @property
+    def latest_time(self):
+        return self._times[1]
+
+    def is_stale(self, render_time):
+        """Whether the latest sample is too old to keep rendering"""
+        if self._times[1] is None:
+            return True
+        limit = max(self.stale_intervals * (self.sample_interval or 0.0), self.min_stale_time)
+        return render_time - self._times[1] > limit
+
+    def _blend(self, previous, latest, alpha, out):
+        if previous is None or previous.shape != latest.shape:
+            return latest
+        if out is None or out.shape != latest.shape:
+            out = np.empty_like(latest)
+        np.subtract(latest, previous, out=out)
+        out *= alpha
+        out += previous
+        return out
+
+    def _blend_rotations(self, previous, latest, alpha, out):
+        """Axis-angle poses blended by scaling each joint's relative rotation by ``alpha``"""
+        if previous is None or previous.shape != latest.shape:
+            return latest
+        if out is None or out.shape != latest.shape:
+            out = np.empty_like(latest)
+        start = axis_angle_to_rotation(previous.reshape(-1, 3))
+        relative = axis_angle_to_rotation(latest.reshape(-1, 3)) @ np.swapaxes(start, -1, -2)
+        step = axis_angle_to_rotation(alpha * rotation_to_axis_angle(relative))
+        out.reshape(-1, 3)[:] = rotation_to_axis_angle(step @ start)
+        return out
+
+    def sample(self, render_time):
+        """(landmarks, pose) at ``render_time``, or None before the first sample and once stale.
+
+        The returned arrays are buffers owned by the timeline and are overwritten
+        by the next call.
+        """
+        if self.is_stale(render_time):
+            return None
+        latest_landmarks, latest_pose = self._landmarks[1], self._poses[1]
+        if self._times[0] is None or self._times[1] <= self._times[0]:
+            return latest_landmarks, latest_pose
+
+        render_time -= self.lag * (self.sample_interval or 0.0)
+        alpha = (render_time - self._times[0]) / (self._times[1] - self._times[0])
+        alpha = min(max(alpha, 0.0), 1.0 + self.max_extrapolation)
+
+        landmarks = self._blend(self._landmarks[0], latest_landmarks, alpha, self._landmark_out)
+        if landmarks is not latest_landmarks:
+            self._landmark_out = landmarks
+            landmarks[:, 3] = latest_landmarks[:, 3]  # Visibility is not interpolated
+        pose = None
+        if latest_pose is not None:
+            pose = self._blend_rotations(self._poses[0], latest_pose, alpha, self._pose_out)
+            if pose is not latest_pose:
+                self._pose_out = pose
+        return landmarks, pose
+
+
+class RenderClock:
+    """Fixed-rate tick source; late ticks are dropped rather than bunched up"""
+
+    def __init__(self, fps=30, clock=time.time):
+        self.interval = 1.0 / fps
+        self.clock = clock
+        self._next_tick = None
+
+    def wait(self, sleep):
+        """Sleep (with the given sleep function) until the next tick; returns the tick time"""
+        now = self.clock()
+        if self._next_tick is None or now - self._next_tick > self.interval:
+            self._next_tick = now  # First tick, or fell behind: resynchronize
+        elif self._next_tick > now:
+            sleep(self._next_tick - now)
+        tick = self._next_tick
+        self._next_tick += self.interval
+        return tick
@@ -0,0 +1,137 @@
+import time
+import logging
+from .pose_tracker import PoseTracker
+from .smplx_renderer import SMPLXRenderer
+from .calibration import CalibrationGuide
+from .shape_fitter import CalibrationCapture
+from .frame_pool import FramePool
+from .render_clock import PoseTimeline
+from .pose_stream import PoseStreamEncoder, root_translation
+from .voice_activity import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+class ClientSession:
+    """Tracking, calibration and rendering state owned by one connected client"""
+
+    def __init__(self, sid, tracking_tier=None, gesture_evaluator=None, pose_solver=None):
+        self.sid = sid
+        self.profile_id = None  # Calibration profile key supplied by the client
+        self.frame_pool = FramePool()  # Double-buffered images reused across frames
+        self.pose_tracker = PoseTracker(tier=tracking_tier, frame_pool=self.frame_pool)
+        self.avatar_renderer = SMPLXRenderer(frame_pool=self.frame_pool)
+        self.calibration_guide = CalibrationGuide()
+        self.calibration_capture = CalibrationCapture()  # Frames for the SMPL-X shape fit
+        self.body_shape = None  # Fitted SMPL-X betas; fixed once known, so frames only need a pose solve
+        self.gesture_evaluator = gesture_evaluator
+        self.pose_solver = pose_solver  # Batched landmark-to-SMPL-X solver shared by all sessions
+        self.pose_timeline = PoseTimeline()  # Latest solved poses, sampled by the render loop
+        self.expression = None
+        self.active = True  # Cleared on disconnect to stop the render loop
+        self.voice_stream = None  # Speech recognition stream of the utterance being spoken
+        self.voice_activity = None  # Voice activity detector kept across utterances (noise floor)
+        self.frames_in_flight = 0  # Video frames received (counted on arrival) but not yet processed
+        self.pose_stream = None  # Set while the client renders the avatar itself from streamed poses
+
+        # Track processing times for progress indicators
+        self.processing_stats = {
+            'pose_detection': {'start': 0, 'duration': 0},
+            'avatar_rendering': {'start': 0, 'duration': 0}
+        }
+
+        if gesture_evaluator is not None:
+            gesture_evaluator.register(sid, self.pose_tracker.gesture_recognizer)
+
+    def load_profile(self, profile):
+        """Restore calibration results and any fitted body shape from a stored profile"""
+        if not self.calibration_guide.load_profile(profile):
+            return False
+        self.set_body_shape(profile.get('betas'))
+        return True
+
+    def set_body_shape(self, betas):
+        """Fix the SMPL-X shape for this session; frames then only need a pose solve"""
+        self.body_shape = betas
+        self.avatar_renderer.set_body_shape(betas)
+        if self.pose_stream is not None:
+            self.pose_stream.set_shape(betas)
+
+    def set_pose_streaming(self, enabled):
+        """Switch between server-rendered frames and streamed poses for the browser's skinned viewer"""
+        if not enabled:
+            self.pose_stream = None
+        elif self.pose_stream is None:
+            pose_stream = PoseStreamEncoder()
+            pose_stream.set_shape(self.body_shape)
+            self.pose_stream = pose_stream
+
+    def capture_calibration_frame(self, landmarks, frame_size):
+        """Buffer landmarks while the guided calibration stages run"""
+        if self.calibration_guide.is_calibrating:
+            self.calibration_capture.add(landmarks, frame_size)
+
+    @property
+    def needs_body_pose(self):
+        """Whether the avatar is driven by SMPL-X joint rotations rather than landmarks alone"""
+        return self.pose_stream is not None or self.avatar_renderer.mode == "mesh"
+
+    def submit_pose(self, landmarks, expression, frame_size, timestamp):
+        """Pass tracked landmarks on, through the batched SMPL-X pose solve when the avatar needs it"""
+        if self.pose_solver is None or not self.needs_body_pose:
+            self.push_pose(landmarks, expression, timestamp=timestamp)
+            return
+        self.expression = expression
+        self.pose_solver.submit(self.sid, landmarks, frame_size, self.body_shape, timestamp)
+
+    def push_pose(self, landmarks, expression=None, pose=None, timestamp=None):
+        """Hand a solved pose to the render loop (``landmarks=None`` when tracking is lost)"""
+        if landmarks is None:
+            self.pose_timeline.clear()
+            if self.pose_solver is not None:
+                self.pose_solver.forget(self.sid)
+            return
+        self.pose_timeline.push(time.time() if timestamp is None else timestamp, landmarks, pose)
+        self.expression = expression
+
+    def render_avatar_frame(self, tick):
+        """Render the avatar at a render loop tick; None until the first pose arrives"""
+        sample = self.pose_timeline.sample(tick)
+        if sample is None:
+            return None
+        landmarks, pose = sample
+        stats = self.processing_stats['avatar_rendering']
+        stats['start'] = time.time()
+        image = self.avatar_renderer.render_avatar(landmarks, self.expression, pose=pose, timestamp=tick)
+        stats['duration'] = time.time() - stats['start']
+        return image
+
+    def stream_avatar_pose(self, tick):
+        """Encoded pose at a render loop tick; None until a solved SMPL-X pose arrives"""
+        sample = self.pose_timeline.sample(tick)
+        if sample is None or sample[1] is None:
+            return None
+        landmarks, pose = sample
+        return self.pose_stream.encode(pose, root_translation(landmarks), tick)
+
+    def voice_activity_detector(self, sample_rate):
+        """The session's voice activity detector; a new one only when the sample rate changes"""
+        if self.voice_activity is None or self.voice_activity.sample_rate != sample_rate:
+            self.voice_activity = VoiceActivityDetector(sample_rate)
+        return self.voice_activity
+
+    def frame_credits(self, window):
+        """Frames the client may have in flight, shrunk by frames received but still queued here"""
+        return max(1, window - self.frames_in_flight)
+
+    def close(self):
+        """Release shared resources held on behalf of this session"""
+        self.active = False
+        if self.voice_stream is not None:
+            self.voice_stream.cancel()
+            self.voice_stream = None
+        if self.gesture_evaluator is not None:
+            self.gesture_evaluator.unregister(self.sid)
+        if self.pose_solver is not None:
+            self.pose_solver.forget(self.sid)
+        self.frame_pool.release()
+        logger.info(f"Closed session {self.sid}")
@@ -0,0 +1,151 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .body_model import MEDIAPIPE_TO_SMPLX, NUM_BETAS, import_smplx, load_body_model
+
+logger = logging.getLogger(__name__)
+
+# Bones compared between the tracked landmarks and the SMPL-X joints (MediaPipe indices)
+FIT_BONES = (
+    (11, 12),            # shoulders
+    (11, 13), (12, 14),  # upper arms
+    (13, 15), (14, 16),  # forearms
+    (23, 24),            # hips
+    (11, 23), (12, 24),  # torso sides
+    (23, 25), (24, 26),  # thighs
+    (25, 27), (26, 28)   # shins
+)
+
+
+class CalibrationCapture:
+    """Fixed-size buffer of landmark frames captured while a session calibrates.
+
+    Frames are stored in pixel units so bone lengths are isotropic. When the buffer
+    fills up every other frame is dropped, keeping coverage of the whole calibration.
+    """
+
+    def __init__(self, max_frames=256, num_landmarks=33):
+        self.frames = np.zeros((max_frames, num_landmarks, 4))
+        self.count = 0
+        self.stride = 1
+        self._seen = 0
+
+    def add(self, landmarks, frame_size):
+        """Store one (33, 4) frame of normalized x/y, pixel z and visibility"""
+        self._seen += 1
+        if (self._seen - 1) % self.stride:
+            return
+        if self.count == len(self.frames):
+            kept = self.frames[::2].copy()
+            self.count = len(kept)
+            self.frames[:self.count] = kept
+            self.stride *= 2
+        height, width = frame_size
+        frame = self.frames[self.count]
+        frame[:] = landmarks
+        frame[:, 0] *= width
+        frame[:, 1] *= height
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+        self.stride = 1
+        self._seen = 0
+
+    def snapshot(self):
+        return self.frames[:self.count].copy()
+
+
+def fit_betas(frames, body_model, iterations=150, learning_rate=0.05, prior_weight=1e-3, robust_sigma=0.1):
+    """Fit SMPL-X betas to every captured frame in one vectorized optimization.
+
+    Bone lengths of the shaped SMPL-X rest skeleton are compared against the
+    observed lengths of all frames at once. Each frame gets its closed-form
+    best scale (camera distance is unknown), residuals are visibility weighted
+    and passed through a Geman-McClure penalty, and a Gaussian prior keeps the
+    betas near the mean shape.
+    """
+    import torch
+    lbs = import_smplx().lbs
+
+    dtype = body_model.shapedirs.dtype
+    start = np.array([a for a, _ in FIT_BONES])
+    end = np.array([b for _, b in FIT_BONES])
+
+    points = torch.as_tensor(frames[:, :, :3], dtype=dtype)
+    visibility = torch.as_tensor(frames[:, :, 3], dtype=dtype)
+    observed = torch.linalg.norm(points[:, start] - points[:, end], dim=-1)  # (F, bones)
+    weights = torch.minimum(visibility[:, start], visibility[:, end]).clamp(min=0)
+
+    # Only the shape-dependent rest joints are needed, so regress the joints of
+    # the template and of every shape direction once and blend at joint level
+    with torch.no_grad():
+        num_betas = min(body_model.num_betas, NUM_BETAS)
+        template_joints = body_model.regress_joints(body_model.v_template[None])[0]
+        joint_shapedirs = body_model.regress_joints(
+            body_model.shapedirs[..., :num_betas].permute(2, 0, 1)).permute(1, 2, 0)
+
+    joint_start = torch.as_tensor([MEDIAPIPE_TO_SMPLX[a] for a in start])
+    joint_end = torch.as_tensor([MEDIAPIPE_TO_SMPLX[b] for b in end])
+
+    betas = torch.zeros((1, num_betas), dtype=dtype, requires_grad=True)
+    optimizer = torch.optim.Adam([betas], lr=learning_rate)
+
+    for _ in range(iterations):
+        optimizer.zero_grad()
+        joints = template_joints + lbs.blend_shapes(betas, joint_shapedirs)[0]
+        model_lengths = torch.linalg.norm(joints[joint_start] - joints[joint_end], dim=-1)  # (bones,)
+
+        scale = (weights * observed * model_lengths).sum(dim=1) / \
+            ((weights * model_lengths ** 2).sum(dim=1) + 1e-8)  # (F,)
+        residual = (scale[:, None] * model_lengths - observed) / (observed.mean(dim=1, keepdim=True) + 1e-8)
+        robust = residual ** 2 / (residual ** 2 + robust_sigma ** 2)
+        loss = (weights * robust).sum() / (weights.sum() + 1e-8) + prior_weight * (betas ** 2).sum()
+        loss.backward()
+        optimizer.step()
+
+    return betas.detach()[0].cpu().numpy().astype(float).tolist()
+
+
+class ShapeFitter:
+    """Run SMPL-X shape fits in a background worker, at most one per profile at a time"""
+
+    def __init__(self, min_frames=30, gender='neutral'):
+        self.min_frames = min_frames
+        self.gender = gender
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shape-fit')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, profile_id, frames, on_complete):
+        """Queue a fit; ``on_complete(profile_id, betas)`` runs on the worker thread"""
+        if len(frames) < self.min_frames:
+            logger.info(f"Skipping shape fit for {profile_id}: only {len(frames)} frames captured")
+            return None
+
+        with self._lock:
+            if profile_id in self._pending:
+                return self._pending[profile_id]
+            future = self._executor.submit(self._run, profile_id, frames, on_complete)
+            self._pending[profile_id] = future
+            return future
+
+    def _run(self, profile_id, frames, on_complete):
+        try:
+            body_model = load_body_model(self.gender)
+            if body_model is None:
+                return None
+            betas = fit_betas(frames, body_model)
+            logger.info(f"Fitted body shape for {profile_id} from {len(frames)} frames")
+            on_complete(profile_id, betas)
+            return betas
+        except Exception as e:
+            logger.error(f"Error fitting body shape for {profile_id}: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(profile_id, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
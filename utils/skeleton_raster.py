@@ -0,0 +1,131 @@
+import numpy as np
+import cv2
+
+# Connections drawn by the avatar renderers (MediaPipe pose landmark indices)
+AVATAR_CONNECTIONS = (
+    # Torso
+    (11, 12), (11, 23), (12, 24), (23, 24),
+    # Arms
+    (11, 13), (13, 15), (12, 14), (14, 16),
+    # Hands
+    (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22),
+    # Legs
+    (23, 25), (25, 27), (27, 29), (27, 31),
+    (24, 26), (26, 28), (28, 30), (28, 32),
+    # Face
+    (0, 1), (1, 2), (2, 3), (3, 7),
+    (0, 4), (4, 5), (5, 6), (6, 8)
+)
+
+
+def _groups(keys):
+    """Yield (group index, member indices) for each distinct key"""
+    if len(keys) == 0:
+        return
+    unique, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+    for group in range(len(unique)):
+        yield unique[group], order[bounds[group]:bounds[group + 1]]
+
+
+def dash_layout(segments, dash_length, gap_length):
+    """(start, unit direction, length) of every dash covering the given segments"""
+    start = segments[:, 0].astype(np.float64)
+    delta = segments[:, 1] - start
+    length = np.linalg.norm(delta, axis=1)
+    valid = length > 0
+    start, delta, length = start[valid], delta[valid], length[valid]
+    direction = delta / length[:, None]
+
+    # Dash k of a segment starts at k * step and runs min(dash, remaining) pixels
+    step = dash_length + gap_length
+    counts = np.ceil(length / step).astype(np.intp)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offset = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) * step
+    extent = np.minimum(dash_length, length[owner] - offset)
+    return start[owner] + direction[owner] * offset[:, None], direction[owner], extent
+
+
+def draw_dashes(image, dash_start, dash_end, color, thickness, line_type=cv2.LINE_AA):
+    """Draw the dashes lying inside the image in one polylines call"""
+    dashes = np.stack([dash_start, dash_end], axis=1).astype(np.int32)
+    height, width = image.shape[:2]
+    inside = np.all((dashes[..., 0] >= 0) & (dashes[..., 0] < width) &
+                    (dashes[..., 1] >= 0) & (dashes[..., 1] < height), axis=1)
+    if inside.any():
+        cv2.polylines(image, dashes[inside], False, color, thickness, line_type)
+    return image
+
+
+class SkeletonRaster:
+    """Draw-list skeleton rasterizer.
+
+    Connection index arrays are built once; every frame the visibility and bounds
+    tests run as array masks and all segments sharing a colour go to OpenCV in a
+    single ``cv2.polylines`` call.
+    """
+
+    def __init__(self, connections, visibility_threshold=0.5):
+        connections = np.asarray(sorted(connections) if isinstance(connections, (set, frozenset))
+                                 else connections, dtype=np.intp)
+        self.starts = connections[:, 0]
+        self.ends = connections[:, 1]
+        self.num_landmarks = int(connections.max()) + 1
+        self.visibility_threshold = visibility_threshold
+
+    def joint_mask(self, points, visibility, image):
+        """Visible joints whose integer pixel position lies inside the image"""
+        height, width = image.shape[:2]
+        return ((visibility > self.visibility_threshold) &
+                (points[:, 0] >= 0) & (points[:, 0] < width) &
+                (points[:, 1] >= 0) & (points[:, 1] < height))
+
+    def segment_mask(self, joint_mask):
+        """Connections with both endpoints drawable"""
+        if len(joint_mask) < self.num_landmarks:
+            joint_mask = np.pad(joint_mask, (0, self.num_landmarks - len(joint_mask)))
+        return joint_mask[self.starts] & joint_mask[self.ends]
+
+    def segments(self, points, mask):
+        """(N, 2, 2) endpoint array of the masked connections"""
+        return np.stack([points[self.starts[mask]], points[self.ends[mask]]], axis=1)
+
+    def draw_segments(self, image, segments, thickness, color=None, color_index=None,
+                      palette=None, line_type=cv2.LINE_AA):
+        """Draw segments in one polylines call per colour (per-segment colours via a palette)"""
+        if len(segments) == 0:
+            return image
+        if color_index is None:
+            cv2.polylines(image, segments, False, color, thickness, line_type)
+            return image
+        for key, members in _groups(color_index):
+            cv2.polylines(image, segments[members], False, palette[key], thickness, line_type)
+        return image
+
+    def draw_dashed(self, image, segments, color, thickness, dash_length=10, gap_length=5,
+                    line_type=cv2.LINE_AA):
+        """Split every segment into dashes and draw them all in one call"""
+        if len(segments) == 0:
+            return image
+        dash_start, direction, extent = dash_layout(segments, dash_length, gap_length)
+        dash_end = dash_start + direction * extent[:, None]
+        return draw_dashes(image, dash_start, dash_end, color, thickness, line_type)
+
+    def draw_joints(self, image, points, radii, color=None, color_index=None, palette=None,
+                    line_type=cv2.LINE_AA):
+        """Filled discs from precomputed integer positions, radii and palette indices.
+
+        OpenCV has no batched circle primitive, so this stays a loop, but every
+        per-joint value is computed up front and converted to Python ints once.
+        """
+        if len(points) == 0:
+            return image
+        radii = np.asarray(radii, dtype=np.intp).tolist()
+        if color_index is None:
+            colors = [color] * len(radii)
+        else:
+            colors = [palette[i] for i in np.asarray(color_index).tolist()]
+        for center, radius, joint_color in zip(map(tuple, points.tolist()), radii, colors):
+            cv2.circle(image, center, radius, joint_color, -1, line_type)
+        return image
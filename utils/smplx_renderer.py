@@ -1,16 +1,20 @@
 import numpy as np
-import cv2
-import time
+import logging
+from .temporal_filter import OneEuroFilter
+from .skeleton_raster import AVATAR_CONNECTIONS, SkeletonRaster
+from .sprite_atlas import DashAtlas
+from .body_model import load_body_model
+
+logger = logging.getLogger(__name__)
+
+GRADIENT_LEVELS = 8  # Gradient style shades per unit of depth factor
 
 class SMPLXRenderer:
-    def __init__(self):
+    def __init__(self, frame_pool=None):
         self.width = 640
         self.height = 480
-        self.prev_landmarks = None
-        self.interpolation_frames = 5
         self.scale = 200
-        self.last_render_time = 0
-        self.min_render_interval = 1/30  # Cap at 30 FPS
+        self.frame_interval = 1/30  # Render loop tick; the mesh LOD budget is a share of it
         
         # Add customization parameters with defaults
         self.avatar_color = (200, 200, 200)  # Default color (RGB)
@@ -18,6 +22,11 @@ class SMPLXRenderer:
         self.line_thickness = 2
         self.joint_size = 1.0
         self.style = "solid"  # solid, dashed, or gradient
+        self.mode = "skeleton"  # skeleton or mesh
+        self.body_shape = None  # SMPL-X betas for mesh mode
+        self.mesh_renderer = None
+        self._mesh_unavailable = False
+        self.frame_pool = frame_pool  # Reused output images (allocated per frame without one)
         self.expression_colors = {
             'neutral': (200, 200, 200),
             'closed_eyes': (255, 165, 0),
@@ -25,11 +34,14 @@ class SMPLXRenderer:
             'raised_eyebrows': (255, 0, 255),
             'frown': (128, 0, 128)
         }
-        # Initialize frame buffer for motion smoothing
-        self.frame_buffer = []
-        self.max_buffer_size = 5
-        
-    def set_customization(self, color=None, size=None, style=None, line_thickness=None, joint_size=None):
+        # One-Euro filter for motion smoothing (state preallocated on first frame)
+        self.motion_filter = OneEuroFilter(min_cutoff=1.0, beta=0.3)
+        self.raster = SkeletonRaster(AVATAR_CONNECTIONS)
+        self._gradient_cache = None
+        self._dash_atlas = None
+        
+    def set_customization(self, color=None, size=None, style=None, line_thickness=None, joint_size=None,
+                          mode=None):
         """Update avatar customization parameters with validation"""
         if color is not None:
             if isinstance(color, tuple) and len(color) == 3:
@@ -42,45 +54,55 @@ class SMPLXRenderer:
             self.line_thickness = max(1, min(5, int(line_thickness)))
         if joint_size is not None:
             self.joint_size = max(0.5, min(2.0, float(joint_size)))
+        if mode is not None and mode in ["skeleton", "mesh"]:
+            self.mode = mode
+        if self.style == "dashed":
+            self._dash_sprites()  # Build stamps now rather than on the next frame
+            
+    def set_body_shape(self, betas):
+        """Use a fitted SMPL-X shape for the mesh avatar"""
+        self.body_shape = betas
+        
+    def _get_mesh_renderer(self):
+        """Create the mesh renderer on first use; None if no SMPL-X model is available"""
+        if self.mesh_renderer is None and not self._mesh_unavailable:
+            body_model = load_body_model()
+            if body_model is None:
+                logger.warning("Mesh mode unavailable, rendering skeleton instead")
+                self._mesh_unavailable = True
+            else:
+                from .mesh_renderer import MeshAvatarRenderer
+                self.mesh_renderer = MeshAvatarRenderer(body_model, self.width, self.height,
+                                                        frame_budget=self.frame_interval)
+        return self.mesh_renderer
             
-    def _smooth_motion(self, landmarks):
-        """Apply motion smoothing using exponential moving average"""
+    def _smooth_motion(self, landmarks, timestamp=None):
+        """Apply speed-adaptive One-Euro smoothing to the whole landmark array"""
         if landmarks is None:
             return None
             
-        # Add current frame to buffer
-        self.frame_buffer.append(landmarks)
-        if len(self.frame_buffer) > self.max_buffer_size:
-            self.frame_buffer.pop(0)
-            
-        # Apply exponential weights for smoother motion
-        weights = np.exp(np.linspace(-1, 0, len(self.frame_buffer)))
-        weights /= weights.sum()
-        
-        # Calculate weighted average of positions
-        smoothed = np.zeros_like(self.frame_buffer[0])
-        for i, frame in enumerate(self.frame_buffer):
-            smoothed += frame * weights[i]
-            
-        return smoothed
+        return self.motion_filter(landmarks, timestamp)
         
-    def render_avatar(self, landmarks, expression=None):
-        """Render a simplified 3D skeleton avatar using MediaPipe landmarks with optimizations"""
-        current_time = time.time()
-        if current_time - self.last_render_time < self.min_render_interval:
-            return None  # Skip frame if too soon
-            
+    def render_avatar(self, landmarks, expression=None, pose=None, timestamp=None):
+        """Render the avatar: an SMPL-X mesh when in mesh mode and joint rotations
+        (axis-angle ``pose``) are given, otherwise a 3D skeleton from the landmarks.
+
+        Frame pacing and pose interpolation belong to the caller's render loop;
+        ``timestamp`` is the render tick the landmarks were sampled at.
+        """
         if landmarks is None:
-            return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            return self._blank_frame()
             
         # Apply motion smoothing
-        smoothed_landmarks = self._smooth_motion(landmarks)
+        smoothed_landmarks = self._smooth_motion(landmarks, timestamp)
         if smoothed_landmarks is None:
-            return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            return self._blank_frame()
+            
+        mesh_renderer = self._get_mesh_renderer() if self.mode == "mesh" and pose is not None else None
+        if mesh_renderer is not None:
+            return mesh_renderer.render(pose, self.body_shape, self.avatar_color, self.avatar_size,
+                                        out=self._blank_frame())
             
-        # Create frame buffer
-        image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        
         # Extract position and visibility data
         positions = smoothed_landmarks[:, :3]
         visibility = smoothed_landmarks[:, 3]
@@ -88,118 +110,62 @@ class SMPLXRenderer:
         # Apply size scaling
         positions = positions * self.avatar_size
         
-        # Perform interpolation if we have previous landmarks
-        if self.prev_landmarks is not None:
-            prev_positions = self.prev_landmarks[:, :3] * self.avatar_size
-            interpolated_frames = self._interpolate_poses(prev_positions, positions)
-            image = self._render_3d_skeleton(interpolated_frames[-1], visibility, expression)
-        else:
-            image = self._render_3d_skeleton(positions, visibility, expression)
+        return self._render_3d_skeleton(positions, visibility, expression)
             
-        # Store current landmarks for next frame
-        self.prev_landmarks = smoothed_landmarks.copy()
-        self.last_render_time = current_time
+    def _blank_frame(self):
+        """Black output image, taken from the frame pool when there is one"""
+        if self.frame_pool is None:
+            return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        return self.frame_pool.acquire('avatar', (self.height, self.width, 3), zero=True)
         
-        return image
-            
     def _render_3d_skeleton(self, landmarks, visibility, expression=None):
-        """Render an enhanced 3D skeleton with optimized drawing"""
-        image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        
-        # Define optimized connections for better visualization
-        connections = [
-            # Torso (core structure)
-            (11, 12), (11, 23), (12, 24), (23, 24),
-            # Arms
-            (11, 13), (13, 15), (12, 14), (14, 16),
-            # Hands
-            (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22),
-            # Legs
-            (23, 25), (25, 27), (27, 29), (27, 31),
-            (24, 26), (26, 28), (28, 30), (28, 32),
-            # Face
-            (0, 1), (1, 2), (2, 3), (3, 7),
-            (0, 4), (4, 5), (5, 6), (6, 8)
-        ]
-        
-        # Project 3D points to 2D with enhanced perspective
-        points_2d = self._project_3d_to_2d(landmarks)
-        
-        # Pre-calculate shared values
-        line_color = self.avatar_color
-        line_thickness = self.line_thickness
-        
-        # Draw connections efficiently
-        for start_idx, end_idx in connections:
-            if start_idx < len(points_2d) and end_idx < len(points_2d):
-                if visibility[start_idx] > 0.5 and visibility[end_idx] > 0.5:
-                    start = tuple(points_2d[start_idx].astype(int))
-                    end = tuple(points_2d[end_idx].astype(int))
-                    
-                    # Skip if points are outside frame
-                    if not (0 <= start[0] < self.width and 0 <= start[1] < self.height and
-                           0 <= end[0] < self.width and 0 <= end[1] < self.height):
-                        continue
-                    
-                    # Calculate color based on depth
-                    if self.style == "gradient":
-                        z_avg = (landmarks[start_idx][2] + landmarks[end_idx][2]) / 2
-                        color = tuple(min(255, int(c * (1 + z_avg))) for c in self.avatar_color)
-                    else:
-                        color = line_color
-                    
-                    # Draw optimized lines
-                    if self.style == "dashed":
-                        self._draw_dashed_line(image, start, end, color, line_thickness)
-                    else:
-                        cv2.line(image, start, end, color, line_thickness, cv2.LINE_AA)
+        """Render an enhanced 3D skeleton with batched drawing"""
+        image = self._blank_frame()
+        
+        # Project 3D points to 2D with enhanced perspective (truncated like int())
+        points_2d = self._project_3d_to_2d(landmarks).astype(np.int32)
+        joint_mask = self.raster.joint_mask(points_2d, visibility, image)
+        segment_mask = self.raster.segment_mask(joint_mask)
+        segments = self.raster.segments(points_2d, segment_mask)
+        
+        # Draw connections, one call per colour
+        if self.style == "gradient":
+            depth = landmarks[:, 2]
+            z_avg = (depth[self.raster.starts[segment_mask]] + depth[self.raster.ends[segment_mask]]) / 2
+            palette = self._gradient_palette()
+            levels = np.clip(np.rint((1 + z_avg) * GRADIENT_LEVELS), 0, len(palette) - 1).astype(np.intp)
+            self.raster.draw_segments(image, segments, self.line_thickness, color_index=levels, palette=palette)
+        elif self.style == "dashed":
+            self._dash_sprites().draw(image, segments)
+        else:
+            self.raster.draw_segments(image, segments, self.line_thickness, color=self.avatar_color)
         
-        # Draw joints efficiently
-        for i, (point, vis) in enumerate(zip(points_2d, visibility)):
-            if vis > 0.5:
-                point = tuple(map(int, point))
-                if not (0 <= point[0] < self.width and 0 <= point[1] < self.height):
-                    continue
-                    
-                z_depth = landmarks[i][2]
-                radius = max(1, min(20, int(5 * self.joint_size * (1 + z_depth))))
-                
-                color = self.expression_colors.get(expression, self.avatar_color) if i < 11 else self.avatar_color
-                cv2.circle(image, point, radius, color, -1, cv2.LINE_AA)
+        # Draw joints; face joints take the expression colour
+        joints = np.flatnonzero(joint_mask)
+        radii = np.clip((5 * self.joint_size * (1 + landmarks[joints, 2])).astype(int), 1, 20)
+        palette = (self.avatar_color, self.expression_colors.get(expression, self.avatar_color))
+        self.raster.draw_joints(image, points_2d[joints], radii,
+                                color_index=(joints < 11).astype(np.intp), palette=palette)
         
         return image
     
-    def _draw_dashed_line(self, image, start, end, color, thickness):
-        """Draw an optimized dashed line between two points"""
-        dash_length = 10
-        gap_length = 5
-        
-        dx = end[0] - start[0]
-        dy = end[1] - start[1]
-        dist = np.sqrt(dx*dx + dy*dy)
-        
-        if dist == 0:
-            return
-            
-        dx = dx/dist
-        dy = dy/dist
-        
-        curr_x, curr_y = start
-        step = dash_length + gap_length
-        
-        while dist > 0:
-            next_x = int(curr_x + dx * min(dash_length, dist))
-            next_y = int(curr_y + dy * min(dash_length, dist))
-            
-            # Skip if points are outside frame
-            if (0 <= int(curr_x) < self.width and 0 <= int(curr_y) < self.height and
-                0 <= next_x < self.width and 0 <= next_y < self.height):
-                cv2.line(image, (int(curr_x), int(curr_y)), (next_x, next_y), 
-                        color, thickness, cv2.LINE_AA)
-            
-            curr_x = curr_x + dx * step
-            curr_y = curr_y + dy * step
-            dist -= step
+    def _gradient_palette(self):
+        """Depth-shaded colours for the gradient style, cached per avatar colour"""
+        if self._gradient_cache is None or self._gradient_cache[0] != self.avatar_color:
+            # Enough levels for the dimmest channel to saturate
+            dimmest = min((c for c in self.avatar_color if c > 0), default=255)
+            num_levels = int(np.ceil(255 / dimmest * GRADIENT_LEVELS)) + 1
+            factors = np.arange(num_levels)[:, None] / GRADIENT_LEVELS
+            table = np.minimum(255, (np.array(self.avatar_color) * factors).astype(int))
+            self._gradient_cache = (self.avatar_color, [tuple(map(int, row)) for row in table])
+        return self._gradient_cache[1]
+    
+    def _dash_sprites(self):
+        """Dash stamp atlas for the current colour and line thickness"""
+        atlas = self._dash_atlas
+        if atlas is None or atlas.color != self.avatar_color or atlas.thickness != self.line_thickness:
+            self._dash_atlas = atlas = DashAtlas(self.avatar_color, self.line_thickness)
+        return atlas
     
     def _project_3d_to_2d(self, points_3d):
         """Project 3D points to 2D space with enhanced perspective effect"""
@@ -212,14 +178,3 @@ class SMPLXRenderer:
         # Center the projection with bounds checking
         points_2d = points_2d + np.array([self.width/2, self.height/2])
         return points_2d
-    
-    def _interpolate_poses(self, prev_landmarks, curr_landmarks):
-        """Create smooth transitions between poses with easing function"""
-        frames = []
-        for i in range(self.interpolation_frames):
-            t = (i + 1) / (self.interpolation_frames + 1)
-            # Use smooth easing function
-            t = 0.5 * (1 - np.cos(t * np.pi))
-            interpolated = prev_landmarks + t * (curr_landmarks - prev_landmarks)
-            frames.append(interpolated)
-        return frames
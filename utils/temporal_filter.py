@@ -0,0 +1,90 @@
+import time
+import numpy as np
+
+
+class OneEuroFilter:
+    """Speed-adaptive One-Euro low-pass filter applied element-wise to a whole array.
+
+    State (previous value, previous derivative and scratch space) is allocated once
+    on the first sample, so each update is a fixed number of vectorized operations
+    regardless of how many landmarks are being filtered.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, shape=None, dtype=np.float64):
+        self.min_cutoff = float(min_cutoff)
+        self.beta = float(beta)
+        self.d_cutoff = float(d_cutoff)
+        self.dtype = dtype
+        self._x_prev = None
+        self._dx_prev = None
+        self._dx = None
+        self._cutoff = None
+        self._alpha = None
+        self._t_prev = None
+        if shape is not None:
+            self._allocate(shape)
+
+    def _allocate(self, shape):
+        """Preallocate filter state for arrays of the given shape"""
+        self._x_prev = np.zeros(shape, dtype=self.dtype)
+        self._dx_prev = np.zeros(shape, dtype=self.dtype)
+        self._dx = np.zeros(shape, dtype=self.dtype)
+        self._cutoff = np.zeros(shape, dtype=self.dtype)
+        self._alpha = np.zeros(shape, dtype=self.dtype)
+        self._t_prev = None
+
+    def reset(self):
+        """Forget filter history; the next sample passes through unfiltered"""
+        self._t_prev = None
+
+    @staticmethod
+    def _smoothing_factor(dt, cutoff):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, timestamp=None):
+        """Filter one sample and return the smoothed array (owned by the filter)"""
+        if x is None:
+            return None
+
+        x = np.asarray(x, dtype=self.dtype)
+        if timestamp is None:
+            timestamp = time.time()
+
+        if self._x_prev is None or self._x_prev.shape != x.shape:
+            self._allocate(x.shape)
+
+        if self._t_prev is None:
+            np.copyto(self._x_prev, x)
+            self._dx_prev.fill(0)
+            self._t_prev = timestamp
+            return self._x_prev
+
+        dt = timestamp - self._t_prev
+        if dt <= 0:
+            dt = 1e-3
+        self._t_prev = timestamp
+
+        # Filtered derivative of the signal
+        np.subtract(x, self._x_prev, out=self._dx)
+        self._dx /= dt
+        a_d = self._smoothing_factor(dt, self.d_cutoff)
+        self._dx -= self._dx_prev
+        self._dx *= a_d
+        self._dx_prev += self._dx
+
+        # Cutoff grows with speed so fast motion is not lagged
+        np.abs(self._dx_prev, out=self._cutoff)
+        self._cutoff *= self.beta
+        self._cutoff += self.min_cutoff
+
+        # alpha = 1 / (1 + tau / dt) with tau = 1 / (2 * pi * cutoff)
+        np.multiply(self._cutoff, 2 * np.pi * dt, out=self._alpha)
+        np.add(self._alpha, 1.0, out=self._cutoff)
+        self._alpha /= self._cutoff
+
+        # x_hat = x_prev + alpha * (x - x_prev)
+        np.subtract(x, self._x_prev, out=self._dx)
+        self._dx *= self._alpha
+        self._x_prev += self._dx
+        return self._x_prev
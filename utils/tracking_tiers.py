@@ -0,0 +1,42 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Named precision tiers trading landmark accuracy for per-frame latency.
+# input_resolution is the longest side of the image handed to MediaPipe.
+PRECISION_TIERS = {
+    'fast': {
+        'model_complexity': 0,
+        'refine_landmarks': False,
+        'input_resolution': 320,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.3
+    },
+    'balanced': {
+        'model_complexity': 1,
+        'refine_landmarks': False,  # Iris landmarks are unused by expression detection
+        'input_resolution': 480,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5
+    },
+    'accurate': {
+        'model_complexity': 2,
+        'refine_landmarks': True,
+        'input_resolution': 640,
+        'min_detection_confidence': 0.6,
+        'min_tracking_confidence': 0.6
+    }
+}
+
+DEFAULT_TIER = 'balanced'
+REFERENCE_TIER = 'accurate'
+
+
+def get_tier(name=None):
+    """Return the settings for a named tier, falling back to the default tier"""
+    if name is None:
+        name = DEFAULT_TIER
+    if name not in PRECISION_TIERS:
+        logger.warning(f"Unknown precision tier '{name}', using '{DEFAULT_TIER}'")
+        name = DEFAULT_TIER
+    return name, PRECISION_TIERS[name]
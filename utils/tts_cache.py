@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from google.cloud import texttospeech
+from .voice_service import ClientPool, FALLBACK_REPLY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOICE = {'language_code': 'en-US', 'ssml_gender': 'NEUTRAL'}
+DEFAULT_AUDIO_CONFIG = {'audio_encoding': 'MP3', 'speaking_rate': 1.0}
+
+# Replies worth synthesizing before anyone asks for them
+PREWARM_PHRASES = (
+    FALLBACK_REPLY['text'],
+    'Hello! How can I help you?',
+    'Okay.',
+    'Starting calibration.',
+    'Calibration complete.',
+    'Avatar updated.'
+)
+
+
+class TtsCache:
+    """Text-to-speech synthesis behind a two-tier, content-addressed cache.
+
+    Audio is keyed by a hash of (text, voice, audio config). Recent clips stay in
+    an in-memory LRU bounded by bytes. Every clip is also written to a directory
+    whose total size is bounded, evicting the least recently used files, so
+    repeated replies survive restarts. Only misses reach the API.
+    """
+
+    def __init__(self, cache_dir=None, memory_bytes=16 * 2 ** 20, disk_bytes=256 * 2 ** 20,
+                 voice=None, audio_config=None, pool_size=1):
+        self.cache_dir = cache_dir or os.getenv(
+            'TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'avatar_tts_cache'))
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.voice = dict(voice or DEFAULT_VOICE)
+        self.audio_config = dict(audio_config or DEFAULT_AUDIO_CONFIG)
+        self.clients = ClientPool(texttospeech.TextToSpeechClient, pool_size)
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tts-prewarm')
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.endswith('.audio') and os.path.isfile(path):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, name[:-len('.audio')], stat.st_size))
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_size += size
+        except OSError as e:
+            logger.error(f"Error indexing TTS cache directory: {str(e)}")
+
+    def key(self, text, voice=None, audio_config=None):
+        """Content address of one synthesis request"""
+        request = {'text': text, 'voice': voice or self.voice, 'audio_config': audio_config or self.audio_config}
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.audio')
+
+    def _remember(self, key, audio):
+        """Insert into the memory tier, evicting least recently used clips"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = audio
+        self._memory_size += len(audio)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _store(self, key, audio):
+        """Write to the disk tier, evicting least recently used files past the budget"""
+        try:
+            path = self._path(key)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(audio)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.error(f"Error writing TTS cache entry: {str(e)}")
+            return
+        with self._lock:
+            self._disk_size += len(audio) - self._disk.pop(key, 0)
+            self._disk[key] = len(audio)
+            while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+                evicted, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def _load(self, key):
+        """Read a clip from the disk tier, or None"""
+        with self._lock:
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+        try:
+            path = self._path(key)
+            with open(path, 'rb') as f:
+                audio = f.read()
+            os.utime(path)  # Recency survives restarts through the file times
+            return audio
+        except OSError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+            return None
+
+    def synthesize(self, text, voice=None, audio_config=None):
+        """Audio bytes for ``text``, from the cache when possible"""
+        key = self.key(text, voice, audio_config)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return audio
+
+        audio = self._load(key)
+        if audio is not None:
+            with self._lock:
+                self.stats['disk_hits'] += 1
+                self._remember(key, audio)
+            return audio
+
+        response = self.clients.get().synthesize_speech(
+            input=texttospeech.SynthesisInput(text=text),
+            voice=texttospeech.VoiceSelectionParams(**(voice or self.voice)),
+            audio_config=texttospeech.AudioConfig(**(audio_config or self.audio_config))
+        )
+        audio = response.audio_content
+        with self._lock:
+            self.stats['misses'] += 1
+            self._remember(key, audio)
+        self._store(key, audio)
+        return audio
+
+    def prewarm(self, phrases=PREWARM_PHRASES):
+        """Synthesize common phrases in the background so their first use is a hit"""
+        def warm():
+            for phrase in phrases:
+                try:
+                    self.synthesize(phrase)
+                except Exception as e:
+                    logger.error(f"Error prewarming TTS phrase '{phrase}': {str(e)}")
+                    return
+            logger.info(f"Prewarmed {len(phrases)} TTS phrases")
+        return self._executor.submit(warm)
+
+    def metrics(self):
+        """Hit counts, hit rate and tier sizes"""
+        with self._lock:
+            stats = dict(self.stats)
+            requests = sum(stats.values())
+            stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / requests if requests else 0.0
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_size
+            stats['disk_entries'] = len(self._disk)
+            stats['disk_bytes'] = self._disk_size
+        return stats
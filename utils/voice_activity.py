@@ -0,0 +1,124 @@
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """Energy and spectral voice activity detection over a stream of 16-bit PCM chunks.
+
+    Audio is cut into fixed frames. A frame is voiced when its energy is clearly
+    above the adaptive noise floor and its spectrum looks like speech: most
+    energy in the speech band and low spectral flatness. Speech starts after
+    ``onset_frames`` voiced frames and carries ``preroll_frames`` of audio before
+    it, so word onsets are kept. It ends after ``hangover_frames`` unvoiced
+    frames. Everything outside speech (leading and trailing silence, noise
+    between utterances) is dropped.
+
+    The noise floor starts at a low percentile of the first chunk, capped at
+    ``min_energy_db`` so speech already under way when the stream opens is not
+    taken for background. It follows quiet frames at ``noise_adaptation`` and
+    rises slowly (``noise_rise``) on loud frames that do not look like speech, and
+    never drops more than ``margin_db`` below ``min_energy_db``. One detector is
+    meant to serve a whole session, with ``reset`` between utterances.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=20, margin_db=9.0, min_energy_db=-55.0,
+                 band=(80.0, 4000.0), min_band_ratio=0.5, max_flatness=0.45,
+                 onset_frames=3, hangover_frames=15, preroll_frames=5, noise_adaptation=0.05,
+                 noise_rise=0.01, seed_percentile=10):
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.min_band_ratio = min_band_ratio
+        self.max_flatness = max_flatness
+        self.onset_frames = onset_frames
+        self.hangover_frames = hangover_frames
+        self.preroll_frames = preroll_frames
+        self.noise_adaptation = noise_adaptation
+        self.noise_rise = noise_rise
+        self.seed_percentile = seed_percentile
+        self._min_noise_db = min_energy_db - margin_db
+
+        frequencies = np.fft.rfftfreq(self.frame_length, 1.0 / sample_rate)
+        self._band = (frequencies >= band[0]) & (frequencies <= band[1])
+        self._window = np.hanning(self.frame_length).astype(np.float32)
+
+        self.noise_db = None  # Running estimate of the background level
+        self.in_speech = False
+        self.stats = {'frames': 0, 'speech_frames': 0}
+        self._remainder = b''
+        self._pending = []  # Frames held back until speech starts or resumes
+        self._voiced_run = 0
+
+    def _features(self, frames):
+        """(energy dB, speech-band energy ratio, spectral flatness) of every frame"""
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-12
+        band_ratio = power[:, self._band].sum(axis=1) / power.sum(axis=1)
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        return energy_db, band_ratio, flatness
+
+    def _voiced(self, energy_db, band_ratio, flatness):
+        """Per-frame speech decisions, adapting the noise floor on quiet frames"""
+        voiced = np.zeros(len(energy_db), dtype=bool)
+        if self.noise_db is None:
+            seed = float(np.percentile(energy_db, self.seed_percentile))
+            self.noise_db = min(max(seed, self._min_noise_db), self.min_energy_db)
+        for i, level in enumerate(energy_db.tolist()):
+            loud = level > max(self.noise_db + self.margin_db, self.min_energy_db)
+            voiced[i] = loud and band_ratio[i] >= self.min_band_ratio and flatness[i] <= self.max_flatness
+            if not loud:
+                self.noise_db += self.noise_adaptation * (level - self.noise_db)
+            elif not voiced[i]:
+                self.noise_db += self.noise_rise * (level - self.noise_db)
+            self.noise_db = max(self.noise_db, self._min_noise_db)
+        return voiced
+
+    def process(self, chunk):
+        """Speech audio (bytes) contained in ``chunk``; possibly empty"""
+        data = self._remainder + bytes(chunk)
+        usable = len(data) // (2 * self.frame_length) * (2 * self.frame_length)
+        self._remainder = data[usable:]
+        if usable == 0:
+            return b''
+
+        samples = np.frombuffer(data[:usable], dtype='<i2')
+        frames = samples.reshape(-1, self.frame_length).astype(np.float32) / 32768.0
+        voiced = self._voiced(*self._features(frames))
+        self.stats['frames'] += len(frames)
+
+        raw = data[:usable]
+        step = 2 * self.frame_length
+        output = []
+        for i, is_voiced in enumerate(voiced.tolist()):
+            frame = raw[i * step:(i + 1) * step]
+            if self.in_speech:
+                # Pauses are held back and only forwarded if speech resumes
+                self._pending.append(frame)
+                if is_voiced:
+                    output.extend(self._pending)
+                    self._pending = []
+                elif len(self._pending) > self.hangover_frames:
+                    self.in_speech = False  # Trailing silence is dropped
+                    self._pending = []
+                    self._voiced_run = 0
+                continue
+
+            self._pending.append(frame)
+            del self._pending[:-(self.preroll_frames + self.onset_frames)]
+            self._voiced_run = self._voiced_run + 1 if is_voiced else 0
+            if self._voiced_run >= self.onset_frames:
+                self.in_speech = True
+                output.extend(self._pending)
+                self._pending = []
+
+        speech = b''.join(output)
+        self.stats['speech_frames'] += len(speech) // step
+        return speech
+
+    def reset(self):
+        """Forget the current utterance and its stats (the noise floor estimate is kept)"""
+        self.stats = {'frames': 0, 'speech_frames': 0}
+        self.in_speech = False
+        self._remainder = b''
+        self._pending = []
+        self._voiced_run = 0
@@ -0,0 +1,277 @@
+import os
+import base64
+import queue
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from google.cloud import speech_v1
+from google.cloud import dialogflow
+from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+from google.cloud.dialogflow_v2.services.sessions.transports import SessionsGrpcTransport
+from .intent_matcher import IntentMatcher
+from .voice_activity import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROJECT_ID = "my-project-101-436505"
+DEFAULT_LANGUAGE = "en-US"
+SAMPLE_RATE_RANGE = (8000, 48000)  # LINEAR16 sample rates the Speech API accepts
+FALLBACK_REPLY = {'text': 'Sorry, I did not understand that.', 'intent': None}
+
+
+class ClientPool:
+    """Fixed set of long-lived API clients handed out round robin.
+
+    Each client owns one gRPC channel; streams multiplex over it, so a small pool
+    only exists to spread very many concurrent streams over several connections.
+    Clients are created on first use and reused for the life of the process.
+    """
+
+    def __init__(self, factory, size=2):
+        self.factory = factory
+        self._clients = [None] * size
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            index = self._next
+            self._next = (index + 1) % len(self._clients)
+            if self._clients[index] is None:
+                self._clients[index] = self.factory()
+            return self._clients[index]
+
+
+class VoiceStream:
+    """One streamed utterance: audio chunks in, partial transcripts and a reply out.
+
+    Chunks pass through voice activity detection first; recognition only starts
+    once speech is heard and only receives the speech frames. Pass the session's
+    ``vad`` so its noise floor carries over between utterances.
+    """
+
+    def __init__(self, service, session_id, sample_rate, vad=None):
+        self.service = service
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        if vad is None:
+            vad = VoiceActivityDetector(sample_rate)
+        else:
+            vad.reset()
+        self.vad = vad
+        self.started = False
+        self._chunks = queue.Queue()
+        self._cancelled = False
+
+    def write(self, chunk):
+        """Queue the speech in one chunk of 16-bit mono PCM audio"""
+        speech = self.vad.process(chunk) if chunk else b''
+        if not speech or self._cancelled:
+            return
+        if not self.started:
+            self.started = True
+            self.service.submit(self)
+        self._chunks.put(speech)
+
+    def end(self):
+        """No more audio; the final transcript and reply follow"""
+        self._chunks.put(None)
+        self.service.record_voice_activity(self.vad.stats)
+        if not self.started and not self._cancelled:
+            # Nothing but silence or noise: no recognition request was made
+            self.service.publish(self.session_id, 'voice_response', {'text': None, 'intent': None, 'transcript': ''})
+
+    def cancel(self):
+        """Abandon the utterance without emitting a reply"""
+        self._cancelled = True
+        self._chunks.put(None)
+
+    def _requests(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None or self._cancelled:
+                return
+            yield speech_v1.StreamingRecognizeRequest(audio_content=chunk)
+
+    def run(self):
+        """Consume the recognition stream (on a worker thread) and publish results"""
+        config = speech_v1.StreamingRecognitionConfig(
+            config=speech_v1.RecognitionConfig(
+                encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code=self.service.language_code
+            ),
+            interim_results=True
+        )
+        finals = []
+        try:
+            responses = self.service.speech_clients.get().streaming_recognize(
+                config=config, requests=self._requests())
+            for response in responses:
+                for result in response.results:
+                    if not result.alternatives:
+                        continue
+                    transcript = result.alternatives[0].transcript
+                    if result.is_final:
+                        finals.append(transcript.strip())
+                    elif not self._cancelled:
+                        self.service.publish(self.session_id, 'voice_partial', {
+                            'transcript': ' '.join(finals + [transcript.strip()]),
+                            'stability': round(result.stability, 2)
+                        })
+        except Exception as e:
+            logger.error(f"Error streaming speech for {self.session_id}: {str(e)}")
+
+        if self._cancelled:
+            return
+        transcript = ' '.join(finals).strip()
+        reply = self.service.answer(transcript, self.session_id) if transcript else dict(FALLBACK_REPLY)
+        reply['transcript'] = transcript
+        audio = self.service.speak(reply['text'])
+        if audio is not None:
+            reply['audio'] = audio
+        self.service.publish(self.session_id, 'voice_response', reply)
+
+
+class VoiceService:
+    """Streaming speech recognition and intent detection over pooled cloud clients.
+
+    ``speech_endpoint`` / ``dialogflow_endpoint`` (or the ``SPEECH_ENDPOINT`` /
+    ``DIALOGFLOW_ENDPOINT`` environment variables) redirect the clients, e.g. to a
+    local fake gRPC server; ``localhost`` endpoints use an insecure channel.
+    Results are queued and drained by the caller's event loop, since the
+    recognition streams run on worker threads.
+    """
+
+    def __init__(self, project_id=None, language_code=DEFAULT_LANGUAGE, speech_endpoint=None,
+                 dialogflow_endpoint=None, pool_size=2, max_streams=8, tts=None):
+        self.project_id = project_id or os.getenv('DIALOGFLOW_PROJECT_ID', DEFAULT_PROJECT_ID)
+        self.language_code = language_code
+        speech_endpoint = speech_endpoint or os.getenv('SPEECH_ENDPOINT')
+        dialogflow_endpoint = dialogflow_endpoint or os.getenv('DIALOGFLOW_ENDPOINT')
+        self.speech_clients = ClientPool(
+            lambda: self._client(speech_v1.SpeechClient, SpeechGrpcTransport, speech_endpoint), pool_size)
+        self.sessions_clients = ClientPool(
+            lambda: self._client(dialogflow.SessionsClient, SessionsGrpcTransport, dialogflow_endpoint), pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix='voice-stream')
+        self._lock = threading.Lock()
+        self._events = queue.Queue()
+        self.voice_activity = {'frames': 0, 'speech_frames': 0}
+        self.tts = tts  # Optional TtsCache used to voice replies
+        self.matcher = IntentMatcher()
+
+    @staticmethod
+    def _client(client_cls, transport_cls, endpoint):
+        if not endpoint:
+            return client_cls()
+        if endpoint.startswith(('localhost', '127.0.0.1')):
+            return client_cls(transport=transport_cls(channel=grpc.insecure_channel(endpoint)))
+        return client_cls(client_options={'api_endpoint': endpoint})
+
+    def start_stream(self, session_id, sample_rate=16000, vad=None):
+        """Open a recognition stream; feed it with ``write`` and finish with ``end``"""
+        return VoiceStream(self, session_id, int(sample_rate), vad)
+
+    def submit(self, stream):
+        """Run a stream's recognition on a worker thread"""
+        self._executor.submit(stream.run)
+
+    def record_voice_activity(self, stats):
+        with self._lock:
+            for key, value in stats.items():
+                self.voice_activity[key] += value
+
+    def metrics(self):
+        """Local intent hit rate and the share of received audio forwarded as speech"""
+        with self._lock:
+            voice_activity = dict(self.voice_activity)
+        frames = voice_activity['frames']
+        voice_activity['speech_ratio'] = voice_activity['speech_frames'] / frames if frames else 0.0
+        return {'intents': self.matcher.metrics(), 'voice_activity': voice_activity}
+
+    def recognize(self, audio_content, sample_rate=None):
+        """One-shot transcript of a whole LINEAR16 utterance ('' if nothing was recognized)"""
+        config = speech_v1.RecognitionConfig(
+            encoding=speech_v1.RecognitionConfig.AudioEncoding.LINEAR16,
+            language_code=self.language_code
+        )
+        if sample_rate:
+            config.sample_rate_hertz = sample_rate
+        response = self.speech_clients.get().recognize(
+            config=config, audio=speech_v1.RecognitionAudio(content=audio_content))
+        if not response.results:
+            return ''
+        return response.results[0].alternatives[0].transcript
+
+    def answer(self, text, session_id):
+        """Reply to a transcript, locally for known commands and through Dialogflow otherwise.
+
+        Local matches carry an ``action`` naming the socket event (and its data)
+        the command stands for.
+        """
+        match = self.matcher.match(text)
+        if match is None:
+            return self.detect_intent(text, session_id)
+        return {
+            'text': match['reply'],
+            'intent': match['intent'],
+            'action': {'event': match['event'], 'data': match['data']}
+        }
+
+    def detect_intent(self, text, session_id):
+        """Dialogflow reply for a transcript, in a per-client conversation"""
+        try:
+            client = self.sessions_clients.get()
+            text_input = dialogflow.TextInput(text=text, language_code=self.language_code)
+            response = client.detect_intent(request={
+                "session": client.session_path(self.project_id, session_id),
+                "query_input": dialogflow.QueryInput(text=text_input)
+            })
+            return {
+                'text': response.query_result.fulfillment_text,
+                'intent': response.query_result.intent.display_name
+            }
+        except Exception as e:
+            logger.error(f"Error detecting intent: {str(e)}")
+            return dict(FALLBACK_REPLY)
+
+    def speak(self, text):
+        """Reply audio as an MP3 data URL, or None without a TTS cache"""
+        if self.tts is None or not text:
+            return None
+        try:
+            audio = self.tts.synthesize(text)
+            return f"data:audio/mpeg;base64,{base64.b64encode(audio).decode('utf-8')}"
+        except Exception as e:
+            logger.error(f"Error synthesizing reply: {str(e)}")
+            return None
+
+    def publish(self, session_id, event, payload):
+        self._events.put((session_id, event, payload))
+
+    def drain_events(self):
+        """All (session_id, event, payload) results produced since the last call"""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_voice_service():
+    """Process-wide service, so every caller shares the pooled clients"""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = VoiceService()
+        return _default_service